@@ -0,0 +1,80 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+
+from database_manager import get_connection_manager
+
+MAX_WORKERS = 4
+REPORT_TIMEOUT = 15.0
+
+# SQLite calls the progress handler every this many virtual machine
+# instructions; small enough to stop a runaway query promptly.
+PROGRESS_INTERVAL = 10000
+
+
+class ReportTimeout(Exception):
+    """Raised when a report does not finish within its timeout."""
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """Return the process-wide thread pool that runs analysis reports.
+
+    The pool and its threads outlive a Streamlit rerun, so each worker
+    keeps its read connection from the connection manager.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix='analysis')
+        return _executor
+
+
+def run_report(function, args=(), timeout=REPORT_TIMEOUT):
+    """Run one data_analysis function on a pooled read connection.
+
+    A progress handler interrupts the statement once the deadline passes.
+    """
+    deadline = time.monotonic() + timeout
+    with get_connection_manager().reader() as conn:
+        conn.set_progress_handler(lambda: int(time.monotonic() > deadline), PROGRESS_INTERVAL)
+        try:
+            result = function(conn, *args)
+        finally:
+            conn.set_progress_handler(None, 0)
+    if time.monotonic() > deadline:
+        raise ReportTimeout(f"{function.__name__} did not finish within {timeout:g} s")
+    return result
+
+
+def run_reports(reports, timeout=REPORT_TIMEOUT):
+    """Run reports concurrently and yield (key, result, error) as each finishes.
+
+    reports maps a key to a data_analysis function, or to a
+    (function, args) tuple. Exactly one of result and error is None.
+    """
+    executor = get_executor()
+    futures = {}
+    for key, report in reports.items():
+        function, args = report if isinstance(report, tuple) else (report, ())
+        futures[executor.submit(run_report, function, args, timeout)] = key
+
+    # The workers enforce the per-report timeout themselves. This bound
+    # only covers queueing behind the pool plus the Python work around an
+    # interrupted statement.
+    rounds = -(-len(futures) // MAX_WORKERS)
+    try:
+        for future in as_completed(futures, timeout=timeout * rounds + 1.0):
+            key = futures[future]
+            try:
+                yield key, future.result(), None
+            except Exception as e:
+                yield key, None, e
+    except FuturesTimeoutError:
+        for future, key in futures.items():
+            if not future.done():
+                yield key, None, ReportTimeout(f"report did not finish within {timeout:g} s")
@@ -0,0 +1,28 @@
+import inspect
+from datetime import date, timedelta
+
+import data_analysis
+
+# Arguments for the analysis functions that take more than a connection.
+SAMPLE_ARGUMENTS = {
+    'provider_contacts_by_city': lambda conn: (conn.execute("SELECT City FROM providers LIMIT 1").fetchone() or ('',))[0],
+    'table_row_count': lambda conn: 'claims',
+    'listings_expiring_within': lambda conn: 48,
+    'claims_between': lambda conn: (date.today() - timedelta(days=30)).isoformat(),
+    'cities_within': lambda conn: (conn.execute("SELECT City FROM city_locations LIMIT 1").fetchone() or ('',))[0],
+    'listings_near_receiver': lambda conn: (conn.execute("SELECT Receiver_ID FROM receivers LIMIT 1").fetchone() or (0,))[0],
+}
+
+
+# Functions that answer with distances; the API only offers them once a
+# gazetteer with real coordinates is loaded (proximity.real_gazetteer_loaded).
+DISTANCE_FUNCTIONS = ('cities_within', 'listings_near_receiver')
+
+
+def analysis_functions():
+    """Return the public analysis functions in data_analysis, in file order."""
+    functions = [
+        function for name, function in inspect.getmembers(data_analysis, inspect.isfunction)
+        if function.__module__ == data_analysis.__name__ and name != 'run_query' and not name.startswith('_')
+    ]
+    return sorted(functions, key=lambda function: function.__code__.co_firstlineno)
@@ -0,0 +1,312 @@
+import argparse
+import asyncio
+import hashlib
+import inspect
+import json
+import math
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from urllib.parse import parse_qs, urlsplit
+
+from analysis_registry import DISTANCE_FUNCTIONS, analysis_functions
+from change_feed import CHANGE_PAGE_SIZE, CHANGE_TABLES, acknowledge, changes_since, consumer_lag, start_compactor
+from database_manager import (
+    LISTINGS_PAGE_SIZE, count_listings, current_table_versions, get_connection_manager, get_listings_page,
+)
+from proximity import real_gazetteer_loaded
+
+API_HOST = '127.0.0.1'
+API_PORT = 8502
+API_WORKERS = 8
+MAX_PAGE_SIZE = 500
+MAX_REQUEST_BYTES = 16 * 1024
+
+# Query parameters that are not strings; every other argument is passed as text.
+ARGUMENT_TYPES = {'hours': float, 'km': float, 'receiver_id': int}
+
+# Inclusive bounds for the float arguments. Larger values overflow
+# timedelta or mean nothing on Earth (no two places are further apart
+# than half its circumference).
+ARGUMENT_RANGES = {'hours': (0, 24 * 366), 'km': (0, 20040)}
+
+# Query parameter -> get_listings_page filter. List filters may repeat.
+LISTING_FILTERS = {
+    'city': 'cities',
+    'provider_type': 'provider_types',
+    'food_type': 'food_types',
+}
+
+REASONS = {200: 'OK', 304: 'Not Modified', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+           500: 'Internal Server Error'}
+
+
+class ApiError(Exception):
+    """An error answered with a JSON body and the given status code."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def analysis_endpoints(distances=True):
+    """Return {name: function} for every public data_analysis function.
+
+    Without distances, the functions in DISTANCE_FUNCTIONS are left out.
+    """
+    return {function.__name__: function for function in analysis_functions()
+            if distances or function.__name__ not in DISTANCE_FUNCTIONS}
+
+
+def _arguments(function, query):
+    """Bind query parameters to the function's arguments after conn."""
+    arguments = {}
+    for name, parameter in list(inspect.signature(function).parameters.items())[1:]:
+        if name in query:
+            try:
+                arguments[name] = ARGUMENT_TYPES.get(name, str)(query[name][-1])
+            except ValueError:
+                raise ApiError(400, f"Invalid value for {name}")
+            if name in ARGUMENT_RANGES:
+                low, high = ARGUMENT_RANGES[name]
+                if not (math.isfinite(arguments[name]) and low <= arguments[name] <= high):
+                    raise ApiError(400, f"{name} must be between {low} and {high}")
+        elif parameter.default is inspect.Parameter.empty:
+            raise ApiError(400, f"Missing query parameter: {name}")
+    return arguments
+
+
+def _listings(conn, query):
+    filters = {target: query[name] for name, target in LISTING_FILTERS.items() if name in query}
+    if 'search' in query:
+        filters['search'] = query['search'][-1]
+    filters['include_expired'] = query.get('include_expired', ['0'])[-1] == '1'
+    try:
+        after_id = int(query['after_id'][-1]) if 'after_id' in query else None
+        page_size = min(int(query.get('page_size', [LISTINGS_PAGE_SIZE])[-1]), MAX_PAGE_SIZE)
+    except ValueError:
+        raise ApiError(400, "after_id and page_size must be integers")
+    page, has_next = get_listings_page(conn, after_id=after_id, page_size=page_size, **filters)
+    body = {
+        'rows': json.loads(page.to_json(orient='records')),
+        'has_next': has_next,
+        'next_after_id': int(page['Food_ID'].iloc[-1]) if has_next else None,
+    }
+    if query.get('count', ['0'])[-1] == '1':
+        body['total'] = count_listings(conn, **filters)
+    return body
+
+
+def _changes(conn, query):
+    try:
+        after = int(query.get('after', ['0'])[-1])
+        limit = int(query.get('limit', [CHANGE_PAGE_SIZE])[-1])
+    except ValueError:
+        raise ApiError(400, "after and limit must be integers")
+    tables = query.get('table')
+    if tables and not set(tables) <= set(CHANGE_TABLES):
+        raise ApiError(400, f"table must be one of: {', '.join(CHANGE_TABLES)}")
+    return changes_since(conn, after, limit, tables)
+
+
+def _acknowledge(query, manager):
+    """Record a consumer's position from POST /api/changes/ack?consumer=<name>&seq=<n>."""
+    if 'consumer' not in query or 'seq' not in query:
+        raise ApiError(400, "consumer and seq are required")
+    try:
+        seq = int(query['seq'][-1])
+    except ValueError:
+        raise ApiError(400, "seq must be an integer")
+    acknowledge(query['consumer'][-1], seq, manager)
+    return {'consumer': query['consumer'][-1], 'last_seq': seq}
+
+
+def respond(target, if_none_match=None, manager=None, method='GET'):
+    """Answer one request; runs on a worker thread.
+
+    Returns (status, headers, body bytes). The ETag covers the request,
+    the date and the current table versions, so a matching If-None-Match
+    is answered with 304 before any query runs. The change feed is never
+    cached, and a consumer acknowledges its position with a POST, so GETs
+    never write.
+    """
+    manager = manager or get_connection_manager()
+    url = urlsplit(target)
+    query = parse_qs(url.query)
+    path = url.path.rstrip('/')
+    if path == '/api/changes/ack':
+        if method != 'POST':
+            raise ApiError(405, "Only POST is supported")
+        return 200, {'Cache-Control': 'no-store'}, json.dumps(_acknowledge(query, manager)).encode('utf-8')
+    if method != 'GET':
+        raise ApiError(405, "Only GET and HEAD are supported")
+    with manager.reader() as conn:
+        return _read(conn, target, path, query, if_none_match)
+
+
+def _read(conn, target, path, query, if_none_match):
+    if path == '/api/changes':
+        return 200, {'Cache-Control': 'no-store'}, json.dumps(_changes(conn, query)).encode('utf-8')
+    if path == '/api/changes/consumers':
+        return 200, {'Cache-Control': 'no-store'}, json.dumps({'consumers': consumer_lag(conn)}).encode('utf-8')
+    # Some functions count from today (listings_expiring_within), so the
+    # tag changes at midnight as well as on writes.
+    versions = sorted(current_table_versions(conn).items())
+    today = date.today().isoformat()
+    etag = '"' + hashlib.sha1(json.dumps([target, today, versions]).encode('utf-8')).hexdigest()[:20] + '"'
+    headers = {'ETag': etag, 'Cache-Control': 'no-cache'}
+
+    if path == '/health':
+        return 200, {}, b'{"status": "ok"}'
+    if if_none_match and etag in [tag.strip() for tag in if_none_match.split(',')]:
+        return 304, headers, b''
+
+    # Distances computed from the synthetic demo gazetteer are not served.
+    distances = path.startswith('/api/analysis') and real_gazetteer_loaded(conn)
+    endpoints = analysis_endpoints(distances)
+    if path == '/api/analysis':
+        body = {'endpoints': sorted(endpoints)}
+    elif path.startswith('/api/analysis/'):
+        function = endpoints.get(path[len('/api/analysis/'):])
+        if function is None:
+            raise ApiError(404, "Unknown analysis function")
+        if 'km' in query and not distances:
+            raise ApiError(400, "Distance search needs a gazetteer with real city coordinates")
+        try:
+            frame = function(conn, **_arguments(function, query))
+        except ValueError as e:
+            # The analysis functions raise ValueError for arguments they reject.
+            raise ApiError(400, str(e))
+        if not hasattr(frame, 'to_json'):
+            body = {'value': frame}
+        else:
+            body = {'rows': json.loads(frame.to_json(orient='records'))}
+    elif path == '/api/listings':
+        body = _listings(conn, query)
+    else:
+        raise ApiError(404, "Not found")
+    return 200, headers, json.dumps(body).encode('utf-8')
+
+
+def _response(status, headers, body, keep_alive, head=False):
+    lines = [f"HTTP/1.1 {status} {REASONS.get(status, 'Error')}"]
+    headers = {**headers, 'Content-Length': str(len(body)), 'Connection': 'keep-alive' if keep_alive else 'close'}
+    if status != 304:
+        headers['Content-Type'] = 'application/json'
+    lines += [f"{name}: {value}" for name, value in headers.items()]
+    return ("\r\n".join(lines) + "\r\n\r\n").encode('latin-1') + (b'' if head else body)
+
+
+async def _read_request(reader):
+    """Return (method, target, version, headers) or None at end of stream."""
+    try:
+        raw = await reader.readuntil(b'\r\n\r\n')
+    except asyncio.IncompleteReadError:
+        return None
+    except asyncio.LimitOverrunError:
+        raise ApiError(400, "Request headers too large")
+    lines = raw.decode('latin-1').split('\r\n')
+    try:
+        method, target, version = lines[0].split(' ')
+    except ValueError:
+        raise ApiError(400, "Malformed request line")
+    headers = {}
+    for line in lines[1:]:
+        if ':' in line:
+            name, value = line.split(':', 1)
+            headers[name.strip().lower()] = value.strip()
+    return method, target, version, headers
+
+
+async def _discard_body(reader, headers):
+    """Skip a request body; the API only reads query parameters."""
+    try:
+        length = int(headers.get('content-length', 0))
+    except ValueError:
+        raise ApiError(400, "Invalid Content-Length")
+    if length > MAX_REQUEST_BYTES:
+        raise ApiError(400, "Request body too large")
+    if length > 0:
+        await reader.readexactly(length)
+
+
+class ApiServer:
+    """asyncio HTTP/1.1 server for the JSON API.
+
+    The event loop only parses requests; every SQLite call runs on a pool
+    of worker threads, each checking a read-only connection out of the
+    manager's pool for the request. The one
+    write, a change feed consumer's POSTed position, goes through the
+    manager's writer.
+    """
+
+    def __init__(self, manager=None, workers=API_WORKERS):
+        self.manager = manager or get_connection_manager()
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='api-worker')
+
+    async def handle(self, reader, writer):
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                try:
+                    request = await _read_request(reader)
+                    if request is None:
+                        break
+                    method, target, version, headers = request
+                    keep_alive = headers.get('connection', '').lower() != 'close' and version == 'HTTP/1.1'
+                    if method not in ('GET', 'HEAD', 'POST'):
+                        raise ApiError(405, "Only GET, HEAD and POST are supported")
+                    await _discard_body(reader, headers)
+                    status, response_headers, body = await loop.run_in_executor(
+                        self.executor, respond, target, headers.get('if-none-match'), self.manager,
+                        'GET' if method == 'HEAD' else method)
+                except ApiError as e:
+                    method, keep_alive = None, False
+                    status, response_headers, body = e.status, {}, json.dumps({'error': str(e)}).encode('utf-8')
+                except Exception as e:
+                    print(f"API request failed: {e}")
+                    method, keep_alive = None, False
+                    status, response_headers, body = 500, {}, b'{"error": "Internal server error"}'
+                writer.write(_response(status, response_headers, body, keep_alive, head=method == 'HEAD'))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host=API_HOST, port=API_PORT):
+        """Start listening and return the asyncio server."""
+        return await asyncio.start_server(self.handle, host, port, limit=MAX_REQUEST_BYTES)
+
+    async def serve_forever(self, host=API_HOST, port=API_PORT):
+        server = await self.start(host, port)
+        async with server:
+            await server.serve_forever()
+
+
+def main(argv=None):
+    """Command-line entry point: serve the JSON API until interrupted."""
+    from database_manager import create_tables
+
+    parser = argparse.ArgumentParser(description="Read-only JSON API for the analysis queries and listings.")
+    parser.add_argument('--db', default='food_wastage.db', help="SQLite database file")
+    parser.add_argument('--host', default=API_HOST)
+    parser.add_argument('--port', type=int, default=API_PORT)
+    parser.add_argument('--workers', type=int, default=API_WORKERS, help="Worker threads for SQLite calls")
+    args = parser.parse_args(argv)
+
+    manager = get_connection_manager(args.db)
+    with manager.writer() as writer:
+        create_tables(writer)
+    start_compactor(manager=manager)
+    print(f"Serving on http://{args.host}:{args.port}/api/analysis")
+    try:
+        asyncio.run(ApiServer(manager, args.workers).serve_forever(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
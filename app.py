@@ -1,108 +1,236 @@
-import streamlit as st
-import pandas as pd
 import sqlite3
-from database_manager import create_connection, create_tables, load_data, get_data
-from data_analysis import *
+import streamlit as st
+from database_manager import create_connection, get_connection_manager
+
+# Pages import their modules when they are first shown, so a cold start
+# only pays for Streamlit, pandas and the page being rendered.
+
+@st.cache_resource(show_spinner="Preparing the database...")
+def prepare_database():
+    """Apply migrations, load changed CSVs and start the background threads, once per process.
+
+    Running `python ingestion.py` before starting the app does the same
+    work as a separate pre-start step; this then only checks the schema
+    version and the CSV fingerprints.
+    """
+    from change_feed import start_compactor
+    from database_manager import create_tables, load_data
+    from expiry_sweeper import start_sweeper
+
+    with get_connection_manager().writer() as writer:
+        create_tables(writer)
+        load_data(writer)
+    # Archiving expired and fully claimed listings in the background is
+    # opt-in (FOOD_WASTAGE_SWEEPER=1); otherwise this does nothing.
+    start_sweeper()
+    start_compactor()
+
+@st.cache_resource(max_entries=6, show_spinner="Building the listing store...")
+def shared_store(table, version, _conn):
+    """Return the coded store of a table at a version, shared by every session.
+
+    The version is part of the key, so the first call after a write builds
+    a new store; older versions are dropped once max_entries is reached.
+    """
+    from listing_store import load_store
+
+    return load_store(_conn, table)
+
+def get_shared_store(conn, table):
+    from database_manager import current_table_versions
+
+    return shared_store(table, current_table_versions(conn).get(table), conn)
 
 def main():
     st.set_page_config(layout="wide")
     st.title("Local Food Wastage Management System 🍎♻️")
 
-    conn = create_connection()
-    if conn:
-        try:
-            create_tables(conn)
-            load_data(conn)
-        except Exception as e:
-            st.error(f"Failed to connect or load data: {e}")
-
     st.sidebar.title("Navigation")
-    page = st.sidebar.radio("Go to", ["Dashboard", "Detailed Analysis", "Food Listings", "Provider Actions", "SQL Query Runner"])
+    page = st.sidebar.radio("Go to", ["Dashboard", "Detailed Analysis", "Food Listings", "Provider Actions", "Matching", "SQL Query Runner", "Query Monitor"])
+
+    try:
+        prepare_database()
+    except Exception as e:
+        st.error(f"Failed to connect or load data: {e}")
+    # The page holds one pooled read connection for the whole run.
+    with create_connection() as conn:
+        show_page(page, conn)
 
+def show_page(page, conn):
     if page == "Dashboard":
+        import inspect
+
+        from change_feed import live_refresh_seconds, refresh_metrics
+        from data_analysis import (
+            CLAIM_PERIODS, claims_trend_by_city, claims_trend_by_meal_type, claims_trend_by_status, table_row_count,
+        )
+
         st.header("Analytics Dashboard")
         st.subheader("Key Metrics at a Glance")
 
-        col1, col2, col3 = st.columns(3)
-        
-        total_food_df = total_food_available(conn)
-        total_food = total_food_df.iloc[0]['Total_Available_Food'] if not total_food_df.empty else 0
-        with col1:
-            st.metric("Total Food Available (Units)", f"{total_food:,}")
-            
-        total_providers = run_query(conn, "SELECT COUNT(*) FROM providers").iloc[0, 0]
-        with col2:
-            st.metric("Total Food Providers", f"{total_providers:,}")
-            
-        total_receivers = run_query(conn, "SELECT COUNT(*) FROM receivers").iloc[0, 0]
-        with col3:
-            st.metric("Total Receivers", f"{total_receivers:,}")
+        # Live updates rerun only the metrics below, as a fragment with
+        # run_every (Streamlit 1.37, as pinned in the requirements). On an
+        # older install the metrics catch up on every rerun and with the
+        # refresh button instead.
+        fragment = getattr(st, 'fragment', None) or getattr(st, 'experimental_fragment', None)
+        can_refresh = fragment is not None and 'run_every' in inspect.signature(fragment).parameters
+        refresh = live_refresh_seconds()
+        if can_refresh:
+            live_updates = st.checkbox(f"Live updates (every {refresh:g} s)", value=refresh > 0, disabled=refresh <= 0)
+        else:
+            live_updates = False
+            st.button("Refresh metrics")
 
-        st.markdown("---")
-        
-        st.subheader("High-Impact Insights")
-        
-        # Display the most claimed meal type as a clear metric or chart
-        most_claimed_df = most_claimed_meal_type(conn)
-        if not most_claimed_df.empty:
-            most_claimed_meal = most_claimed_df.iloc[0]['Meal_Type']
-            most_claimed_count = most_claimed_df.iloc[0]['Total_Claims']
-            st.info(f"The most claimed meal type is **{most_claimed_meal}** with **{most_claimed_count}** claims.")
+        def show_metrics():
+            # A fragment rerun comes after the page's run has returned its
+            # connection to the pool, so the metrics check out their own.
+            with get_connection_manager().reader() as conn:
+                show_live_metrics(conn)
+
+        def show_live_metrics(conn):
+            # The metrics are read once per session and then kept current
+            # from the change log, so each refresh only reads the changes
+            # since the last one.
+            previous = st.session_state.get('live_metrics')
+            live, applied = refresh_metrics(conn, previous)
+            st.session_state['live_metrics'] = live
+
+            def delta(key):
+                if previous is None or applied is None or live[key] == previous[key]:
+                    return None
+                return f"{live[key] - previous[key]:+,}"
+
+            st.caption(f"As of change {live['seq']:,}" + (f", {applied:,} new since the last refresh." if applied else "."))
+
+            col1, col2, col3 = st.columns(3)
+
+            with col1:
+                st.metric("Total Food Available (Units)", f"{live['total_food']:,}", delta=delta('total_food'))
+
+            total_providers = table_row_count(conn, 'providers')
+            with col2:
+                st.metric("Total Food Providers", f"{total_providers:,}")
+
+            total_receivers = table_row_count(conn, 'receivers')
+            with col3:
+                st.metric("Total Receivers", f"{total_receivers:,}")
+
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.metric("Live Listings", f"{live['listings']:,}", delta=delta('listings'))
+            with col2:
+                st.metric("Claims", f"{live['claims']:,}", delta=delta('claims'))
+            with col3:
+                pending = live['claims_by_status'].get('Pending', 0)
+                st.metric("Pending Claims", f"{pending:,}")
+
+            st.markdown("---")
+
+            st.subheader("High-Impact Insights")
+
+            # Display the most claimed meal type as a clear metric or chart
+            claimed = {meal: count for meal, count in live['claims_by_meal_type'].items() if count > 0}
+            if claimed:
+                most_claimed_meal = max(claimed, key=claimed.get)
+                most_claimed_count = claimed[most_claimed_meal]
+                st.info(f"The most claimed meal type is **{most_claimed_meal}** with **{most_claimed_count}** claims.")
+
+        if live_updates:
+            fragment(run_every=refresh)(show_metrics)()
+        else:
+            show_metrics()
 
         # You can also add charts here for visualization, e.g.,
         # st.bar_chart(most_common_food_types(conn).set_index('Food_Type'))
+
+        st.markdown("---")
+        st.subheader("Claims Over Time")
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            trend_range = st.date_input("Date range", value=[], key='trend_range')
+        with col2:
+            trend_period = st.selectbox("Period", list(CLAIM_PERIODS), index=2)
+        with col3:
+            trend_by = st.selectbox("Split by", ["Status", "City", "Meal Type"])
+        start, end = (str(trend_range[0]), str(trend_range[-1])) if trend_range else (None, None)
+        trend_function = {
+            "Status": claims_trend_by_status,
+            "City": claims_trend_by_city,
+            "Meal Type": claims_trend_by_meal_type,
+        }[trend_by]
+        trend_df = trend_function(conn, trend_period, start, end)
+        if not trend_df.empty:
+            st.line_chart(trend_df.pivot(index='Period', columns=trend_df.columns[1], values='Claims').fillna(0))
+        else:
+            st.info("No claims in this range.")
         
     elif page == "Detailed Analysis":
+        from analysis_executor import run_reports
+        from data_analysis import (
+            avg_food_claimed_per_receiver, city_with_most_listings, claim_status_percentages, claims_per_food_item,
+            listings_by_expiry_date, most_claimed_meal_type, most_common_food_types, most_contributing_provider_type,
+            providers_receivers_per_city, top_provider_by_successful_claims, top_receivers, total_donated_by_provider,
+            total_food_available, unclaimed_food_items,
+        )
+
         st.header("Comprehensive Data Analysis")
         st.markdown("Here you can find detailed reports and all 15 key insights from the project.")
 
-        st.subheader("Providers & Receivers")
-        st.write("1. Providers and Receivers per City:")
-        st.dataframe(providers_receivers_per_city(conn))
-        st.write("2. Most Contributing Provider Type:")
-        st.dataframe(most_contributing_provider_type(conn))
-        st.write("3. Receivers with Most Food Claimed:")
-        st.dataframe(top_receivers(conn))
-        st.write("4. What is the total quantity of food donated by each provider?")
-        st.dataframe(total_donated_by_provider(conn))
-        
-        st.markdown("---")
-        
-        st.subheader("Listings & Availability")
-        st.write("5. Total Quantity of Available Food:")
-        st.dataframe(total_food_available(conn))
-        st.write("6. City with Highest Number of Food Listings:")
-        st.dataframe(city_with_most_listings(conn))
-        st.write("7. Most Commonly Available Food Types:")
-        st.dataframe(most_common_food_types(conn))
-        st.write("8. Food Listings by Expiry Date:")
-        st.dataframe(listings_by_expiry_date(conn))
+        # Every report gets a placeholder in page order; the reports run on the
+        # analysis thread pool and each table is filled in as soon as its
+        # query finishes.
+        sections = [
+            ("Providers & Receivers", [
+                ("1. Providers and Receivers per City:", providers_receivers_per_city),
+                ("2. Most Contributing Provider Type:", most_contributing_provider_type),
+                ("3. Receivers with Most Food Claimed:", top_receivers),
+                ("4. What is the total quantity of food donated by each provider?", total_donated_by_provider),
+            ]),
+            ("Listings & Availability", [
+                ("5. Total Quantity of Available Food:", total_food_available),
+                ("6. City with Highest Number of Food Listings:", city_with_most_listings),
+                ("7. Most Commonly Available Food Types:", most_common_food_types),
+                ("8. Food Listings by Expiry Date:", listings_by_expiry_date),
+            ]),
+            ("Claims & Distribution", [
+                ("9. Claims per Food Item:", claims_per_food_item),
+                ("10. Top Provider by Successful Claims:", top_provider_by_successful_claims),
+                ("11. Claim Status Percentages:", claim_status_percentages),
+                ("12. Average Quantity of Food Claimed per Receiver:", avg_food_claimed_per_receiver),
+                ("13. Most Claimed Meal Type:", most_claimed_meal_type),
+                ("14. Unclaimed Food Items:", unclaimed_food_items),
+            ]),
+        ]
 
-        st.markdown("---")
+        placeholders = {}
+        for section, reports in sections:
+            st.subheader(section)
+            for title, function in reports:
+                st.write(title)
+                placeholders[title] = st.empty()
+                placeholders[title].caption("Loading...")
+            st.markdown("---")
 
-        st.subheader("Claims & Distribution")
-        st.write("9. Claims per Food Item:")
-        st.dataframe(claims_per_food_item(conn))
-        st.write("10. Top Provider by Successful Claims:")
-        st.dataframe(top_provider_by_successful_claims(conn))
-        st.write("11. Claim Status Percentages:")
-        st.dataframe(claim_status_percentages(conn))
-        st.write("12. Average Quantity of Food Claimed per Receiver:")
-        st.dataframe(avg_food_claimed_per_receiver(conn))
-        st.write("13. Most Claimed Meal Type:")
-        st.dataframe(most_claimed_meal_type(conn))
-        st.write("14. Unclaimed Food Items:")
-        st.dataframe(unclaimed_food_items(conn))
-        
-        st.markdown("---")
+        reports = {title: function for _, section_reports in sections for title, function in section_reports}
+        for title, result, error in run_reports(reports):
+            if error is not None:
+                placeholders[title].error(f"Could not load this report: {error}")
+            else:
+                placeholders[title].dataframe(result)
 
     elif page == "Food Listings":
+        import pandas as pd
+
+        from data_analysis import cities_within
+        from database_manager import LISTINGS_PAGE_SIZE, count_listings, get_filter_options, get_listings_page
+        from proximity import NEARBY_KM, real_gazetteer_loaded
+
         # ... (rest of the code for Food Listings page)
         st.header("Available Food Listings")
-        all_listings = get_data(conn, 'food_listings')
-        all_cities = sorted(all_listings['Location'].unique())
-        all_provider_types = sorted(all_listings['Provider_Type'].unique())
-        all_food_types = sorted(all_listings['Food_Type'].unique())
+        filter_options = get_filter_options(conn)
+        all_cities = filter_options['Location']
+        all_provider_types = filter_options['Provider_Type']
+        all_food_types = filter_options['Food_Type']
         
         st.markdown("---")
 
@@ -114,54 +242,106 @@ def main():
         with col3:
             food_type_filter = st.multiselect("Filter by Food Type", all_food_types)
 
+        # The bundled coordinates are synthetic, so the distance filter is
+        # only offered once a real gazetteer has been loaded.
+        near_receiver = 0
+        if real_gazetteer_loaded(conn):
+            near_col, km_col = st.columns(2)
+            with near_col:
+                near_receiver = st.number_input("Near Receiver ID (0 for anywhere)", min_value=0, step=1)
+            with km_col:
+                near_km = st.slider("Within km", min_value=1, max_value=200, value=int(NEARBY_KM))
+
         search_query = st.text_input("Search for a food item (e.g., 'Pizza', 'Salad')", "")
+        # Expired listings stay in food_listings until the expiry sweeper
+        # archives them, so they are hidden rather than gone.
+        include_expired = st.checkbox("Include expired listings")
+
+        # Near a receiver, the city filter becomes the cities within near_km
+        # of the receiver's city (narrowed to any cities selected above).
+        distances = {}
+        cities = city_filter
+        if near_receiver:
+            receiver = conn.execute("SELECT City FROM receivers WHERE Receiver_ID = ?", (int(near_receiver),)).fetchone()
+            if receiver is None:
+                st.warning(f"No receiver with ID {near_receiver}.")
+            else:
+                nearby = cities_within(conn, receiver[0], near_km)
+                distances = dict(zip(nearby['City'], nearby['Distance_km']))
+                cities = [city for city in distances if not city_filter or city in city_filter]
+                st.caption(f"{len(distances)} cities within {near_km} km of {receiver[0]}.")
         st.markdown("---")
 
-        filtered_df = all_listings.copy()
-        if city_filter:
-            filtered_df = filtered_df[filtered_df['Location'].isin(city_filter)]
-        if provider_type_filter:
-            filtered_df = filtered_df[filtered_df['Provider_Type'].isin(provider_type_filter)]
-        if food_type_filter:
-            filtered_df = filtered_df[filtered_df['Food_Type'].isin(food_type_filter)]
-        if search_query:
-            filtered_df = filtered_df[filtered_df['Food_Name'].str.contains(search_query, case=False)]
-
-        st.subheader(f"Showing {len(filtered_df)} available listings")
+        filters = {
+            'cities': cities,
+            'provider_types': provider_type_filter,
+            'food_types': food_type_filter,
+            'search': search_query,
+            'include_expired': include_expired,
+        }
+        # Keyset pagination: remember the last Food_ID of every page shown so
+        # far, and start over whenever the filters or the page size change.
+        page_size = st.selectbox("Listings per page", [12, 24, 48], index=[12, 24, 48].index(LISTINGS_PAGE_SIZE))
+        filter_key = (repr(filters), page_size)
+        if st.session_state.get('listings_filter_key') != filter_key:
+            st.session_state['listings_filter_key'] = filter_key
+            st.session_state['listings_cursors'] = [None]
+        cursors = st.session_state['listings_cursors']
+
+        if distances and not cities:
+            # None of the selected cities is near the receiver; an empty
+            # city filter would match every listing instead.
+            total_listings, page_df, has_next = 0, pd.DataFrame(), False
+        else:
+            total_listings = count_listings(conn, **filters)
+            page_df, has_next = get_listings_page(conn, after_id=cursors[-1], page_size=page_size, **filters)
+
+        kind = "listings" if include_expired else "available listings"
+        st.subheader(f"Showing {len(page_df)} of {total_listings} {kind} (page {len(cursors)})")
         
         num_cols = 3 
         cols = st.columns(num_cols)
         
-        for index, row in filtered_df.iterrows():
-            col = cols[index % num_cols]
+        for position, row in enumerate(page_df.itertuples(index=False)):
+            col = cols[position % num_cols]
             with col:
                 with st.container(border=True):
-                    st.markdown(f"**{row['Food_Name']}**")
-                    st.write(f"**Quantity:** {row['Quantity']} units")
-                    st.write(f"**Location:** {row['Location']}")
-                    st.write(f"**Expires:** {row['Expiry_Date']}")
+                    st.markdown(f"**{row.Food_Name}**")
+                    st.write(f"**Quantity:** {row.Quantity} units")
+                    if row.Location in distances:
+                        st.write(f"**Location:** {row.Location} ({distances[row.Location]:.1f} km)")
+                    else:
+                        st.write(f"**Location:** {row.Location}")
+                    st.write(f"**Expires:** {row.Expiry_Date}")
                     
                     with st.expander("More Details"):
-                        provider_name_query = f"SELECT Name, Contact, Address FROM providers WHERE Provider_ID = {row['Provider_ID']}"
-                        provider_details = run_query(conn, provider_name_query)
-                        if not provider_details.empty:
-                            provider_name = provider_details.iloc[0]['Name']
-                            provider_contact = provider_details.iloc[0]['Contact']
-                            provider_address = provider_details.iloc[0]['Address']
-                            st.write(f"**Provided by:** {provider_name}")
-                            st.write(f"**Contact:** {provider_contact}")
-                            st.write(f"**Address:** {provider_address}")
-                        st.write(f"**Food Type:** {row['Food_Type']}")
-                        st.write(f"**Meal Type:** {row['Meal_Type']}")
+                        if row.Provider_Name is not None:
+                            st.write(f"**Provided by:** {row.Provider_Name}")
+                            st.write(f"**Contact:** {row.Provider_Contact}")
+                            st.write(f"**Address:** {row.Provider_Address}")
+                        st.write(f"**Food Type:** {row.Food_Type}")
+                        st.write(f"**Meal Type:** {row.Meal_Type}")
         
-        if filtered_df.empty:
+        if page_df.empty:
             st.warning("No listings match your filter criteria. Please adjust your selections.")
 
+        prev_col, next_col = st.columns(2)
+        with prev_col:
+            st.button("Previous page", disabled=len(cursors) == 1, on_click=cursors.pop)
+        with next_col:
+            next_cursor = int(page_df['Food_ID'].iloc[-1]) if has_next else None
+            st.button("Next page", disabled=not has_next, on_click=cursors.append, args=(next_cursor,))
+
     elif page == "Provider Actions":
+        from bulk_import import LISTING_COLUMNS, bulk_import_listings, read_listings_file
+        from claim_processing import ClaimConflict, listing_state, update_quantity
+        from database_manager import bump_table_versions, write_connection
+        from instrumentation import execute_write
+
         # ... (rest of the code for Provider Actions page)
         st.header("Provider CRUD Operations")
         
-        tab1, tab2, tab3 = st.tabs(["Add Listing", "Update Listing", "Delete Listing"])
+        tab1, tab2, tab3, tab4 = st.tabs(["Add Listing", "Update Listing", "Delete Listing", "Bulk Import"])
         
         with tab1:
             st.subheader("Add a New Food Listing")
@@ -177,11 +357,11 @@ def main():
                 
                 submitted = st.form_submit_button("Add Listing")
                 if submitted:
-                    cursor = conn.cursor()
                     try:
-                        cursor.execute("INSERT INTO food_listings (Food_Name, Quantity, Expiry_Date, Provider_ID, Provider_Type, Location, Food_Type, Meal_Type) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", 
-                                       (food_name, quantity, expiry_date, provider_id, provider_type, location, food_type, meal_type))
-                        conn.commit()
+                        with write_connection() as writer:
+                            execute_write(writer, "INSERT INTO food_listings (Food_Name, Quantity, Expiry_Date, Provider_ID, Provider_Type, Location, Food_Type, Meal_Type) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", 
+                                          (food_name, quantity, expiry_date, provider_id, provider_type, location, food_type, meal_type))
+                            bump_table_versions(writer, ['food_listings'])
                         st.success("Listing added successfully!")
                     except sqlite3.Error as e:
                         st.error(f"Error adding listing: {e}")
@@ -189,60 +369,263 @@ def main():
         with tab2:
             st.subheader("Update an Existing Listing")
             listing_id_to_update = st.number_input("Enter Food ID to update", min_value=1)
+            # Remember the version the listing had when it was loaded; the
+            # update is refused if a claim or another edit changed it since.
+            listing = listing_state(conn, int(listing_id_to_update))
+            if st.session_state.get('update_listing_id') != listing_id_to_update:
+                st.session_state['update_listing_id'] = listing_id_to_update
+                st.session_state['update_listing_version'] = listing[2] if listing else None
+                st.session_state['update_listing_conflict'] = None
+
+            # The update and the confirmation run as callbacks, before the
+            # page is drawn, so a conflict is shown on the same rerun. After a
+            # conflict the listing's state at that moment is kept, updates are
+            # blocked, and confirming adopts exactly the version shown.
+            def submit_update():
+                food_id = int(st.session_state['update_listing_id'])
+                try:
+                    st.session_state['update_listing_version'] = update_quantity(
+                        food_id, int(st.session_state['update_new_quantity']), st.session_state['update_listing_version'])
+                    st.session_state['update_listing_result'] = ('success', f"Listing {food_id} updated successfully!")
+                except ClaimConflict:
+                    st.session_state['update_listing_conflict'] = listing_state(conn, food_id)
+                except ValueError as e:
+                    st.session_state['update_listing_result'] = ('error', str(e))
+                except sqlite3.Error as e:
+                    st.session_state['update_listing_result'] = ('error', f"Error updating listing: {e}")
+
+            def confirm_update():
+                st.session_state['update_listing_version'] = st.session_state['update_listing_conflict'][2]
+                st.session_state['update_listing_conflict'] = None
+
+            conflict = st.session_state.get('update_listing_conflict')
+            if conflict is not None:
+                st.warning(f"Listing {listing_id_to_update} changed since it was loaded: it now has Quantity "
+                           f"{conflict[0]}, of which {conflict[1]} reserved by claims. Confirm to update it "
+                           f"against these values.")
+                st.button("Update against these values", key='update_listing_confirm', on_click=confirm_update)
+            elif listing is not None:
+                st.caption(f"Quantity {listing[0]}, of which {listing[1]} reserved by claims.")
             with st.form("update_listing_form"):
-                new_quantity = st.number_input("New Quantity", min_value=1, step=1)
-                update_submitted = st.form_submit_button("Update Listing")
-                if update_submitted:
-                    cursor = conn.cursor()
-                    try:
-                        cursor.execute("UPDATE food_listings SET Quantity = ? WHERE Food_ID = ?", (new_quantity, listing_id_to_update))
-                        conn.commit()
-                        st.success(f"Listing {listing_id_to_update} updated successfully!")
-                    except sqlite3.Error as e:
-                        st.error(f"Error updating listing: {e}")
+                st.number_input("New Quantity", min_value=1, step=1, key='update_new_quantity')
+                st.form_submit_button("Update Listing", on_click=submit_update, disabled=conflict is not None)
+            result = st.session_state.pop('update_listing_result', None)
+            if result is not None:
+                getattr(st, result[0])(result[1])
 
         with tab3:
             st.subheader("Delete a Food Listing")
             listing_id_to_delete = st.number_input("Enter Food ID to delete", min_value=1, key='delete_input')
             delete_submitted = st.button("Delete Listing", key='delete_button')
             if delete_submitted:
-                cursor = conn.cursor()
                 try:
-                    cursor.execute("DELETE FROM food_listings WHERE Food_ID = ?", (listing_id_to_delete,))
-                    conn.commit()
+                    with write_connection() as writer:
+                        execute_write(writer, "DELETE FROM food_listings WHERE Food_ID = ?", (listing_id_to_delete,))
+                        bump_table_versions(writer, ['food_listings'])
                     st.success(f"Listing {listing_id_to_delete} deleted successfully!")
                 except sqlite3.Error as e:
                     st.error(f"Error deleting listing: {e}")
 
+        with tab4:
+            st.subheader("Import Listings from a File")
+            st.markdown(f"Upload a CSV with a header row, or a JSON list of objects, with the columns: {', '.join(LISTING_COLUMNS)}.")
+            uploaded = st.file_uploader("Listings file", type=['csv', 'json'])
+            if uploaded is not None and st.button("Import Listings", key='bulk_import_button'):
+                try:
+                    frame = read_listings_file(uploaded, uploaded.name.rsplit('.', 1)[-1].lower())
+                    inserted, errors = bulk_import_listings(conn, frame)
+                    if inserted:
+                        st.success(f"Imported {inserted:,} listing(s).")
+                    if not errors.empty:
+                        st.warning(f"{len(errors):,} row(s) were rejected.")
+                        st.dataframe(errors, hide_index=True)
+                        st.download_button(
+                            label="Download Error Report",
+                            data=errors.to_csv(index=False).encode('utf-8'),
+                            file_name="import_errors.csv",
+                            mime="text/csv",
+                        )
+                except ValueError as e:
+                    st.error(f"Could not read the file: {e}")
+                except sqlite3.Error as e:
+                    st.error(f"Error importing listings: {e}")
+
+    elif page == "Matching":
+        from matching import MAX_PER_RECEIVER, propose_matches, save_matches
+
+        st.header("Match Listings to Receivers 🤝")
+        st.markdown("Open listings are matched to receivers by expiry date, city and each receiver's completed-claim rate. Matches are proposals until they are saved as Pending claims.")
+        col1, col2 = st.columns(2)
+        with col1:
+            as_of = st.date_input("Treat listings expiring before this date as expired")
+        with col2:
+            max_per_receiver = st.number_input("Maximum Pending claims per receiver", min_value=1, value=MAX_PER_RECEIVER, step=1)
+        if st.button("Propose Matches"):
+            st.session_state['proposed_matches'] = propose_matches(conn, as_of, int(max_per_receiver))
+        matches = st.session_state.get('proposed_matches')
+        if matches is not None:
+            if matches.empty:
+                st.info("No open listings could be matched.")
+            else:
+                st.success(f"{len(matches):,} listing(s) matched.")
+                st.dataframe(matches, hide_index=True)
+                if st.button("Create Pending Claims"):
+                    try:
+                        created = save_matches(matches)
+                        del st.session_state['proposed_matches']
+                        st.success(f"{created:,} Pending claim(s) created.")
+                    except sqlite3.Error as e:
+                        st.error(f"Error creating claims: {e}")
+
     elif page == "SQL Query Runner":
+        import time
+        from query_runner import (
+            EXPORT_FORMATS, MAX_DOWNLOAD_BYTES, PREVIEW_ROWS, STATEMENT_TIMEOUT, ExportTooLarge, QueryCancelled,
+            QueryControl, QueryTimeout, export_to_file, new_export_path, preview, read_only_connection, remove_export,
+            run_in_background,
+        )
+
         st.header("Manual SQL Query Runner 🚀")
         st.warning("⚠️ This feature allows you to run custom SQL commands. Use it for authorized administrative tasks only.")
         
         query = st.text_area("Enter your SQL query here:", height=200, help="e.g., SELECT * FROM food_listings WHERE Quantity > 50;")
-        
-        if st.button("Run Query"):
+
+        option_col1, option_col2 = st.columns(2)
+        with option_col1:
+            timeout = st.number_input("Timeout (seconds)", min_value=1, value=int(STATEMENT_TIMEOUT), step=5)
+        with option_col2:
+            export_format = st.selectbox("Download format", list(EXPORT_FORMATS))
+
+        run_col, export_col, cancel_col = st.columns(3)
+        with run_col:
+            run_clicked = st.button("Run Query")
+        with export_col:
+            export_clicked = st.button("Prepare Download")
+        with cancel_col:
+            # Clicking Cancel reruns the script, which interrupts the polling
+            # loop below; its finally block then stops the statement.
+            st.button("Cancel")
+
+        if run_clicked or export_clicked:
             if query:
+                control = QueryControl(timeout=timeout)
+                export_path = None
+                if run_clicked:
+                    def work(conn):
+                        return preview(conn, query, control=control)
+                else:
+                    export_path = new_export_path(export_format)
+
+                    def work(conn):
+                        return export_to_file(conn, query, export_path, export_format, control=control,
+                                              max_bytes=MAX_DOWNLOAD_BYTES)
+
+                # Each statement gets its own read-only connection, closed
+                # when it finishes, rather than a pooled one.
+                def run():
+                    with read_only_connection(get_connection_manager().path) as conn:
+                        return work(conn)
+
+                future = run_in_background(run)
+
+                status = st.empty()
+                started = time.monotonic()
                 try:
-                    result_df = run_query(conn, query)
-                    if not result_df.empty:
-                        st.success("Query executed successfully!")
-                        st.dataframe(result_df)
-                        
-                        csv_data = result_df.to_csv(index=False).encode('utf-8')
-                        st.download_button(
-                            label="Download Data as CSV",
-                            data=csv_data,
-                            file_name="query_results.csv",
-                            mime="text/csv",
-                        )
+                    while not future.done():
+                        status.caption(f"Running... {time.monotonic() - started:.1f} s")
+                        time.sleep(0.2)
+                    status.empty()
+                    result = future.result()
+                    if run_clicked:
+                        result_df, truncated = result
+                        if not result_df.empty:
+                            st.success("Query executed successfully!")
+                            if truncated:
+                                st.info(f"Showing the first {PREVIEW_ROWS:,} rows. Use Prepare Download for the full result.")
+                            st.dataframe(result_df)
+                        else:
+                            st.info("Query executed successfully, but no results were returned.")
                     else:
-                        st.info("Query executed successfully, but no results were returned.")
-                except pd.io.sql.DatabaseError as e:
+                        st.success(f"Export ready ({result:,} bytes).")
+                        mime, suffix = EXPORT_FORMATS[export_format]
+                        with open(export_path, 'rb') as export_file:
+                            st.download_button(
+                                label=f"Download Data as {export_format.upper()}",
+                                data=export_file,
+                                file_name=f"query_results.{suffix}",
+                                mime=mime,
+                            )
+                except (QueryCancelled, QueryTimeout) as e:
+                    st.warning(str(e))
+                except ExportTooLarge as e:
+                    st.warning(f"{e} Downloads from this page are limited to that size; narrow the query, "
+                               f"or export it with `python query_runner.py \"<query>\" <file>`.")
+                except sqlite3.Error as e:
                     st.error(f"SQL Error: {e}")
                 except Exception as e:
                     st.error(f"An unexpected error occurred: {e}")
+                finally:
+                    control.cancel()
+                    # The download button holds its own copy of the data,
+                    # so the file is not needed past this run.
+                    if export_path is not None:
+                        future.add_done_callback(lambda _: remove_export(export_path))
             else:
                 st.warning("Please enter a query to run.")
 
+    elif page == "Query Monitor":
+        import pandas as pd
+        import instrumentation
+        from query_cache import get_query_cache
+
+        st.header("Query Monitor")
+        st.markdown(f"Timings for the last {instrumentation.RING_SIZE} database calls made by this server process.")
+
+        entries = instrumentation.records()
+        if not entries:
+            st.info("No queries have been recorded yet.")
+        else:
+            st.subheader("Slowest Queries")
+            slowest_df = pd.DataFrame(instrumentation.slowest(50))
+            slowest_df['ms'] = slowest_df['seconds'] * 1000.0
+            st.dataframe(slowest_df[['at', 'kind', 'caller', 'ms', 'rows', 'bytes', 'cached', 'error', 'query']])
+
+            st.subheader("Latency per Function")
+            latency_df = pd.DataFrame.from_dict(instrumentation.latency_by_caller(), orient='index')
+            st.dataframe(latency_df.sort_values('p95_ms', ascending=False))
+
+            st.subheader("Query Plan")
+            distinct_queries = {}
+            for entry in entries:
+                if entry['kind'] != 'write':
+                    distinct_queries[entry['query'].strip()] = entry['params']
+            selected = st.selectbox("Select a recorded query", list(distinct_queries))
+            if selected:
+                st.code(selected, language='sql')
+                try:
+                    plan = instrumentation.explain(conn, selected, distinct_queries[selected])
+                    st.dataframe(pd.DataFrame(plan, columns=['id', 'parent', 'detail']))
+                except sqlite3.Error as e:
+                    st.error(f"Could not explain this query: {e}")
+
+        col1, col2 = st.columns(2)
+        with col1:
+            st.subheader("Result Cache")
+            st.json(get_query_cache().stats())
+        with col2:
+            st.subheader("Connections")
+            st.json(get_connection_manager().stats())
+
+        st.subheader("Listing Store")
+        st.markdown("Memory of each table loaded as a plain DataFrame, as every session would hold it, next to the "
+                    "coded store that all sessions share.")
+        # Building the stores reads every listing, so the report only runs
+        # when asked for.
+        if st.button("Compare memory"):
+            from listing_store import memory_report
+
+            report = memory_report(conn, get_shared_store)
+            st.dataframe(pd.DataFrame.from_dict(report, orient='index'))
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
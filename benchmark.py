@@ -0,0 +1,422 @@
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+import data_analysis
+from analysis_registry import SAMPLE_ARGUMENTS, analysis_functions
+from database_manager import configure_connection, count_listings, create_tables, get_listings_page, load_data
+from ingestion import SOURCES
+from matching import propose_matches
+from proximity import GAZETTEER_FILE, load_gazetteer, synthetic_gazetteer
+from query_cache import get_query_cache
+
+FOOD_NAMES = ['Bread', 'Soup', 'Fruits', 'Vegetables', 'Dairy', 'Rice', 'Pasta', 'Salad', 'Chicken', 'Fish']
+FOOD_TYPES = ['Vegetarian', 'Non-Vegetarian', 'Vegan']
+MEAL_TYPES = ['Breakfast', 'Lunch', 'Dinner', 'Snacks']
+PROVIDER_TYPES = ['Restaurant', 'Grocery Store', 'Supermarket', 'Catering Service']
+RECEIVER_TYPES = ['NGO', 'Shelter', 'Charity', 'Individual']
+CLAIM_STATUSES = ['Pending', 'Completed', 'Cancelled']
+
+# Zipf exponent for city and provider popularity: a few large cities and
+# busy providers, and a long tail, as in the production data.
+SKEW = 1.1
+
+CHUNK_ROWS = 500_000
+
+# Modules timed by the startup benchmark, in import order: the framework,
+# the app module itself, then the modules its pages import on first use.
+STARTUP_MODULES = [
+    'streamlit', 'pandas', 'app', 'database_manager', 'data_analysis', 'analysis_executor', 'expiry_sweeper',
+    'bulk_import', 'matching', 'query_runner',
+]
+
+# Run in a fresh interpreter: render the app once with AppTest, then rerun
+# it, and print the timings as JSON.
+_FIRST_RENDER_SCRIPT = '''
+import json, sys, time
+started = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+imported = time.perf_counter()
+app = AppTest.from_file(sys.argv[1], default_timeout=300)
+app.run()
+rendered = time.perf_counter()
+app.run()
+print(json.dumps({
+    'streamlit_import_s': imported - started,
+    'first_render_s': rendered - imported,
+    'time_to_first_render_s': rendered - started,
+    'rerun_s': time.perf_counter() - rendered,
+    'exceptions': len(app.exception),
+}))
+'''
+
+
+def parse_size(text):
+    """Parse sizes such as '10k', '1m' or '2500' into an integer."""
+    text = str(text).strip().lower()
+    multiplier = {'k': 1_000, 'm': 1_000_000}.get(text[-1:], 1)
+    return int(float(text.rstrip('km')) * multiplier)
+
+
+def dataset_shape(n_claims):
+    """Return the row counts of every table for a given number of claims."""
+    n_people = max(1_000, n_claims // 50)
+    return {
+        'providers': n_people,
+        'receivers': n_people,
+        'food_listings': n_claims,
+        'claims': n_claims,
+        'cities': max(100, n_people // 2),
+    }
+
+
+def _zipf_choice(rng, n, size):
+    """Draw ids 1..n with Zipf-like skew, shuffled so id order carries no meaning."""
+    weights = 1.0 / np.arange(1, n + 1) ** SKEW
+    ranks = rng.choice(n, size=size, p=weights / weights.sum())
+    return rng.permutation(n)[ranks] + 1
+
+
+def _people(rng, table, key, n, cities, types):
+    ids = np.arange(1, n + 1)
+    frame = pd.DataFrame({
+        key: ids,
+        'Name': [f"{table[:-1].title()} {i}" for i in ids],
+        'Type': rng.choice(types, size=n),
+    })
+    if table == 'providers':
+        frame['Address'] = [f"{i} Main Street" for i in ids]
+    frame['City'] = cities[_zipf_choice(rng, len(cities), n) - 1]
+    frame['Contact'] = [f"+1-555-{i:07d}" for i in ids]
+    return frame
+
+
+def city_names(n_claims):
+    """Return the synthetic city names of a dataset with n_claims claims."""
+    return [f"City {i}" for i in range(1, dataset_shape(n_claims)['cities'] + 1)]
+
+
+def generate_tables(n_claims, seed=0, chunk_rows=CHUNK_ROWS):
+    """Yield (table name, DataFrame chunk) for a synthetic dataset.
+
+    Listings inherit the provider's city and type, providers and cities are
+    Zipf-skewed, and claims favour popular listings. Large tables are
+    produced in chunks of chunk_rows so 10M-row datasets fit in memory.
+    """
+    rng = np.random.default_rng(seed)
+    shape = dataset_shape(n_claims)
+    cities = np.array(city_names(n_claims), dtype=object)
+
+    providers = _people(rng, 'providers', 'Provider_ID', shape['providers'], cities, PROVIDER_TYPES)
+    yield 'providers', providers
+    yield 'receivers', _people(rng, 'receivers', 'Receiver_ID', shape['receivers'], cities, RECEIVER_TYPES)
+
+    today = date.today()
+    for start in range(0, shape['food_listings'], chunk_rows):
+        size = min(chunk_rows, shape['food_listings'] - start)
+        provider_ids = _zipf_choice(rng, shape['providers'], size)
+        provider_rows = providers.iloc[provider_ids - 1]
+        expiry_offsets = rng.integers(-30, 60, size=size)
+        yield 'food_listings', pd.DataFrame({
+            'Food_ID': np.arange(start + 1, start + size + 1),
+            'Food_Name': rng.choice(FOOD_NAMES, size=size),
+            'Quantity': rng.integers(1, 51, size=size),
+            'Expiry_Date': [(today + timedelta(days=int(d))).isoformat() for d in expiry_offsets],
+            'Provider_ID': provider_ids,
+            'Provider_Type': provider_rows['Type'].to_numpy(),
+            'Location': provider_rows['City'].to_numpy(),
+            'Food_Type': rng.choice(FOOD_TYPES, size=size),
+            'Meal_Type': rng.choice(MEAL_TYPES, size=size),
+        })
+
+    now = datetime.now().replace(microsecond=0)
+    for start in range(0, shape['claims'], chunk_rows):
+        size = min(chunk_rows, shape['claims'] - start)
+        minutes_ago = rng.integers(0, 365 * 24 * 60, size=size)
+        yield 'claims', pd.DataFrame({
+            'Claim_ID': np.arange(start + 1, start + size + 1),
+            'Food_ID': _zipf_choice(rng, shape['food_listings'], size),
+            'Receiver_ID': _zipf_choice(rng, shape['receivers'], size),
+            'Status': rng.choice(CLAIM_STATUSES, size=size),
+            'Timestamp': [(now - timedelta(minutes=int(m))).isoformat(sep=' ') for m in minutes_ago],
+        })
+
+
+def write_csvs(out_dir, n_claims, seed=0):
+    """Write the four source CSVs that ingestion reads, and their gazetteer, into out_dir."""
+    os.makedirs(out_dir, exist_ok=True)
+    written = set()
+    for table, chunk in generate_tables(n_claims, seed):
+        path = os.path.join(out_dir, SOURCES[table][0])
+        chunk.to_csv(path, mode='a' if table in written else 'w', header=table not in written, index=False)
+        written.add(table)
+    synthetic_gazetteer(city_names(n_claims)).to_csv(os.path.join(out_dir, GAZETTEER_FILE), index=False)
+
+
+def fill_database(conn, n_claims, seed=0):
+    """Create the schema and insert a synthetic dataset directly, chunk by chunk."""
+    create_tables(conn)
+    for table, chunk in generate_tables(n_claims, seed):
+        columns = list(chunk.columns)
+        conn.execute("BEGIN")
+        conn.executemany(
+            f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})",
+            chunk.astype(object).itertuples(index=False, name=None),
+        )
+        conn.commit()
+    load_gazetteer(conn, synthetic_gazetteer(city_names(n_claims)))
+    conn.execute("ANALYZE")
+
+
+def summarize(samples):
+    """Return latency percentiles in milliseconds for a list of durations in seconds."""
+    values = np.array(samples) * 1000.0
+    return {
+        'runs': len(values),
+        'min_ms': float(values.min()),
+        'p50_ms': float(np.percentile(values, 50)),
+        'p90_ms': float(np.percentile(values, 90)),
+        'p99_ms': float(np.percentile(values, 99)),
+        'max_ms': float(values.max()),
+        'mean_ms': float(values.mean()),
+    }
+
+
+def measure(function, repeats, before_each=None):
+    """Time repeated calls and record the peak traced memory across them."""
+    samples = []
+    tracemalloc.start()
+    try:
+        for _ in range(repeats):
+            if before_each:
+                before_each()
+            started = time.perf_counter()
+            function()
+            samples.append(time.perf_counter() - started)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {**summarize(samples), 'peak_memory_bytes': peak}
+
+
+def benchmark_load_data(data_dir, repeats):
+    """Time a full load into an empty database and a no-change reload."""
+    results = {}
+    with tempfile.TemporaryDirectory() as scratch:
+        paths = iter(os.path.join(scratch, f"load_{i}.db") for i in range(repeats))
+        conns = []
+
+        def fresh_load():
+            conn = configure_connection(sqlite3.connect(next(paths)))
+            conns.append(conn)
+            create_tables(conn)
+            load_data(conn, data_dir=data_dir)
+
+        results['load_data_full'] = measure(fresh_load, repeats)
+        results['load_data_unchanged'] = measure(lambda: load_data(conns[-1], data_dir=data_dir), repeats)
+        for conn in conns:
+            conn.close()
+    return results
+
+
+def benchmark_queries(conn, repeats):
+    """Time every data_analysis function with a cold result cache."""
+    results = {}
+    clear = get_query_cache().clear
+    for function in analysis_functions():
+        arguments = [SAMPLE_ARGUMENTS[function.__name__](conn)] if function.__name__ in SAMPLE_ARGUMENTS else []
+        results[function.__name__] = measure(lambda: function(conn, *arguments), repeats, before_each=clear)
+    return results
+
+
+def benchmark_listings(conn, repeats):
+    """Time the Food Listings page: count plus first and later filtered pages."""
+    city = conn.execute("SELECT City FROM summary_city ORDER BY Listings DESC LIMIT 1").fetchone()[0]
+    cases = {
+        'unfiltered': {},
+        'city_and_type': {'cities': [city], 'food_types': ['Vegan']},
+        'search': {'search': 'ri'},
+    }
+    results = {}
+    for name, filters in cases.items():
+        def first_page():
+            count_listings(conn, **filters)
+            get_listings_page(conn, **filters)
+
+        def later_page():
+            get_listings_page(conn, after_id=conn.execute("SELECT MAX(Food_ID) / 2 FROM food_listings").fetchone()[0], **filters)
+
+        results[f"listings_{name}_first_page"] = measure(first_page, repeats)
+        results[f"listings_{name}_later_page"] = measure(later_page, repeats)
+    return results
+
+
+def benchmark_matching(conn, repeats):
+    """Time a full re-match of every open listing with a cold result cache."""
+    return {'propose_matches': measure(lambda: propose_matches(conn, as_of=date.today()), repeats,
+                                       before_each=get_query_cache().clear)}
+
+
+def import_times(modules=STARTUP_MODULES, repeats=5):
+    """Time importing each module in a fresh interpreter with python -X importtime.
+
+    Modules are imported in order, so each one is charged only for what the
+    ones before it did not already load. Returns {module: percentiles} of
+    the cumulative import time.
+    """
+    app_dir = os.path.dirname(os.path.abspath(__file__))
+    samples = {module: [] for module in modules}
+    for _ in range(repeats):
+        completed = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', '; '.join(f"import {module}" for module in modules)],
+            cwd=app_dir, capture_output=True, text=True, check=True,
+        )
+        for line in completed.stderr.splitlines():
+            if not line.startswith('import time:') or line.count('|') != 2:
+                continue
+            _, cumulative, name = line.split('|')
+            # Top-level imports are not indented under another module.
+            if name.startswith('  ') or name.strip() not in samples:
+                continue
+            if cumulative.strip().isdigit():
+                samples[name.strip()].append(int(cumulative) / 1e6)
+    return {module: summarize(values) for module, values in samples.items() if values}
+
+
+def benchmark_startup(db_path, data_dir=None, repeats=3):
+    """Time cold starts of the Streamlit app against a copy of a database.
+
+    Every start is a new interpreter rendering the default page with
+    AppTest: time_to_first_render covers importing Streamlit, the app and
+    the page's modules, schema setup and ingestion, and the first page.
+    rerun is the next script run in the same process.
+    """
+    app_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app.py')
+    env = {**os.environ, 'FOOD_WASTAGE_SWEEP_INTERVAL': '0', 'FOOD_WASTAGE_DASHBOARD_REFRESH': '0',
+           'PYTHONPATH': os.pathsep.join(filter(None, [os.path.dirname(app_path), os.environ.get('PYTHONPATH')]))}
+    runs = []
+    with tempfile.TemporaryDirectory() as scratch:
+        shutil.copy(db_path, os.path.join(scratch, 'food_wastage.db'))
+        for source_file, _ in SOURCES.values():
+            if data_dir and os.path.exists(os.path.join(data_dir, source_file)):
+                shutil.copy2(os.path.join(data_dir, source_file), scratch)
+        for _ in range(repeats):
+            completed = subprocess.run([sys.executable, '-c', _FIRST_RENDER_SCRIPT, app_path],
+                                       cwd=scratch, env=env, capture_output=True, text=True, check=True)
+            runs.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+    results = {key: summarize([run[key] for run in runs])
+               for key in ('streamlit_import_s', 'first_render_s', 'time_to_first_render_s', 'rerun_s')}
+    results['exceptions'] = sum(run['exceptions'] for run in runs)
+    return results
+
+
+def run_startup_benchmarks(db_path, data_dir=None, repeats=3):
+    """Run the import-time and first-render benchmarks and return the report as a dict."""
+    return {
+        'database': db_path,
+        'repeats': repeats,
+        'python': platform.python_version(),
+        # Without cached bytecode every run also compiles the app's modules.
+        'bytecode_cache': not sys.flags.dont_write_bytecode,
+        'started_at': datetime.now().isoformat(timespec='seconds'),
+        'import_times': import_times(repeats=repeats),
+        'first_render': benchmark_startup(db_path, data_dir, repeats),
+    }
+
+
+def run_benchmarks(n_claims, repeats=5, seed=0, data_dir=None, include_load=True):
+    """Generate a dataset, run every benchmark and return the report as a dict."""
+    report = {
+        'claims': n_claims,
+        'shape': dataset_shape(n_claims),
+        'seed': seed,
+        'repeats': repeats,
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'started_at': datetime.now().isoformat(timespec='seconds'),
+        'results': {},
+    }
+    with tempfile.TemporaryDirectory() as scratch:
+        if include_load:
+            data_dir = data_dir or os.path.join(scratch, 'csv')
+            if not os.path.exists(os.path.join(data_dir, SOURCES['claims'][0])):
+                write_csvs(data_dir, n_claims, seed)
+            report['results'].update(benchmark_load_data(data_dir, repeats))
+
+        conn = configure_connection(sqlite3.connect(os.path.join(scratch, 'bench.db'), isolation_level=None))
+        fill_database(conn, n_claims, seed)
+        report['results'].update(benchmark_queries(conn, repeats))
+        report['results'].update(benchmark_listings(conn, repeats))
+        report['results'].update(benchmark_matching(conn, repeats))
+        conn.close()
+    report['max_rss_kb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return report
+
+
+def main(argv=None):
+    """Command-line entry point: generate datasets or run the benchmark suite."""
+    parser = argparse.ArgumentParser(description="Synthetic data generator and benchmark runner.")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    generate = commands.add_parser('generate', help="Write the four source CSVs, or fill a database directly")
+    generate.add_argument('--claims', default='10k', help="Number of claims, e.g. 10k, 1m, 10m")
+    generate.add_argument('--seed', type=int, default=0)
+    generate.add_argument('--out-dir', help="Directory for the CSVs")
+    generate.add_argument('--db', help="Database file to fill instead of writing CSVs")
+
+    run = commands.add_parser('run', help="Time the analysis queries, load_data, the listings page and matching")
+    run.add_argument('--claims', default='10k', help="Number of claims, e.g. 10k, 1m, 10m")
+    run.add_argument('--seed', type=int, default=0)
+    run.add_argument('--repeats', type=int, default=5)
+    run.add_argument('--data-dir', help="Reuse CSVs generated earlier instead of writing new ones")
+    run.add_argument('--skip-load', action='store_true', help="Do not benchmark load_data")
+    run.add_argument('--output', help="Write the JSON report here instead of stdout")
+
+    startup = commands.add_parser('startup', help="Time module imports and the app's time to first render")
+    startup.add_argument('--db', default='food_wastage.db', help="Database to copy for every cold start")
+    startup.add_argument('--data-dir', help="Directory with the source CSVs to ingest on startup")
+    startup.add_argument('--repeats', type=int, default=3)
+    startup.add_argument('--output', help="Write the JSON report here instead of stdout")
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'startup':
+        report = run_startup_benchmarks(args.db, args.data_dir, args.repeats)
+    elif args.command == 'generate':
+        n_claims = parse_size(args.claims)
+        if args.db:
+            conn = configure_connection(sqlite3.connect(args.db, isolation_level=None))
+            try:
+                fill_database(conn, n_claims, args.seed)
+            finally:
+                conn.close()
+        else:
+            write_csvs(args.out_dir or '.', n_claims, args.seed)
+        return 0
+    else:
+        report = run_benchmarks(parse_size(args.claims), args.repeats, args.seed, args.data_dir,
+                                include_load=not args.skip_load)
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    else:
+        print(output)
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
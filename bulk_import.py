@@ -0,0 +1,107 @@
+import json
+
+import pandas as pd
+
+from database_manager import bump_table_versions, get_connection_manager, parse_dates
+
+LISTING_COLUMNS = ['Food_Name', 'Quantity', 'Expiry_Date', 'Provider_ID', 'Provider_Type',
+                   'Location', 'Food_Type', 'Meal_Type']
+TEXT_COLUMNS = ['Food_Name', 'Provider_Type', 'Location', 'Food_Type', 'Meal_Type']
+
+IMPORT_CHUNK_ROWS = 500
+
+# SQLite's default limit on host parameters in one statement is 999.
+LOOKUP_CHUNK = 900
+
+
+def read_listings_file(file, fmt):
+    """Read an uploaded CSV or JSON (list of records) file into a DataFrame of strings."""
+    if fmt == 'csv':
+        return pd.read_csv(file, dtype=str, keep_default_na=False)
+    if fmt == 'json':
+        # Null values and missing keys become '' so they fail the empty-field checks.
+        return pd.DataFrame(json.load(file)).fillna('').astype(str)
+    raise ValueError(f"Unsupported file format: {fmt}")
+
+
+def _existing_provider_ids(conn, provider_ids):
+    found = set()
+    ids = [int(i) for i in provider_ids]
+    for start in range(0, len(ids), LOOKUP_CHUNK):
+        chunk = ids[start:start + LOOKUP_CHUNK]
+        rows = conn.execute(
+            f"SELECT Provider_ID FROM providers WHERE Provider_ID IN ({', '.join('?' for _ in chunk)})", chunk)
+        found.update(row[0] for row in rows)
+    return found
+
+
+def validate_listings(conn, frame):
+    """Validate uploaded listings in one vectorized pass.
+
+    Returns (valid rows ready to insert, error report). The error report
+    has one row per rejected input row with its 1-based Row number and
+    all of its problems.
+    """
+    missing = [column for column in LISTING_COLUMNS if column not in frame.columns]
+    if missing:
+        raise ValueError(f"Missing column(s): {', '.join(missing)}")
+
+    frame = frame[LISTING_COLUMNS].reset_index(drop=True)
+    text = frame[TEXT_COLUMNS].fillna('').astype(str).apply(lambda column: column.str.strip())
+    quantity = pd.to_numeric(frame['Quantity'], errors='coerce')
+    provider_id = pd.to_numeric(frame['Provider_ID'], errors='coerce')
+    expiry = parse_dates(frame['Expiry_Date'].astype(str).str.strip())
+
+    valid_ids = provider_id.notna() & (provider_id % 1 == 0)
+    known = _existing_provider_ids(conn, provider_id[valid_ids].unique())
+
+    problems = pd.DataFrame({
+        'Quantity must be a positive whole number': ~(quantity.notna() & (quantity > 0) & (quantity % 1 == 0)),
+        'Expiry_Date is not a valid date': expiry.isna(),
+        'Provider_ID is not a whole number': ~valid_ids,
+        'Provider_ID does not exist': valid_ids & ~provider_id.isin(known),
+    })
+    for column in TEXT_COLUMNS:
+        problems[f"{column} is empty"] = text[column] == ''
+
+    flagged = problems.stack()
+    flagged = flagged[flagged]
+    errors = (
+        flagged.reset_index()
+        .rename(columns={'level_0': 'Row', 'level_1': 'Error'})
+        .groupby('Row')['Error'].agg('; '.join)
+        .reset_index()
+    )
+    errors['Row'] += 1
+
+    ok = ~problems.any(axis=1)
+    valid = text[ok].copy()
+    valid['Quantity'] = quantity[ok].astype(int)
+    valid['Provider_ID'] = provider_id[ok].astype(int)
+    valid['Expiry_Date'] = expiry[ok].dt.strftime('%Y-%m-%d')
+    return valid[LISTING_COLUMNS], errors
+
+
+def insert_listings(valid, chunk_rows=IMPORT_CHUNK_ROWS):
+    """Insert validated listings with executemany, one transaction per chunk.
+
+    Returns the number of rows inserted.
+    """
+    query = (
+        f"INSERT INTO food_listings ({', '.join(LISTING_COLUMNS)}) "
+        f"VALUES ({', '.join('?' for _ in LISTING_COLUMNS)})"
+    )
+    records = list(valid.astype(object).itertuples(index=False, name=None))
+    manager = get_connection_manager()
+    for start in range(0, len(records), chunk_rows):
+        with manager.write() as writer:
+            writer.executemany(query, records[start:start + chunk_rows])
+            bump_table_versions(writer, ['food_listings'])
+    return len(records)
+
+
+def bulk_import_listings(conn, frame, chunk_rows=IMPORT_CHUNK_ROWS):
+    """Validate and insert a batch of listings; returns (inserted count, error report)."""
+    valid, errors = validate_listings(conn, frame)
+    inserted = insert_listings(valid, chunk_rows) if not valid.empty else 0
+    return inserted, errors
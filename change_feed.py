@@ -0,0 +1,337 @@
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from database_manager import get_connection_manager
+
+# Every insert, update and delete on food_listings and claims is appended
+# to change_log by triggers. Seq only grows (AUTOINCREMENT), so a consumer
+# keeps the last Seq it has seen and asks for everything after it.
+# Compaction deletes a prefix of the log; a cursor from before the oldest
+# remaining entry has to start again from a fresh snapshot.
+# change_consumers keeps the last Seq each named consumer has
+# acknowledged. Both tables and the triggers come from migration 11 in
+# migrations.py.
+
+CHANGE_PAGE_SIZE = 1000
+MAX_CHANGE_PAGE_SIZE = 10000
+
+# Entries younger than CHANGE_MIN_AGE_HOURS are kept for readers that do
+# not register as consumers, such as dashboard sessions. Older ones go
+# once every consumer has acknowledged them, or after
+# CHANGE_MAX_AGE_HOURS regardless.
+CHANGE_MIN_AGE_HOURS = 1
+CHANGE_MAX_AGE_HOURS = 7 * 24
+COMPACT_BATCH_ROWS = 10000
+
+# The app and the API server compact the log on a background thread every
+# FOOD_WASTAGE_COMPACT_INTERVAL seconds (COMPACT_INTERVAL by default); 0
+# turns it off.
+COMPACT_INTERVAL = 600
+COMPACT_INTERVAL_ENV = 'FOOD_WASTAGE_COMPACT_INTERVAL'
+
+# Seconds between refreshes of the live dashboard metrics; 0 turns the
+# auto-refresh off.
+LIVE_REFRESH_SECONDS = 5
+LIVE_REFRESH_ENV = 'FOOD_WASTAGE_DASHBOARD_REFRESH'
+
+# A snapshot is cheaper than replaying more changes than this.
+MAX_REPLAY_CHANGES = 50000
+
+# Old and New are JSON images of the row. Listing images carry how many
+# claims the listing has and claim images the meal type of their listing,
+# so the dashboard metrics can follow the summaries without extra reads.
+CHANGE_TABLES = ('food_listings', 'claims')
+
+BOUNDS_QUERY = """
+SELECT
+    (SELECT MIN(Seq) FROM change_log),
+    COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'change_log'), 0)
+"""
+
+CHANGES_QUERY = """
+SELECT Seq, Table_Name, Row_ID, Operation, Old, New, Changed_At
+FROM change_log
+WHERE Seq > ? AND Table_Name IN (SELECT value FROM json_each(?))
+ORDER BY Seq
+LIMIT ?
+"""
+
+CONSUMER_LAG_QUERY = """
+SELECT
+    c.Consumer,
+    c.Last_Seq,
+    MAX(b.Latest - c.Last_Seq, 0) AS Lag,
+    COALESCE(strftime('%s', 'now') - strftime('%s', (
+        SELECT Changed_At FROM change_log WHERE Seq > c.Last_Seq ORDER BY Seq LIMIT 1)), 0) AS Seconds_Behind,
+    c.Last_Seq < COALESCE(b.First, b.Latest + 1) - 1 AS Needs_Snapshot,
+    c.Updated_At
+FROM change_consumers c
+CROSS JOIN (
+    SELECT
+        (SELECT MIN(Seq) FROM change_log) AS First,
+        COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'change_log'), 0) AS Latest
+) b
+ORDER BY Lag DESC, c.Consumer
+"""
+
+# Deletes up to :batch of the oldest entries that compaction allows: those
+# no newer than the last entry older than :min_age once every consumer has
+# acknowledged them, and those no newer than the last entry older than
+# :max_age regardless. The bound is computed by the DELETE itself, in the
+# same transaction, so an acknowledgement or a new consumer that commits
+# first is always taken into account.
+COMPACT_QUERY = """
+DELETE FROM change_log
+WHERE Seq <= (
+    SELECT MIN(
+        (SELECT MIN(Seq) FROM change_log) + :batch - 1,
+        MIN(c.Min_Age, MAX(c.Max_Age, COALESCE(c.Acknowledged, c.Min_Age)))
+    )
+    FROM (
+        SELECT
+            COALESCE((SELECT Seq FROM change_log WHERE Changed_At < datetime('now', :min_age)
+                      ORDER BY Changed_At DESC, Seq DESC LIMIT 1), 0) AS Min_Age,
+            COALESCE((SELECT Seq FROM change_log WHERE Changed_At < datetime('now', :max_age)
+                      ORDER BY Changed_At DESC, Seq DESC LIMIT 1), 0) AS Max_Age,
+            (SELECT MIN(Last_Seq) FROM change_consumers) AS Acknowledged
+    ) c
+)
+"""
+
+
+@contextmanager
+def _read_transaction(conn):
+    # Reads made inside the block see one snapshot of the database.
+    conn.execute("BEGIN")
+    try:
+        yield conn
+    finally:
+        conn.rollback()
+
+
+def _bounds(conn):
+    """Return (first, latest): the oldest Seq still in the log and the newest ever assigned."""
+    first, latest = conn.execute(BOUNDS_QUERY).fetchone()
+    return (first if first is not None else latest + 1), latest
+
+
+def latest_seq(conn):
+    """Return the newest Seq ever assigned, 0 before the first change."""
+    return _bounds(conn)[1]
+
+
+def changes_since(conn, after_seq=0, limit=CHANGE_PAGE_SIZE, tables=None):
+    """Return the changes after after_seq, oldest first, as a dict.
+
+    'changes' holds up to limit entries with Old and New decoded, and
+    'next_seq' is the cursor to pass next time. 'reset' is True when
+    entries after after_seq were already compacted away; the caller must
+    rebuild its state and continue from 'latest_seq'.
+    """
+    tables = list(tables or CHANGE_TABLES)
+    limit = max(1, min(int(limit), MAX_CHANGE_PAGE_SIZE))
+    after_seq = int(after_seq)
+    with _read_transaction(conn):
+        first, latest = _bounds(conn)
+        if after_seq < first - 1:
+            return {'changes': [], 'next_seq': latest, 'latest_seq': latest, 'has_more': False, 'reset': True}
+        rows = conn.execute(CHANGES_QUERY, (after_seq, json.dumps(tables), limit + 1)).fetchall()
+    has_more = len(rows) > limit
+    changes = [
+        {
+            'Seq': seq, 'Table_Name': table, 'Row_ID': row_id, 'Operation': operation,
+            'Old': json.loads(old) if old else None, 'New': json.loads(new) if new else None,
+            'Changed_At': changed_at,
+        }
+        for seq, table, row_id, operation, old, new, changed_at in rows[:limit]
+    ]
+    next_seq = changes[-1]['Seq'] if has_more else max(latest, after_seq)
+    return {'changes': changes, 'next_seq': next_seq, 'latest_seq': latest, 'has_more': has_more, 'reset': False}
+
+
+def acknowledge(consumer, seq, manager=None):
+    """Record that consumer has processed every change up to seq."""
+    with (manager or get_connection_manager()).write() as writer:
+        writer.execute(
+            "INSERT INTO change_consumers (Consumer, Last_Seq, Updated_At) VALUES (?, ?, datetime('now')) "
+            "ON CONFLICT(Consumer) DO UPDATE SET Last_Seq = excluded.Last_Seq, Updated_At = excluded.Updated_At",
+            (consumer, int(seq)),
+        )
+
+
+def consumer_lag(conn):
+    """Return one dict per consumer: its Last_Seq, Lag in changes, Seconds_Behind and Needs_Snapshot."""
+    cursor = conn.execute(CONSUMER_LAG_QUERY)
+    names = [column[0] for column in cursor.description]
+    return [dict(zip(names, row)) for row in cursor.fetchall()]
+
+
+def compact(min_age_hours=CHANGE_MIN_AGE_HOURS, max_age_hours=CHANGE_MAX_AGE_HOURS,
+            batch_rows=COMPACT_BATCH_ROWS, manager=None):
+    """Delete old change_log entries, batch_rows per transaction; returns the number deleted.
+
+    An entry goes once it is older than min_age_hours and every consumer
+    has acknowledged it, or once it is older than max_age_hours.
+    """
+    manager = manager or get_connection_manager()
+    params = {'batch': batch_rows, 'min_age': f'-{min_age_hours} hours', 'max_age': f'-{max_age_hours} hours'}
+    deleted = 0
+    while True:
+        with manager.write() as writer:
+            count = writer.execute(COMPACT_QUERY, params).rowcount
+        deleted += count
+        if count < batch_rows:
+            return deleted
+
+
+_compactor = None
+_compactor_lock = threading.Lock()
+
+
+def _compact_forever(interval, manager):
+    while True:
+        time.sleep(interval)
+        try:
+            compact(manager=manager)
+        except sqlite3.Error as e:
+            print(f"Change log compaction failed: {e}")
+
+
+def start_compactor(interval=None, manager=None):
+    """Start the background compaction thread once per process and return it.
+
+    The interval defaults to FOOD_WASTAGE_COMPACT_INTERVAL or
+    COMPACT_INTERVAL seconds; returns None when it is 0.
+    """
+    global _compactor
+    if interval is None:
+        interval = float(os.environ.get(COMPACT_INTERVAL_ENV, COMPACT_INTERVAL))
+    if interval <= 0:
+        return None
+    with _compactor_lock:
+        if _compactor is None:
+            _compactor = threading.Thread(
+                target=_compact_forever, args=(interval, manager or get_connection_manager()),
+                name='change-log-compactor', daemon=True,
+            )
+            _compactor.start()
+        return _compactor
+
+
+def live_refresh_seconds():
+    """Return the dashboard refresh interval from FOOD_WASTAGE_DASHBOARD_REFRESH."""
+    return float(os.environ.get(LIVE_REFRESH_ENV, LIVE_REFRESH_SECONDS))
+
+
+def snapshot_metrics(conn):
+    """Read the dashboard metrics from the summaries, with the Seq they are current as of."""
+    with _read_transaction(conn):
+        seq = _bounds(conn)[1]
+        total_food, listings = conn.execute(
+            "SELECT COALESCE(SUM(Quantity), 0), COALESCE(SUM(Listings), 0) FROM summary_city").fetchone()
+        claims_by_status = dict(conn.execute("SELECT Status, Claims FROM summary_claim_status WHERE Claims != 0"))
+        claims_by_meal_type = dict(conn.execute("SELECT Meal_Type, Claims FROM summary_meal_type WHERE Claims != 0"))
+    return {
+        'seq': seq,
+        'total_food': total_food,
+        'listings': listings,
+        'claims': sum(claims_by_status.values()),
+        'claims_by_status': claims_by_status,
+        'claims_by_meal_type': claims_by_meal_type,
+    }
+
+
+def _add(counts, key, amount):
+    if key is None or not amount:
+        return
+    counts[key] = counts.get(key, 0) + amount
+    if not counts[key]:
+        del counts[key]
+
+
+def apply_changes(metrics, changes):
+    """Return metrics updated by a list of changes, following the summary triggers."""
+    metrics = {
+        **metrics,
+        'claims_by_status': dict(metrics['claims_by_status']),
+        'claims_by_meal_type': dict(metrics['claims_by_meal_type']),
+    }
+    for change in changes:
+        for image, sign in ((change['Old'], -1), (change['New'], 1)):
+            if image is None:
+                continue
+            if change['Table_Name'] == 'food_listings':
+                metrics['total_food'] += sign * (image['Quantity'] or 0)
+                metrics['listings'] += sign
+                _add(metrics['claims_by_meal_type'], image['Meal_Type'], sign * image['Listing_Claims'])
+            elif change['Table_Name'] == 'claims':
+                metrics['claims'] += sign
+                _add(metrics['claims_by_status'], image['Status'], sign)
+                _add(metrics['claims_by_meal_type'], image['Listing_Meal_Type'], sign)
+        metrics['seq'] = change['Seq']
+    return metrics
+
+
+def refresh_metrics(conn, metrics=None):
+    """Bring dashboard metrics up to date; returns (metrics, changes applied).
+
+    Without metrics, or when the log no longer reaches back to them or is
+    too far ahead, the metrics are read again from the summaries and the
+    count is None.
+    """
+    if metrics is None or latest_seq(conn) - metrics['seq'] > MAX_REPLAY_CHANGES:
+        return snapshot_metrics(conn), None
+    applied = 0
+    while True:
+        feed = changes_since(conn, metrics['seq'], MAX_CHANGE_PAGE_SIZE)
+        if feed['reset']:
+            return snapshot_metrics(conn), None
+        metrics = apply_changes(metrics, feed['changes'])
+        metrics['seq'] = feed['next_seq']
+        applied += len(feed['changes'])
+        if not feed['has_more']:
+            return metrics, applied
+
+
+def main(argv=None):
+    """Command-line entry point: show the feed, consumer lag, or compact the log."""
+    from database_manager import ConnectionManager, configure_connection, create_tables
+
+    parser = argparse.ArgumentParser(description="Inspect and compact the change-data-capture log.")
+    parser.add_argument('--db', default='food_wastage.db', help="SQLite database file")
+    parser.add_argument('--after', type=int, help="Print the changes after this Seq")
+    parser.add_argument('--limit', type=int, default=20)
+    parser.add_argument('--compact', action='store_true', help="Delete entries every consumer has seen")
+    parser.add_argument('--min-age-hours', type=float, default=CHANGE_MIN_AGE_HOURS)
+    parser.add_argument('--max-age-hours', type=float, default=CHANGE_MAX_AGE_HOURS)
+    args = parser.parse_args(argv)
+
+    conn = configure_connection(sqlite3.connect(args.db))
+    try:
+        create_tables(conn)
+        if args.compact:
+            deleted = compact(args.min_age_hours, args.max_age_hours, manager=ConnectionManager(args.db))
+            print(f"Compacted {deleted:,} change(s).")
+        first, latest = _bounds(conn)
+        print(f"change_log: Seq {first} to {latest}")
+        if args.after is not None:
+            feed = changes_since(conn, args.after, args.limit)
+            if feed['reset']:
+                print(f"Changes after {args.after} were compacted; start from {feed['latest_seq']}.")
+            for change in feed['changes']:
+                print(json.dumps(change))
+        for row in consumer_lag(conn):
+            print(f"{row['Consumer']}: Last_Seq={row['Last_Seq']} Lag={row['Lag']} "
+                  f"Seconds_Behind={row['Seconds_Behind']} Needs_Snapshot={bool(row['Needs_Snapshot'])}")
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,94 @@
+import argparse
+import re
+import sqlite3
+
+from analysis_registry import SAMPLE_ARGUMENTS, analysis_functions
+from claims_history import PARTITION_PATTERN
+from database_manager import TABLE_VERSIONS_QUERY, create_tables
+from query_cache import get_query_cache
+from summaries import SUMMARY_SOURCES
+
+FULL_SCAN = re.compile(r'^SCAN (\w+)(?: AS (\w+))?$')
+
+# A table named in FROM or JOIN and its alias, if any. Newer SQLite
+# versions name a table only by its alias in plan lines.
+TABLE_ALIAS = re.compile(
+    r'\b(?:FROM|JOIN)\s+(\w+)(?:\s+(?:AS\s+)?(?!(?:ON|USING|WHERE|JOIN|LEFT|INNER|CROSS|NATURAL|GROUP|ORDER|LIMIT)\b)(\w+))?',
+    re.IGNORECASE,
+)
+
+
+def captured_queries(conn, function):
+    """Run an analysis function and return the SQL statements it executed.
+
+    The result cache is cleared first so every query reaches SQLite, and
+    the cache's own version lookups are left out.
+    """
+    arguments = [SAMPLE_ARGUMENTS[function.__name__](conn)] if function.__name__ in SAMPLE_ARGUMENTS else []
+    get_query_cache().clear()
+    statements = []
+    conn.set_trace_callback(statements.append)
+    try:
+        function(conn, *arguments)
+    finally:
+        conn.set_trace_callback(None)
+    return [
+        s for s in statements
+        if s.lstrip().upper().startswith(('SELECT', 'WITH')) and s != TABLE_VERSIONS_QUERY
+    ]
+
+
+def table_aliases(query):
+    """Return {alias: table} for the tables a query names in FROM and JOIN."""
+    return {alias or table: table for table, alias in TABLE_ALIAS.findall(query)}
+
+
+def full_scans(conn, query):
+    """Return the plan lines of a query that scan a table without an index.
+
+    Summary tables hold one row per group and are meant to be read whole,
+    also under an alias, and so are the schema table and a monthly claim
+    partition that a range read has picked.
+    """
+    plan = conn.execute(f"EXPLAIN QUERY PLAN {query}").fetchall()
+    aliases = table_aliases(query)
+    failures = []
+    for line in (row[3] for row in plan):
+        match = FULL_SCAN.match(line)
+        table = aliases.get(match.group(1), match.group(1)) if match else None
+        if match and table not in SUMMARY_SOURCES and table != 'sqlite_master' and not PARTITION_PATTERN.match(table):
+            failures.append(line)
+    return failures
+
+
+def check(conn):
+    """Return a list of (function name, plan line) for every full table scan."""
+    failures = []
+    for function in analysis_functions():
+        for query in captured_queries(conn, function):
+            failures.extend((function.__name__, line) for line in full_scans(conn, query))
+    return failures
+
+
+def main(argv=None):
+    """Command-line entry point: exits non-zero if any analysis query does a full scan."""
+    parser = argparse.ArgumentParser(description="Fail if an analysis query plan contains a full table scan.")
+    parser.add_argument('--db', default='food_wastage.db', help="SQLite database file")
+    args = parser.parse_args(argv)
+
+    conn = sqlite3.connect(args.db)
+    try:
+        create_tables(conn)
+        functions = analysis_functions()
+        failures = check(conn)
+    finally:
+        conn.close()
+
+    for name, line in failures:
+        print(f"FULL SCAN in {name}: {line}")
+    print(f"Checked {len(functions)} analysis queries, {len(failures)} full scan(s).")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,234 @@
+import random
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+from database_manager import bump_table_versions, get_connection_manager
+
+# Pending and Completed claims hold their Claimed_Quantity of the
+# listing; cancelling a claim gives its quantity back.
+CLAIM_STATUSES = ('Pending', 'Completed', 'Cancelled')
+_ACTIVE = "IN ('Pending', 'Completed')"
+
+# A write that finds the database locked by another process is retried
+# after BUSY_BACKOFF seconds, doubling (with jitter) on every attempt.
+BUSY_RETRIES = 8
+BUSY_BACKOFF = 0.01
+
+# Times a claim is re-read and retried after another writer changed the
+# listing between the read and the write.
+CONFLICT_RETRIES = 5
+
+# Reserving changes food_listings.Reserved as well as claims.
+CLAIM_TABLES = ['claims', 'food_listings']
+
+STATE_QUERY = "SELECT Quantity, Reserved, Version FROM food_listings WHERE Food_ID = ?"
+
+# Inserts nothing unless the listing still has the version that was read
+# and enough unreserved quantity; the triggers then reserve it.
+RESERVE_QUERY = """
+INSERT INTO claims (Food_ID, Receiver_ID, Status, Timestamp, Claimed_Quantity)
+SELECT Food_ID, ?, 'Pending', ?, ?
+FROM food_listings
+WHERE Food_ID = ? AND Version = ? AND Quantity - Reserved >= ?
+"""
+
+UPDATE_QUANTITY_QUERY = """
+UPDATE food_listings SET Quantity = ?
+WHERE Food_ID = ? AND Version = ? AND Reserved <= ?
+"""
+
+RESERVED_RECOMPUTE_QUERY = f"""
+SELECT COALESCE(SUM(c.Claimed_Quantity), 0) FROM claims c
+WHERE c.Food_ID = food_listings.Food_ID AND c.Status {_ACTIVE}
+"""
+
+
+class ClaimConflict(Exception):
+    """The listing changed after its version was read."""
+
+
+_stats = {'claims': 0, 'rejected': 0, 'conflicts': 0, 'busy_retries': 0}
+_stats_lock = threading.Lock()
+
+
+def _count(**increments):
+    with _stats_lock:
+        for name, value in increments.items():
+            _stats[name] += value
+
+
+def stats():
+    """Return this process's claim, rejection, conflict and BUSY retry counters."""
+    with _stats_lock:
+        return dict(_stats)
+
+
+def is_busy(error):
+    """Return True when an OperationalError means another connection holds the lock."""
+    code = getattr(error, 'sqlite_errorcode', None)
+    if code is not None:
+        return code & 0xff in (5, 6)  # SQLITE_BUSY, SQLITE_LOCKED
+    return 'locked' in str(error) or 'busy' in str(error)
+
+
+def with_busy_retry(function, retries=BUSY_RETRIES, backoff=BUSY_BACKOFF):
+    """Call function(), retrying with jittered exponential backoff while the database is busy."""
+    for attempt in range(retries + 1):
+        try:
+            return function()
+        except sqlite3.OperationalError as e:
+            if attempt == retries or not is_busy(e):
+                raise
+            _count(busy_retries=1)
+            time.sleep(backoff * 2 ** attempt * random.uniform(0.5, 1.5))
+
+
+def listing_state(conn, food_id):
+    """Return (Quantity, Reserved, Version) of a listing, or None if it does not exist."""
+    return conn.execute(STATE_QUERY, (food_id,)).fetchone()
+
+
+def _claimable(state, quantity, allow_partial):
+    """Return how much of quantity can be reserved from a listing state, 0 for none."""
+    if state is None or quantity <= 0:
+        return 0
+    available = max(0, state[0] - state[1])
+    if allow_partial:
+        return min(quantity, available)
+    return quantity if available >= quantity else 0
+
+
+def _result(food_id, receiver_id, quantity, claimed=0, claim_id=None, reason=None):
+    return {'Food_ID': food_id, 'Receiver_ID': receiver_id, 'Requested': quantity,
+            'Claimed': claimed, 'Claim_ID': claim_id, 'Reason': reason}
+
+
+def _rejection(state):
+    return "unknown listing" if state is None else "not enough quantity left"
+
+
+def _reserve(conn, food_id, receiver_id, quantity, version, timestamp):
+    """Insert the Pending claim if the listing still has version; returns its Claim_ID or None."""
+    cursor = conn.execute(RESERVE_QUERY, (receiver_id, timestamp, quantity, food_id, version, quantity))
+    return cursor.lastrowid if cursor.rowcount else None
+
+
+def claim(food_id, receiver_id, quantity, allow_partial=False, manager=None):
+    """Reserve quantity units of a listing for a receiver as one Pending claim.
+
+    The listing is read without the write lock; the claim is inserted in a
+    BEGIN IMMEDIATE transaction only if the listing's Version is unchanged,
+    otherwise it is read again and retried. With allow_partial, whatever is
+    left up to quantity is claimed. Returns a result dict with Claimed,
+    Claim_ID (None when rejected) and the rejection Reason.
+    """
+    manager = manager or get_connection_manager()
+    for _ in range(CONFLICT_RETRIES + 1):
+        with manager.reader() as conn:
+            state = listing_state(conn, food_id)
+        claimed = _claimable(state, quantity, allow_partial)
+        if not claimed:
+            _count(rejected=1)
+            return _result(food_id, receiver_id, quantity, reason=_rejection(state))
+
+        def reserve():
+            with manager.write() as writer:
+                claim_id = _reserve(writer, food_id, receiver_id, claimed, state[2],
+                                    datetime.now().isoformat(sep=' ', timespec='seconds'))
+                if claim_id is not None:
+                    bump_table_versions(writer, CLAIM_TABLES)
+                return claim_id
+
+        claim_id = with_busy_retry(reserve)
+        if claim_id is not None:
+            _count(claims=1)
+            return _result(food_id, receiver_id, quantity, claimed, claim_id)
+        _count(conflicts=1)
+    _count(rejected=1)
+    return _result(food_id, receiver_id, quantity, reason="listing kept changing; try again")
+
+
+def submit_claims(items, allow_partial=False, manager=None):
+    """Reserve a batch of (Food_ID, Receiver_ID, quantity) claims in one transaction.
+
+    Listings are read under the write lock, so the batch cannot conflict;
+    each item is accepted or rejected on its own, in order. Returns one
+    result dict per item, as claim() does.
+    """
+    manager = manager or get_connection_manager()
+    items = [(int(food_id), int(receiver_id), int(quantity)) for food_id, receiver_id, quantity in items]
+    if not items:
+        return []
+
+    def reserve_all():
+        timestamp = datetime.now().isoformat(sep=' ', timespec='seconds')
+        results = []
+        with manager.write() as writer:
+            for food_id, receiver_id, quantity in items:
+                state = listing_state(writer, food_id)
+                claimed = _claimable(state, quantity, allow_partial)
+                claim_id = _reserve(writer, food_id, receiver_id, claimed, state[2], timestamp) if claimed else None
+                if claim_id is not None:
+                    results.append(_result(food_id, receiver_id, quantity, claimed, claim_id))
+                else:
+                    results.append(_result(food_id, receiver_id, quantity, reason=_rejection(state)))
+            if any(result['Claim_ID'] is not None for result in results):
+                bump_table_versions(writer, CLAIM_TABLES)
+        return results
+
+    results = with_busy_retry(reserve_all)
+    accepted = sum(1 for result in results if result['Claim_ID'] is not None)
+    _count(claims=accepted, rejected=len(results) - accepted)
+    return results
+
+
+def set_claim_status(claim_id, status, manager=None):
+    """Move a claim to another status; cancelling it releases its quantity. Returns False if it does not exist."""
+    if status not in CLAIM_STATUSES:
+        raise ValueError(f"Unknown claim status: {status}")
+    manager = manager or get_connection_manager()
+
+    def update():
+        with manager.write() as writer:
+            updated = writer.execute("UPDATE claims SET Status = ? WHERE Claim_ID = ?", (status, claim_id)).rowcount
+            if updated:
+                bump_table_versions(writer, CLAIM_TABLES)
+            return bool(updated)
+
+    return with_busy_retry(update)
+
+
+def update_quantity(food_id, quantity, expected_version, manager=None):
+    """Set a listing's Quantity if it still has expected_version; returns the new version.
+
+    Raises ClaimConflict when the listing changed since expected_version
+    was read, and ValueError when it does not exist or quantity is below
+    what is already reserved.
+    """
+    manager = manager or get_connection_manager()
+
+    def update():
+        with manager.write() as writer:
+            if writer.execute(UPDATE_QUANTITY_QUERY, (quantity, food_id, expected_version, quantity)).rowcount:
+                bump_table_versions(writer, ['food_listings'])
+                return listing_state(writer, food_id)[2]
+            state = listing_state(writer, food_id)
+        if state is None:
+            raise ValueError(f"Listing {food_id} does not exist.")
+        if state[2] != expected_version:
+            raise ClaimConflict(f"Listing {food_id} changed since it was loaded (version {expected_version}, "
+                                f"now {state[2]}); reload it and try again.")
+        raise ValueError(f"Listing {food_id} already has {state[1]} unit(s) reserved by claims.")
+
+    return with_busy_retry(update)
+
+
+def verify_reservations(conn):
+    """Return [(Food_ID, Quantity, Reserved, claimed), ...] for listings whose Reserved differs from their active claims."""
+    return conn.execute(f"""
+        SELECT Food_ID, Quantity, Reserved, claimed FROM (
+            SELECT Food_ID, Quantity, Reserved, ({RESERVED_RECOMPUTE_QUERY}) AS claimed FROM food_listings
+        ) WHERE claimed != Reserved
+    """).fetchall()
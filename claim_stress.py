@@ -0,0 +1,186 @@
+import argparse
+import json
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from benchmark import summarize
+from claim_processing import claim, stats, submit_claims, verify_reservations
+from database_manager import ConnectionManager, bump_table_versions, configure_connection, create_tables
+
+STRESS_LISTING = (
+    "INSERT INTO food_listings (Food_Name, Quantity, Expiry_Date, Provider_ID, Provider_Type, Location, "
+    "Food_Type, Meal_Type) VALUES ('Stress Test', ?, date('now', '+30 days'), ?, 'Restaurant', 'Stress City', "
+    "'Vegetarian', 'Lunch')"
+)
+
+OVER_ALLOCATED_QUERY = """
+SELECT fl.Food_ID, fl.Quantity, SUM(c.Claimed_Quantity)
+FROM food_listings fl
+JOIN claims c ON c.Food_ID = fl.Food_ID AND c.Status IN ('Pending', 'Completed')
+WHERE fl.Food_ID IN (SELECT value FROM json_each(?))
+GROUP BY fl.Food_ID
+HAVING SUM(c.Claimed_Quantity) > fl.Quantity
+"""
+
+
+def create_listings(manager, count, quantity):
+    """Insert count listings of quantity units for the claimants to fight over; returns their Food_IDs."""
+    with manager.write() as writer:
+        provider = writer.execute("SELECT MIN(Provider_ID) FROM providers").fetchone()[0]
+        food_ids = [writer.execute(STRESS_LISTING, (quantity, provider)).lastrowid for _ in range(count)]
+        bump_table_versions(writer, ['food_listings'])
+    return food_ids
+
+
+def _claimant(manager, food_ids, receivers, claims, batch, max_quantity, allow_partial, seed, totals, lock):
+    rng = random.Random(seed)
+    latencies, counts = [], {'accepted': 0, 'partial': 0, 'rejected': 0, 'errors': 0, 'units': 0}
+    done = 0
+    while done < claims:
+        items = [(rng.choice(food_ids), rng.choice(receivers), rng.randint(1, max_quantity))
+                 for _ in range(min(batch or 1, claims - done))]
+        started = time.perf_counter()
+        try:
+            if batch:
+                results = submit_claims(items, allow_partial, manager)
+            else:
+                results = [claim(*items[0], allow_partial=allow_partial, manager=manager)]
+        except sqlite3.OperationalError:
+            counts['errors'] += len(items)
+            done += len(items)
+            continue
+        latencies.append(time.perf_counter() - started)
+        for result in results:
+            if result['Claim_ID'] is None:
+                counts['rejected'] += 1
+            else:
+                counts['partial' if result['Claimed'] < result['Requested'] else 'accepted'] += 1
+                counts['units'] += result['Claimed']
+        done += len(items)
+    with lock:
+        totals['latencies'] += latencies
+        for name, value in counts.items():
+            totals[name] += value
+
+
+def run_process(path, food_ids, receivers, threads, claims, batch, max_quantity, allow_partial, busy_timeout_ms, seed):
+    """Run threads claimants on one ConnectionManager of their own; returns their counts and latencies.
+
+    Threads of one process queue on the manager's write lock; processes
+    contend for the SQLite write lock and see SQLITE_BUSY.
+    """
+    manager = ConnectionManager(path)
+    with manager.writer() as writer:
+        writer.execute(f"PRAGMA busy_timeout = {int(busy_timeout_ms)}")
+    before = stats()
+    totals = {'latencies': [], 'accepted': 0, 'partial': 0, 'rejected': 0, 'errors': 0, 'units': 0}
+    lock = threading.Lock()
+    workers = [
+        threading.Thread(target=_claimant, args=(manager, food_ids, receivers, claims, batch, max_quantity,
+                                                 allow_partial, seed * 1000 + i, totals, lock))
+        for i in range(threads)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    after = stats()
+    totals['conflicts'] = after['conflicts'] - before['conflicts']
+    totals['busy_retries'] = after['busy_retries'] - before['busy_retries']
+    return totals
+
+
+def run_stress(path, listings, quantity, processes, threads, claims, batch, max_quantity, allow_partial,
+               busy_timeout_ms, seed=0):
+    """Create contended listings, run the claimants and check the listings afterwards; returns the report dict."""
+    manager = ConnectionManager(path)
+    with manager.writer() as writer:
+        create_tables(writer)
+    food_ids = create_listings(manager, listings, quantity)
+    with manager.reader() as conn:
+        receivers = [row[0] for row in conn.execute("SELECT Receiver_ID FROM receivers")]
+
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        futures = [pool.submit(run_process, path, food_ids, receivers, threads, claims, batch, max_quantity,
+                               allow_partial, busy_timeout_ms, seed + i) for i in range(processes)]
+        parts = [future.result() for future in futures]
+    elapsed = time.perf_counter() - started
+
+    totals = {name: sum(part[name] for part in parts) for name in parts[0] if name != 'latencies'}
+    latencies = [latency for part in parts for latency in part['latencies']]
+    conn = configure_connection(sqlite3.connect(path))
+    try:
+        over_allocated = conn.execute(OVER_ALLOCATED_QUERY, (json.dumps(food_ids),)).fetchall()
+        ids = set(food_ids)
+        mismatched = [row for row in verify_reservations(conn) if row[0] in ids]
+        reserved = conn.execute(
+            "SELECT COALESCE(SUM(Reserved), 0) FROM food_listings WHERE Food_ID IN (SELECT value FROM json_each(?))",
+            (json.dumps(food_ids),)).fetchone()[0]
+    finally:
+        conn.close()
+
+    attempts = processes * threads * claims
+    report = {
+        'listings': listings,
+        'quantity_per_listing': quantity,
+        'processes': processes,
+        'threads_per_process': threads,
+        'claims_attempted': attempts,
+        'batch': batch,
+        'allow_partial': allow_partial,
+        **totals,
+        'units_reserved': reserved,
+        'seconds': elapsed,
+        'claims_per_second': attempts / elapsed if elapsed else 0.0,
+        'over_allocated': [list(row) for row in over_allocated],
+        'reserved_mismatches': [list(row) for row in mismatched],
+    }
+    if latencies:
+        report['latency'] = summarize(latencies)
+    return report
+
+
+def main(argv=None):
+    """Command-line entry point: stress claim processing on a copy of a database and check for over-allocation."""
+    parser = argparse.ArgumentParser(description="Concurrent claim stress test for claim_processing.py.")
+    parser.add_argument('--db', default='food_wastage.db', help="Database to copy for the run")
+    parser.add_argument('--in-place', action='store_true', help="Run against --db itself instead of a copy")
+    parser.add_argument('--listings', type=int, default=20, help="Listings the claimants compete for")
+    parser.add_argument('--quantity', type=int, default=50, help="Units per listing")
+    parser.add_argument('--processes', type=int, default=4)
+    parser.add_argument('--threads', type=int, default=4, help="Claimant threads per process")
+    parser.add_argument('--claims', type=int, default=200, help="Claims submitted by each claimant")
+    parser.add_argument('--batch', type=int, default=0, help="Submit claims in batches of this size; 0 claims one at a time")
+    parser.add_argument('--max-quantity', type=int, default=5, help="Largest quantity a claim asks for")
+    parser.add_argument('--partial', action='store_true', help="Accept partial quantities")
+    parser.add_argument('--busy-timeout-ms', type=int, default=100, help="SQLite busy timeout of each claimant process")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="Write the JSON report here instead of stdout")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as scratch:
+        path = args.db
+        if not args.in_place:
+            path = os.path.join(scratch, 'stress.db')
+            shutil.copy(args.db, path)
+        report = run_stress(path, args.listings, args.quantity, args.processes, args.threads, args.claims,
+                            args.batch, args.max_quantity, args.partial, args.busy_timeout_ms, args.seed)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    else:
+        print(output)
+    return 1 if report['over_allocated'] or report['reserved_mismatches'] else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
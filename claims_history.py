@@ -0,0 +1,163 @@
+import argparse
+import re
+import sqlite3
+from datetime import datetime, timezone
+
+from database_manager import TABLE_COLUMNS
+from summaries import SUMMARY_SOURCES
+
+# Archived claims are kept in one table per month of their Claim_TS,
+# claims_YYYY_MM, with claims_undated for timestamps that did not parse.
+# The claims_archive view is the union of all of them.
+PARTITION_PATTERN = re.compile(r'^claims_(\d{4}_\d{2}|undated)$')
+UNDATED = 'undated'
+
+# Claim_TS is Timestamp in seconds since the epoch, reading Timestamp as UTC.
+CLAIM_COLUMNS = (*TABLE_COLUMNS['claims'], 'Claim_TS', 'Claimed_Quantity')
+ARCHIVE_COLUMNS = (*CLAIM_COLUMNS, 'Archived_At')
+
+PARTITION_DEFINITION = '''
+    CREATE TABLE IF NOT EXISTS {name} (
+        Claim_ID INTEGER PRIMARY KEY,
+        Food_ID INTEGER,
+        Receiver_ID INTEGER,
+        Status TEXT NOT NULL,
+        Timestamp DATETIME NOT NULL,
+        Claim_TS INTEGER,
+        Claimed_Quantity INTEGER,
+        Archived_At TEXT NOT NULL
+    );
+'''
+
+# claims_daily counts claims per day, status, and the city and meal type
+# of their listing; triggers on claims and food_listings keep it current
+# (migrations 8 and 15 in migrations.py).
+ROLLUP_RECOMPUTE_QUERY = """
+SELECT
+    COALESCE(date(c.Timestamp), 'unknown'),
+    c.Status,
+    COALESCE(fl.Location, fa.Location, 'Unknown'),
+    COALESCE(fl.Meal_Type, fa.Meal_Type, 'Unknown'),
+    COUNT(*)
+FROM (
+    SELECT Food_ID, Status, Timestamp FROM claims
+    UNION ALL SELECT Food_ID, Status, Timestamp FROM claims_archive
+) c
+LEFT JOIN food_listings fl ON fl.Food_ID = c.Food_ID
+LEFT JOIN food_listings_archive fa ON fa.Food_ID = c.Food_ID
+GROUP BY 1, 2, 3, 4
+"""
+
+
+def partition_name(month):
+    """Return the partition table for a 'YYYY_MM' month, or the undated one for None."""
+    return f"claims_{month or UNDATED}"
+
+
+def partitions(conn):
+    """Return the names of the existing claim partitions, oldest month first."""
+    names = [row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")]
+    return sorted(name for name in names if PARTITION_PATTERN.match(name))
+
+
+def refresh_archive_view(conn):
+    """Recreate the claims_archive view over the current partitions."""
+    columns = ', '.join(ARCHIVE_COLUMNS)
+    names = partitions(conn)
+    body = "\n    UNION ALL ".join(f"SELECT {columns} FROM {name}" for name in names) or \
+        f"SELECT {', '.join(f'NULL AS {column}' for column in ARCHIVE_COLUMNS)} WHERE 0"
+    conn.execute("DROP VIEW IF EXISTS claims_archive")
+    conn.execute(f"CREATE VIEW claims_archive AS {body}")
+
+
+def archive_claims(conn, where, params, archived_at):
+    """Move the claims matching a WHERE clause into their monthly partitions.
+
+    Call inside a write transaction. Returns the number of claims moved.
+    """
+    months = [row[0] for row in conn.execute(
+        f"SELECT DISTINCT strftime('%Y_%m', Claim_TS, 'unixepoch') FROM claims WHERE {where}", params)]
+    if not months:
+        return 0
+    columns = ', '.join(CLAIM_COLUMNS)
+    created = False
+    for month in months:
+        name = partition_name(month)
+        if name not in partitions(conn):
+            conn.execute(PARTITION_DEFINITION.format(name=name))
+            created = True
+        month_filter = "Claim_TS IS NULL" if month is None else \
+            "strftime('%Y_%m', Claim_TS, 'unixepoch') = ?"
+        conn.execute(
+            f"INSERT INTO {name} ({columns}, Archived_At) SELECT {columns}, ? FROM claims "
+            f"WHERE ({where}) AND {month_filter}",
+            (archived_at, *params, *([] if month is None else [month])),
+        )
+    if created:
+        refresh_archive_view(conn)
+    return conn.execute(f"DELETE FROM claims WHERE {where}", params).rowcount
+
+
+def range_query(conn, start, end):
+    """Return (query, params) for the live and archived claims with start <= Claim_TS < end, oldest first.
+
+    start and end are epoch seconds. Live claims are found through
+    idx_claims_ts, and only the partitions whose month overlaps the range
+    are read, so the cost follows the range rather than the history.
+    """
+    first, last = (datetime.fromtimestamp(ts, timezone.utc).strftime('%Y_%m') for ts in (start, max(start, end - 1)))
+    selects = [f"SELECT {', '.join(CLAIM_COLUMNS)}, NULL AS Archived_At FROM claims"]
+    selects += [f"SELECT {', '.join(ARCHIVE_COLUMNS)} FROM {name}" for name in partitions(conn)
+                if first <= PARTITION_PATTERN.match(name).group(1) <= last]
+    query = "\nUNION ALL ".join(f"{select} WHERE Claim_TS >= ? AND Claim_TS < ?" for select in selects)
+    return query + "\nORDER BY Claim_TS, Claim_ID", [start, end] * len(selects)
+
+
+def rebuild_rollup(cursor):
+    """Replace the daily rollup with a full recomputation."""
+    cursor.execute("DELETE FROM claims_daily")
+    cursor.execute(f"INSERT INTO claims_daily {ROLLUP_RECOMPUTE_QUERY}")
+
+
+def verify_rollup(conn):
+    """Return [(key, stored, expected), ...] for rollup rows that differ from a recomputation."""
+    stored = {row[:4]: row[4] for row in conn.execute("SELECT * FROM claims_daily") if row[4]}
+    expected = {row[:4]: row[4] for row in conn.execute(ROLLUP_RECOMPUTE_QUERY) if row[4]}
+    return [(key, stored.get(key), expected.get(key))
+            for key in sorted(stored.keys() | expected.keys())
+            if stored.get(key) != expected.get(key)]
+
+
+def main(argv=None):
+    """Command-line entry point: list the partitions and verify the daily rollup."""
+    from database_manager import bump_table_versions, configure_connection, create_tables
+
+    parser = argparse.ArgumentParser(description="Inspect the claim partitions and check the daily rollup.")
+    parser.add_argument('--db', default='food_wastage.db', help="SQLite database file")
+    parser.add_argument('--check-only', action='store_true', help="Report differences without rebuilding")
+    args = parser.parse_args(argv)
+
+    conn = configure_connection(sqlite3.connect(args.db))
+    try:
+        create_tables(conn)
+        for name in partitions(conn):
+            print(f"{name}: {conn.execute(f'SELECT COUNT(*) FROM {name}').fetchone()[0]:,} claim(s)")
+        differences = verify_rollup(conn)
+        for key, stored, expected in differences[:10]:
+            print(f"    {key}: stored={stored} expected={expected}")
+        if not differences:
+            print("The daily rollup matches a full recomputation.")
+        elif not args.check_only:
+            conn.execute("BEGIN IMMEDIATE")
+            rebuild_rollup(conn)
+            # Cached trend results and API ETags follow the source table versions.
+            bump_table_versions(conn, SUMMARY_SOURCES['claims_daily'])
+            conn.commit()
+            print(f"{len(differences)} rollup row(s) differed; rollup rebuilt.")
+    finally:
+        conn.close()
+    return 1 if differences and args.check_only else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
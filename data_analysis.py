@@ -1,9 +1,25 @@
+import calendar
+import json
 import pandas as pd
+from datetime import date, datetime, timedelta
+from claims_history import range_query
+from instrumentation import timed_frame
+from proximity import NEARBY_KM, bounding_box, haversine_km
+from query_cache import cached_lookup
+
+def run_query(conn, query, params=None, use_cache=True):
+    """A helper function to run an SQL query and return a DataFrame.
+
+    Results are served from the shared query cache unless use_cache is
+    False; the returned frame is the caller's own copy.
+    """
+    def load():
+        if use_cache:
+            return cached_lookup(conn, query, params)
+        return pd.read_sql_query(query, conn, params=params), False
 
-def run_query(conn, query, params=None):
-    """A helper function to run an SQL query and return a DataFrame."""
     try:
-        return pd.read_sql_query(query, conn, params=params)
+        return timed_frame('query', query, params, load)
     except Exception as e:
         print(f"Error running query: {e}")
         return pd.DataFrame()
@@ -40,7 +56,18 @@ def most_contributing_provider_type(conn):
     return run_query(conn, query)
 
 # 3. What is the contact information of food providers in a specific city?
-def provider_contacts_by_city(conn, city):
+# With km, providers in every city within km of it are included, nearest first.
+def provider_contacts_by_city(conn, city, km=0):
+    if km:
+        return _within(conn, city, km, """
+    SELECT 
+        Name,
+        Contact,
+        Address,
+        City
+    FROM providers
+    WHERE City IN (SELECT value FROM json_each(?));
+    """, 'City', ['Distance_km', 'Name'])
     query = """
     SELECT 
         Name,
@@ -67,26 +94,32 @@ def top_receivers(conn):
     return run_query(conn, query)
 
 # 5. What is the total quantity of food available from all providers?
+# Only listings that have not expired count; expired ones stay in
+# food_listings until the expiry sweeper archives them. Today's date is a
+# parameter so cached results are keyed on it.
 def total_food_available(conn):
     query = """
     SELECT 
-        SUM(Quantity) AS Total_Available_Food
-    FROM food_listings;
+        COALESCE(SUM(Quantity), 0) AS Total_Available_Food
+    FROM summary_expiry
+    WHERE Expiry_Date >= ?;
     """
-    return run_query(conn, query)
+    return run_query(conn, query, params=(date.today().isoformat(),))
 
-# 6. Which city has the highest number of food listings?
+# 6. Which city has the highest number of (unexpired) food listings?
 def city_with_most_listings(conn):
     query = """
     SELECT 
-        Location,
-        COUNT(Food_ID) AS Number_of_Listings
-    FROM food_listings
-    GROUP BY Location
+        City AS Location,
+        SUM(Listings) AS Number_of_Listings
+    FROM summary_city_expiry
+    WHERE Expiry_Date >= ?
+    GROUP BY City
+    HAVING Number_of_Listings > 0
     ORDER BY Number_of_Listings DESC
     LIMIT 1;
     """
-    return run_query(conn, query)
+    return run_query(conn, query, params=(date.today().isoformat(),))
 
 # 7. What are the most commonly available food types?
 def most_common_food_types(conn):
@@ -134,9 +167,10 @@ def claim_status_percentages(conn):
     query = """
     SELECT
         Status,
-        COUNT(Claim_ID) * 100.0 / (SELECT COUNT(*) FROM claims) AS Percentage
-    FROM claims
-    GROUP BY Status;
+        Claims * 100.0 / (SELECT SUM(Claims) FROM summary_claim_status) AS Percentage
+    FROM summary_claim_status
+    WHERE Claims > 0
+    ORDER BY Status;
     """
     return run_query(conn, query)
 
@@ -161,11 +195,10 @@ def avg_food_claimed_per_receiver(conn):
 def most_claimed_meal_type(conn):
     query = """
     SELECT 
-        fl.Meal_Type,
-        COUNT(c.Claim_ID) AS Total_Claims
-    FROM food_listings fl
-    JOIN claims c ON fl.Food_ID = c.Food_ID
-    GROUP BY fl.Meal_Type
+        Meal_Type,
+        Claims AS Total_Claims
+    FROM summary_meal_type
+    WHERE Claims > 0
     ORDER BY Total_Claims DESC
     LIMIT 1;
     """
@@ -176,9 +209,10 @@ def total_donated_by_provider(conn):
     query = """
     SELECT 
         p.Name,
-        SUM(fl.Quantity) AS Total_Quantity_Donated
+        SUM(s.Quantity) AS Total_Quantity_Donated
     FROM providers p
-    JOIN food_listings fl ON p.Provider_ID = fl.Provider_ID
+    JOIN summary_provider s ON p.Provider_ID = s.Provider_ID
+    WHERE s.Listings > 0
     GROUP BY p.Name
     ORDER BY Total_Quantity_Donated DESC;
     """
@@ -198,16 +232,166 @@ def unclaimed_food_items(conn):
     return run_query(conn, query)
 
 # 15. What is the distribution of food listings by expiry date (e.g., how many listings expire in the next 7 days)?
+# Expired listings are left out; the dates are parameters as above.
 def listings_by_expiry_date(conn):
+    today = date.today()
     query = """
     SELECT 
         CASE
-            WHEN Expiry_Date <= date('now', '+7 days') THEN 'Expiring in < 7 days'
-            WHEN Expiry_Date > date('now', '+7 days') AND Expiry_Date <= date('now', '+30 days') THEN 'Expiring in 7-30 days'
+            WHEN Expiry_Date <= ? THEN 'Expiring in < 7 days'
+            WHEN Expiry_Date <= ? THEN 'Expiring in 7-30 days'
             ELSE 'Expiring in > 30 days'
         END AS Expiry_Category,
-        COUNT(Food_ID) AS Number_of_Listings
-    FROM food_listings
+        SUM(Listings) AS Number_of_Listings
+    FROM summary_expiry
+    WHERE Expiry_Date >= ?
+      AND Listings > 0
     GROUP BY Expiry_Category;
     """
-    return run_query(conn, query)
\ No newline at end of file
+    return run_query(conn, query, params=(
+        (today + timedelta(days=7)).isoformat(), (today + timedelta(days=30)).isoformat(), today.isoformat()))
+
+# Listings per expiry day that expire within the next `hours` hours. A
+# listing expires when its Expiry_Date ends; read from the expiry summary.
+# The dates are parameters so cached results are keyed on them.
+def listings_expiring_within(conn, hours):
+    now = datetime.now()
+    query = """
+    SELECT 
+        Expiry_Date,
+        Listings,
+        Quantity
+    FROM summary_expiry
+    WHERE Expiry_Date >= ?
+      AND Expiry_Date < ?
+      AND Listings > 0
+    ORDER BY Expiry_Date;
+    """
+    return run_query(conn, query, params=(now.date().isoformat(), (now + timedelta(hours=hours)).date().isoformat()))
+
+# Row counts of the base tables, read from the maintained summary.
+def table_row_count(conn, table_name):
+    query = """
+    SELECT 
+        Row_Count
+    FROM summary_table_counts
+    WHERE Table_Name = ?;
+    """
+    result = run_query(conn, query, params=(table_name,))
+    return int(result.iloc[0, 0]) if not result.empty else 0
+
+
+# Claims over time, read from the daily rollup. period is 'day', 'week'
+# (starting Monday) or 'month'; start and end are inclusive ISO dates and
+# default to the whole history.
+CLAIM_PERIODS = {
+    'day': "Day",
+    'week': "date(Day, '-6 days', 'weekday 1')",
+    'month': "substr(Day, 1, 7)",
+}
+
+def _check_dates(*values):
+    for value in values:
+        try:
+            value is None or date.fromisoformat(value)
+        except ValueError:
+            raise ValueError(f"Invalid date: {value}") from None
+
+def _claims_trend(conn, dimension, period, start, end):
+    if period not in CLAIM_PERIODS:
+        raise ValueError(f"Unknown period: {period}")
+    _check_dates(start, end)
+    query = f"""
+    SELECT 
+        {CLAIM_PERIODS[period]} AS Period,
+        {dimension},
+        SUM(Claims) AS Claims
+    FROM claims_daily
+    WHERE Day BETWEEN ? AND ?
+    GROUP BY Period, {dimension}
+    HAVING SUM(Claims) > 0
+    ORDER BY Period, {dimension};
+    """
+    return run_query(conn, query, params=(start or '0000-01-01', end or '9999-12-31'))
+
+def claims_trend_by_status(conn, period='day', start=None, end=None):
+    return _claims_trend(conn, 'Status', period, start, end)
+
+def claims_trend_by_city(conn, period='day', start=None, end=None):
+    return _claims_trend(conn, 'City', period, start, end)
+
+def claims_trend_by_meal_type(conn, period='day', start=None, end=None):
+    return _claims_trend(conn, 'Meal_Type', period, start, end)
+
+# The claims themselves, live and archived, made between start and end
+# (inclusive ISO dates; end defaults to today), oldest first. Only the
+# monthly claim partitions that overlap the range are read.
+def claims_between(conn, start, end=None):
+    _check_dates(start, end)
+    end = date.fromisoformat(end) if end else date.today()
+    query, params = range_query(conn, calendar.timegm(date.fromisoformat(start).timetuple()),
+                                calendar.timegm((end + timedelta(days=1)).timetuple()))
+    return run_query(conn, query, params=params)
+
+# Cities within km of a city, nearest first, with the city itself at
+# distance 0 even when it has no coordinates. The R*Tree narrows the
+# search to a bounding box; exact distances are computed here.
+def cities_within(conn, city, km=NEARBY_KM):
+    origin = run_query(conn, "SELECT Latitude, Longitude FROM city_locations WHERE City = ?;", params=(city,))
+    itself = pd.DataFrame({'City': [city], 'Distance_km': [0.0]})
+    if origin.empty:
+        return itself
+    query = """
+    SELECT 
+        g.City,
+        g.Latitude,
+        g.Longitude
+    FROM city_rtree t
+    JOIN city_locations g ON g.City_ID = t.id
+    WHERE t.Max_Lat >= ?
+      AND t.Min_Lat <= ?
+      AND t.Max_Lon >= ?
+      AND t.Min_Lon <= ?;
+    """
+    latitude, longitude = origin.iloc[0]
+    min_lat, max_lat, min_lon, max_lon = bounding_box(latitude, longitude, float(km))
+    nearby = run_query(conn, query, params=(min_lat, max_lat, min_lon, max_lon))
+    if nearby.empty:
+        return itself
+    nearby['Distance_km'] = haversine_km(latitude, longitude, nearby['Latitude'], nearby['Longitude']).round(2)
+    nearby = nearby[(nearby['Distance_km'] <= float(km)) & (nearby['City'] != city)]
+    nearby = pd.concat([itself, nearby[['City', 'Distance_km']]], ignore_index=True)
+    return nearby.sort_values(['Distance_km', 'City'], kind='stable').reset_index(drop=True)
+
+def _within(conn, city, km, query, column, order_by, *params):
+    """Run query over the cities within km of city, passed as a JSON array, and add Distance_km."""
+    nearby = cities_within(conn, city, km).rename(columns={'City': column})
+    rows = run_query(conn, query, params=(json.dumps(list(nearby[column])), *params))
+    if column not in rows:
+        return rows
+    rows = rows.merge(nearby, on=column, how='left')
+    return rows.sort_values(order_by, kind='stable').reset_index(drop=True)
+
+# Open listings (unreserved quantity left and not yet expired) within km of
+# a receiver's city, soonest expiry first, then nearest.
+def listings_near_receiver(conn, receiver_id, km=NEARBY_KM):
+    receiver = run_query(conn, "SELECT City FROM receivers WHERE Receiver_ID = ?;", params=(int(receiver_id),))
+    if receiver.empty:
+        return pd.DataFrame()
+    return _within(conn, receiver.iloc[0, 0], km, """
+    SELECT 
+        fl.Food_ID,
+        fl.Food_Name,
+        fl.Quantity - fl.Reserved AS Available,
+        fl.Expiry_Date,
+        fl.Food_Type,
+        fl.Meal_Type,
+        p.Name AS Provider_Name,
+        p.Contact AS Provider_Contact,
+        fl.Location
+    FROM food_listings fl
+    JOIN providers p ON p.Provider_ID = fl.Provider_ID
+    WHERE fl.Location IN (SELECT value FROM json_each(?))
+      AND fl.Expiry_Date >= ?
+      AND fl.Quantity > fl.Reserved;
+    """, 'Location', ['Expiry_Date', 'Distance_km', 'Food_ID'], datetime.now().date().isoformat())
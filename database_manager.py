@@ -1,91 +1,461 @@
+import re
 import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date
+
 import pandas as pd
 
-def create_connection():
-    """Create a database connection to a SQLite database."""
-    conn = None
-    try:
-        conn = sqlite3.connect('food_wastage.db')
-        return conn
-    except sqlite3.Error as e:
-        print(e)
+from instrumentation import timed_frame
+
+DATABASE_PATH = 'food_wastage.db'
+
+# Applied to every connection. journal_mode is persistent in the file and
+# is set once by the writer.
+CONNECTION_PRAGMAS = [
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA mmap_size = 268435456",
+    "PRAGMA cache_size = -65536",
+    "PRAGMA busy_timeout = 5000",
+    "PRAGMA temp_store = MEMORY",
+]
+
+# Compiled statements kept per connection, so parameterized queries that
+# run on every rerun are prepared once.
+CACHED_STATEMENTS = 256
+
+# Read connections are pooled: at most READER_POOL_SIZE are open, and a
+# checkout waits up to READER_TIMEOUT seconds for one to come back.
+READER_POOL_SIZE = 16
+READER_TIMEOUT = 30
+
+def configure_connection(conn):
+    """Apply the WAL journal and the tuned pragmas to a connection."""
+    conn.execute("PRAGMA journal_mode = WAL")
+    for pragma in CONNECTION_PRAGMAS:
+        conn.execute(pragma)
     return conn
 
-def create_tables(conn):
-    """Create all necessary tables for the project."""
-    try:
+class ReadConnection(sqlite3.Connection):
+    """Read connection checked out of ConnectionManager.reader()."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.seen_versions = None
+
+class ConnectionManager:
+    """Process-wide access to the database.
+
+    Reads check a connection out of a bounded pool for the length of a
+    block. All writes go through a single writer connection guarded by a
+    lock, so they are serialized within the process while WAL lets
+    readers continue.
+    """
+
+    def __init__(self, path=DATABASE_PATH, pool_size=READER_POOL_SIZE):
+        self.path = path
+        self.pool_size = pool_size
+        self._idle = []
+        self._opened = 0
+        self._pool = threading.Condition()
+        self._held = threading.local()
+        self._writer = None
+        self._writer_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            'readers_opened': 0,
+            'read_checkouts': 0,
+            'read_contentions': 0,
+            'read_timeouts': 0,
+            'read_wait_seconds': 0.0,
+            'read_wait_max_seconds': 0.0,
+            'write_acquisitions': 0,
+            'write_contentions': 0,
+            'write_wait_seconds': 0.0,
+            'write_wait_max_seconds': 0.0,
+            'write_hold_seconds': 0.0,
+        }
+
+    def _count(self, **increments):
+        with self._stats_lock:
+            for name, value in increments.items():
+                self._stats[name] += value
+
+    def _open_reader(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False, cached_statements=CACHED_STATEMENTS,
+                               factory=ReadConnection)
+        configure_connection(conn)
+        conn.execute("PRAGMA query_only = ON")
+        self._count(readers_opened=1)
+        return conn
+
+    def _checkout(self, timeout):
+        started = time.perf_counter()
+        contended = False
+        with self._pool:
+            while not self._idle and self._opened >= self.pool_size:
+                contended = True
+                remaining = started + timeout - time.perf_counter()
+                if remaining <= 0:
+                    self._count(read_contentions=1, read_timeouts=1)
+                    raise sqlite3.OperationalError(f"No read connection became free within {timeout:g} s")
+                self._pool.wait(remaining)
+            conn = self._idle.pop() if self._idle else None
+            if conn is None:
+                self._opened += 1
+        waited = time.perf_counter() - started
+        with self._stats_lock:
+            self._stats['read_checkouts'] += 1
+            self._stats['read_contentions'] += int(contended)
+            self._stats['read_wait_seconds'] += waited
+            self._stats['read_wait_max_seconds'] = max(self._stats['read_wait_max_seconds'], waited)
+        if conn is None:
+            try:
+                conn = self._open_reader()
+            except BaseException:
+                self._checkin(None)
+                raise
+        return conn
+
+    def _checkin(self, conn):
+        with self._pool:
+            if conn is None:
+                self._opened -= 1
+            else:
+                self._idle.append(conn)
+            self._pool.notify()
+
+    @contextmanager
+    def reader(self, timeout=READER_TIMEOUT):
+        """Check a read-only connection out of the pool for the block.
+
+        When every connection is checked out, wait up to timeout seconds
+        for one to come back, then raise sqlite3.OperationalError. A thread
+        that already holds a connection gets the same one again, so nested
+        reads cannot wait on themselves. Any transaction left open is
+        rolled back on check-in.
+        """
+        conn = getattr(self._held, 'conn', None)
+        if conn is not None:
+            self._count(read_checkouts=1)
+            yield conn
+            return
+        conn = self._checkout(timeout)
+        self._held.conn = conn
+        try:
+            yield conn
+        finally:
+            self._held.conn = None
+            try:
+                if conn.in_transaction:
+                    conn.rollback()
+            except sqlite3.Error:
+                conn.close()
+                conn = None
+            self._checkin(conn)
+
+    def _writer_connection(self):
+        if self._writer is None:
+            self._writer = sqlite3.connect(
+                self.path,
+                check_same_thread=False,
+                isolation_level=None,
+                cached_statements=CACHED_STATEMENTS,
+            )
+            configure_connection(self._writer)
+        return self._writer
+
+    @contextmanager
+    def writer(self):
+        """Hold the writer connection exclusively; the caller manages transactions."""
+        started = time.perf_counter()
+        contended = not self._writer_lock.acquire(blocking=False)
+        if contended:
+            self._writer_lock.acquire()
+        acquired = time.perf_counter()
+        waited = acquired - started
+        with self._stats_lock:
+            self._stats['write_acquisitions'] += 1
+            self._stats['write_contentions'] += int(contended)
+            self._stats['write_wait_seconds'] += waited
+            self._stats['write_wait_max_seconds'] = max(self._stats['write_wait_max_seconds'], waited)
+        try:
+            yield self._writer_connection()
+        finally:
+            self._count(write_hold_seconds=time.perf_counter() - acquired)
+            self._writer_lock.release()
+
+    @contextmanager
+    def write(self):
+        """Run the block in one BEGIN IMMEDIATE transaction on the writer."""
+        with self.writer() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.rollback()
+                raise
+            conn.commit()
+
+    def stats(self):
+        """Return a snapshot of the wait-time and contention counters."""
+        with self._stats_lock:
+            return dict(self._stats)
+
+_manager = None
+_manager_lock = threading.Lock()
+
+def get_connection_manager(path=DATABASE_PATH):
+    """Return the process-wide ConnectionManager, creating it on first use."""
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = ConnectionManager(path)
+        return _manager
+
+def create_connection():
+    """Context manager checking a pooled read connection out for the block."""
+    return get_connection_manager().reader()
+
+def write_connection():
+    """Context manager yielding the writer inside one transaction."""
+    return get_connection_manager().write()
+
+def schema_version(conn):
+    """Return the schema version recorded in the database file."""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+def migrate(conn):
+    """Apply every pending migration from migrations.MIGRATIONS, each in its own transaction."""
+    from migrations import MIGRATIONS
+    current = schema_version(conn)
+    pending = [(version, migration) for version, migration in MIGRATIONS if version > current]
+    for version, migration in pending:
         cursor = conn.cursor()
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS providers (
-                Provider_ID INTEGER PRIMARY KEY,
-                Name TEXT NOT NULL,
-                Type TEXT NOT NULL,
-                Address TEXT NOT NULL,
-                City TEXT NOT NULL,
-                Contact TEXT NOT NULL
-            );
-        ''')
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS receivers (
-                Receiver_ID INTEGER PRIMARY KEY,
-                Name TEXT NOT NULL,
-                Type TEXT NOT NULL,
-                City TEXT NOT NULL,
-                Contact TEXT NOT NULL
-            );
-        ''')
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS food_listings (
-                Food_ID INTEGER PRIMARY KEY,
-                Food_Name TEXT NOT NULL,
-                Quantity INTEGER NOT NULL,
-                Expiry_Date DATE NOT NULL,
-                Provider_ID INTEGER,
-                Provider_Type TEXT NOT NULL,
-                Location TEXT NOT NULL,
-                Food_Type TEXT NOT NULL,
-                Meal_Type TEXT NOT NULL,
-                FOREIGN KEY (Provider_ID) REFERENCES providers (Provider_ID)
-            );
-        ''')
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS claims (
-                Claim_ID INTEGER PRIMARY KEY,
-                Food_ID INTEGER,
-                Receiver_ID INTEGER,
-                Status TEXT NOT NULL,
-                Timestamp DATETIME NOT NULL,
-                FOREIGN KEY (Food_ID) REFERENCES food_listings (Food_ID),
-                FOREIGN KEY (Receiver_ID) REFERENCES receivers (Receiver_ID)
-            );
-        ''')
+        try:
+            cursor.execute("BEGIN")
+            migration(cursor)
+            cursor.execute(f"PRAGMA user_version = {version}")
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+    if pending:
+        conn.execute("ANALYZE")
         conn.commit()
+    return schema_version(conn)
+
+def create_tables(conn):
+    """Create all necessary tables, keys and indexes for the project."""
+    try:
+        migrate(conn)
     except sqlite3.Error as e:
         print(e)
 
-def load_data(conn):
-    """Load data from CSV files into the database tables."""
+def load_data(conn, data_dir='.', force=False):
+    """Load changed rows from the CSV files into the database tables.
+
+    See ingestion.ingest_all; unchanged files are skipped by fingerprint.
+    """
+    from ingestion import ingest_all
     try:
-        providers_df = pd.read_csv('providers_data.csv')
-        receivers_df = pd.read_csv('receivers_data.csv')
-        food_listings_df = pd.read_csv('food_listings_data.csv')
-        claims_df = pd.read_csv('claims_data.csv')
-
-        providers_df.to_sql('providers', conn, if_exists='replace', index=False)
-        receivers_df.to_sql('receivers', conn, if_exists='replace', index=False)
-        food_listings_df.to_sql('food_listings', conn, if_exists='replace', index=False)
-        claims_df.to_sql('claims', conn, if_exists='replace', index=False)
+        return ingest_all(conn, data_dir=data_dir, force=force)
     except Exception as e:
         print(f"Error loading data: {e}")
 
-def get_data(conn, table_name, filters=None):
+# Tables and columns the query builder accepts; identifiers can't be bound
+# as parameters, so anything else is rejected.
+TABLE_COLUMNS = {
+    'providers': ('Provider_ID', 'Name', 'Type', 'Address', 'City', 'Contact'),
+    'receivers': ('Receiver_ID', 'Name', 'Type', 'City', 'Contact'),
+    'food_listings': ('Food_ID', 'Food_Name', 'Quantity', 'Expiry_Date', 'Provider_ID',
+                      'Provider_Type', 'Location', 'Food_Type', 'Meal_Type'),
+    'claims': ('Claim_ID', 'Food_ID', 'Receiver_ID', 'Status', 'Timestamp'),
+}
+
+def _check_columns(table_name, columns):
+    if table_name not in TABLE_COLUMNS:
+        raise ValueError(f"Unknown table: {table_name}")
+    unknown = [column for column in columns if column not in TABLE_COLUMNS[table_name]]
+    if unknown:
+        raise ValueError(f"Unknown column(s) for {table_name}: {', '.join(unknown)}")
+
+def build_conditions(table_name, filters, alias=None):
+    """Turn {column: value or list of values} into parameterized conditions.
+
+    A scalar becomes `column = ?`; a list, tuple or set becomes
+    `column IN (?, ...)`. Empty lists and None values are ignored, so
+    unselected multiselects do not filter.
+    """
+    filters = {column: value for column, value in (filters or {}).items()
+               if value is not None and not (isinstance(value, (list, tuple, set)) and not value)}
+    _check_columns(table_name, filters)
+    prefix = f"{alias}." if alias else ""
+    conditions, params = [], []
+    for column, value in filters.items():
+        if isinstance(value, (list, tuple, set)):
+            values = list(value)
+            conditions.append(f"{prefix}{column} IN ({', '.join('?' for _ in values)})")
+            params.extend(values)
+        else:
+            conditions.append(f"{prefix}{column} = ?")
+            params.append(value)
+    return conditions, params
+
+def build_select(table_name, columns=None, filters=None, order_by=None, limit=None):
+    """Return (query, params) for a parameterized SELECT on a known table."""
+    columns = list(columns or TABLE_COLUMNS.get(table_name, ()))
+    _check_columns(table_name, columns + ([order_by] if order_by else []))
+    conditions, params = build_conditions(table_name, filters)
+    query = f"SELECT {', '.join(columns)} FROM {table_name}"
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    if order_by:
+        query += f" ORDER BY {order_by}"
+    if limit is not None:
+        query += " LIMIT ?"
+        params.append(int(limit))
+    return query, params
+
+def get_data(conn, table_name, filters=None, columns=None, order_by=None, limit=None):
     """Retrieve data from a specified table with optional filters."""
-    query = f"SELECT * FROM {table_name}"
-    if filters:
-        conditions = [f"{key} = '{value}'" for key, value in filters.items()]
+    try:
+        query, params = build_select(table_name, columns, filters, order_by, limit)
+        return timed_frame('get_data', query, params, lambda: (pd.read_sql_query(query, conn, params=params), False))
+    except (ValueError, pd.io.sql.DatabaseError) as e:
+        print(f"Error executing query: {e}")
+        return pd.DataFrame()
+
+def parse_dates(values):
+    """Parse ISO dates, falling back to M/D/YYYY; unparseable values become NaT."""
+    parsed = pd.to_datetime(values, format='%Y-%m-%d', errors='coerce')
+    fallback = pd.to_datetime(values, format='%m/%d/%Y', errors='coerce')
+    return parsed.fillna(fallback)
+
+def iso_dates(values):
+    """Rewrite dates as YYYY-MM-DD text; values that do not parse are kept as they are."""
+    values = pd.Series(values).astype(str).str.strip()
+    return parse_dates(values).dt.strftime('%Y-%m-%d').fillna(values)
+
+def iso_timestamps(values):
+    """Rewrite timestamps as YYYY-MM-DD HH:MM:SS text; values that do not parse are kept as they are."""
+    values = pd.Series(values).astype(str).str.strip()
+    parsed = pd.to_datetime(values, format='ISO8601', errors='coerce')
+    fallback = pd.to_datetime(values, format='%m/%d/%Y %H:%M', errors='coerce')
+    return parsed.fillna(fallback).dt.strftime('%Y-%m-%d %H:%M:%S').fillna(values)
+
+def fts_prefix_query(text):
+    """Turn free text into an FTS5 query that prefix-matches every word."""
+    words = [word for word in re.split(r'\W+', text) if word]
+    return " ".join(f'"{word}"*' for word in words)
+
+def bump_table_versions(conn, tables):
+    """Record that tables changed; call inside the transaction that changed them."""
+    conn.executemany(
+        "INSERT INTO table_versions (Table_Name, Version) VALUES (?, 1) "
+        "ON CONFLICT(Table_Name) DO UPDATE SET Version = Version + 1",
+        [(name,) for name in tables],
+    )
+
+TABLE_VERSIONS_QUERY = "SELECT Table_Name, Version FROM table_versions"
+
+def current_table_versions(conn):
+    """Return {table name: version} as committed in the database.
+
+    Read connections remember the versions together with PRAGMA
+    data_version, which only changes when another connection commits, so
+    the table is re-read only after a write.
+    """
+    data_version = conn.execute("PRAGMA data_version").fetchone()[0]
+    seen = getattr(conn, 'seen_versions', None)
+    if seen and seen[0] == data_version:
+        return seen[1]
+    try:
+        versions = dict(conn.execute(TABLE_VERSIONS_QUERY).fetchall())
+    except sqlite3.OperationalError:
+        versions = {}
+    if isinstance(conn, ReadConnection):
+        conn.seen_versions = (data_version, versions)
+    return versions
+
+_filter_options = {}
+_filter_options_lock = threading.Lock()
+
+def get_filter_options(conn):
+    """Return the distinct cities, provider types and food types of the listings.
+
+    The lookup reads the listing indexes instead of the table and is cached
+    until the food_listings version changes.
+    """
+    version = current_table_versions(conn).get('food_listings')
+    with _filter_options_lock:
+        cached = _filter_options.get('options')
+        if cached and cached[0] == version:
+            return cached[1]
+    options = {
+        column: [row[0] for row in conn.execute(
+            f"SELECT DISTINCT {column} FROM food_listings ORDER BY {column}")]
+        for column in ('Location', 'Provider_Type', 'Food_Type')
+    }
+    with _filter_options_lock:
+        _filter_options['options'] = (version, options)
+    return options
+
+LISTINGS_PAGE_SIZE = 12
+
+LISTING_COLUMNS = """
+    fl.Food_ID, fl.Food_Name, fl.Quantity, fl.Expiry_Date, fl.Provider_ID,
+    fl.Provider_Type, fl.Location, fl.Food_Type, fl.Meal_Type,
+    p.Name AS Provider_Name, p.Contact AS Provider_Contact, p.Address AS Provider_Address
+"""
+
+def _listing_conditions(cities=None, provider_types=None, food_types=None, search=None, include_expired=False):
+    """Build the WHERE conditions and parameters for the listings filters.
+
+    Listings that expired before today are left out unless include_expired
+    is set; they stay in food_listings until the expiry sweeper runs.
+    """
+    conditions, params = build_conditions('food_listings', {
+        'Location': cities,
+        'Provider_Type': provider_types,
+        'Food_Type': food_types,
+    }, alias='fl')
+    if not include_expired:
+        conditions.append("fl.Expiry_Date >= ?")
+        params.append(date.today().isoformat())
+    match = fts_prefix_query(search or "")
+    if match:
+        conditions.append("fl.Food_ID IN (SELECT rowid FROM food_listings_fts WHERE food_listings_fts MATCH ?)")
+        params.append(match)
+    return conditions, params
+
+def get_listings_page(conn, after_id=None, page_size=LISTINGS_PAGE_SIZE, **filters):
+    """Return one page of listings with provider details, and whether more follow.
+
+    Pages are keyed on Food_ID: pass the last Food_ID of the previous page
+    as after_id to fetch the next one.
+    """
+    conditions, params = _listing_conditions(**filters)
+    if after_id is not None:
+        conditions.append("fl.Food_ID > ?")
+        params.append(int(after_id))
+    query = f"SELECT {LISTING_COLUMNS} FROM food_listings fl LEFT JOIN providers p ON p.Provider_ID = fl.Provider_ID"
+    if conditions:
         query += " WHERE " + " AND ".join(conditions)
+    query += " ORDER BY fl.Food_ID LIMIT ?"
+    params.append(page_size + 1)
     try:
-        return pd.read_sql(query, conn)
+        page = timed_frame('listings', query, params, lambda: (pd.read_sql_query(query, conn, params=params), False))
     except pd.io.sql.DatabaseError as e:
         print(f"Error executing query: {e}")
-        return pd.DataFrame()
\ No newline at end of file
+        return pd.DataFrame(), False
+    return page.iloc[:page_size], len(page) > page_size
+
+def count_listings(conn, **filters):
+    """Return the number of listings that match the filters."""
+    conditions, params = _listing_conditions(**filters)
+    query = "SELECT COUNT(*) FROM food_listings fl"
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    return conn.execute(query, params).fetchone()[0]
@@ -0,0 +1,164 @@
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import date, datetime
+
+from claims_history import archive_claims
+from database_manager import TABLE_COLUMNS, bump_table_versions, get_connection_manager
+
+SWEEP_BATCH_ROWS = 500
+SWEEP_INTERVAL = 3600
+
+# The app only starts its background sweeper when FOOD_WASTAGE_SWEEPER is
+# set to 1: the first pass archives every listing that has already
+# expired, which on the bundled sample data is all of them.
+SWEEPER_ENV = 'FOOD_WASTAGE_SWEEPER'
+
+# Set FOOD_WASTAGE_SWEEP_INTERVAL to the seconds between sweeps of the
+# app's background sweeper; 0 turns it off.
+SWEEP_INTERVAL_ENV = 'FOOD_WASTAGE_SWEEP_INTERVAL'
+
+# A listing is still live on its expiry date and expires when the day ends.
+EXPIRED_QUERY = "SELECT Food_ID FROM food_listings WHERE Expiry_Date < ? LIMIT ?"
+# A listing is fully claimed once its Completed claims cover its Quantity.
+CLAIMED_QUERY = """
+SELECT c.Food_ID
+FROM claims c
+JOIN food_listings fl ON fl.Food_ID = c.Food_ID
+WHERE c.Status = 'Completed'
+GROUP BY c.Food_ID
+HAVING SUM(c.Claimed_Quantity) >= MAX(fl.Quantity)
+LIMIT ?
+"""
+
+_LISTING_COLUMNS = ', '.join(TABLE_COLUMNS['food_listings'])
+_IN_BATCH = "IN (SELECT value FROM json_each(?))"
+
+ARCHIVED_TABLES = ['food_listings', 'claims', 'food_listings_archive', 'claims_archive']
+
+
+def due_listings(conn, as_of, limit):
+    """Return {Food_ID: reason} for up to limit listings that should be archived."""
+    due = {row[0]: 'expired' for row in conn.execute(EXPIRED_QUERY, (as_of, limit))}
+    if len(due) < limit:
+        for (food_id,) in conn.execute(CLAIMED_QUERY, (limit,)):
+            if len(due) >= limit:
+                break
+            due.setdefault(food_id, 'claimed')
+    return due
+
+
+def archive_listings(conn, due, archived_at):
+    """Move listings into food_listings_archive and all of their claims into the monthly claim partitions.
+
+    Pending claims on the listings are cancelled first, since they can no
+    longer be fulfilled, so every archived claim is Completed or
+    Cancelled and none is left pointing at a listing that is gone. Call
+    inside a write transaction. Returns (claims archived, claims cancelled).
+    """
+    by_reason = {}
+    for food_id, reason in due.items():
+        by_reason.setdefault(reason, []).append(food_id)
+    ids = json.dumps(list(due))
+    cancelled = conn.execute(
+        f"UPDATE claims SET Status = 'Cancelled' WHERE Status = 'Pending' AND Food_ID {_IN_BATCH}", (ids,)).rowcount
+    claims = archive_claims(conn, f"Food_ID {_IN_BATCH}", (ids,), archived_at)
+    for reason, food_ids in by_reason.items():
+        conn.execute(
+            f"INSERT INTO food_listings_archive ({_LISTING_COLUMNS}, Archived_At, Archive_Reason) "
+            f"SELECT {_LISTING_COLUMNS}, ?, ? FROM food_listings WHERE Food_ID {_IN_BATCH}",
+            (archived_at, reason, json.dumps(food_ids)),
+        )
+    conn.execute(f"DELETE FROM food_listings WHERE Food_ID {_IN_BATCH}", (ids,))
+    return claims, cancelled
+
+
+def sweep(as_of=None, batch_rows=SWEEP_BATCH_ROWS, manager=None):
+    """Archive expired and fully claimed listings, batch_rows listings per transaction.
+
+    A listing is fully claimed once its Completed claims cover its
+    Quantity. Returns {'expired': n, 'claimed': n, 'claims': n,
+    'cancelled': n}.
+    """
+    manager = manager or get_connection_manager()
+    as_of = (as_of or date.today()).isoformat()
+    totals = {'expired': 0, 'claimed': 0, 'claims': 0, 'cancelled': 0}
+    while True:
+        with manager.write() as writer:
+            due = due_listings(writer, as_of, batch_rows)
+            if not due:
+                break
+            claims, cancelled = archive_listings(writer, due, datetime.now().isoformat(timespec='seconds'))
+            totals['claims'] += claims
+            totals['cancelled'] += cancelled
+            bump_table_versions(writer, ARCHIVED_TABLES)
+        for reason in due.values():
+            totals[reason] += 1
+    return totals
+
+
+_sweeper = None
+_sweeper_lock = threading.Lock()
+
+
+def _sweep_forever(interval, manager):
+    while True:
+        try:
+            sweep(manager=manager)
+        except sqlite3.Error as e:
+            print(f"Expiry sweep failed: {e}")
+        time.sleep(interval)
+
+
+def start_sweeper(interval=None, manager=None, enabled=None):
+    """Start the background sweeper thread once per process and return it.
+
+    Nothing is started unless enabled, which defaults to FOOD_WASTAGE_SWEEPER=1. The interval
+    defaults to FOOD_WASTAGE_SWEEP_INTERVAL or SWEEP_INTERVAL seconds;
+    returns None when disabled or the interval is 0.
+    """
+    global _sweeper
+    if enabled is None:
+        enabled = os.environ.get(SWEEPER_ENV, '') == '1'
+    if interval is None:
+        interval = float(os.environ.get(SWEEP_INTERVAL_ENV, SWEEP_INTERVAL))
+    if not enabled or interval <= 0:
+        return None
+    with _sweeper_lock:
+        if _sweeper is None:
+            _sweeper = threading.Thread(
+                target=_sweep_forever, args=(interval, manager or get_connection_manager()),
+                name='expiry-sweeper', daemon=True,
+            )
+            _sweeper.start()
+        return _sweeper
+
+
+def main(argv=None):
+    """Command-line entry point: sweep once, or every --interval seconds."""
+    from database_manager import create_tables
+
+    parser = argparse.ArgumentParser(description="Archive expired and fully claimed food listings.")
+    parser.add_argument('--db', default='food_wastage.db', help="SQLite database file")
+    parser.add_argument('--as-of', type=date.fromisoformat, help="Archive listings that expired before this date")
+    parser.add_argument('--batch-rows', type=int, default=SWEEP_BATCH_ROWS, help="Listings archived per transaction")
+    parser.add_argument('--interval', type=float, default=0, help="Keep sweeping every this many seconds")
+    args = parser.parse_args(argv)
+
+    manager = get_connection_manager(args.db)
+    with manager.writer() as writer:
+        create_tables(writer)
+    while True:
+        totals = sweep(args.as_of, args.batch_rows, manager)
+        print(f"Archived {totals['expired']:,} expired and {totals['claimed']:,} claimed listing(s) "
+              f"with {totals['claims']:,} claim(s); cancelled {totals['cancelled']:,} pending claim(s).")
+        if args.interval <= 0:
+            return 0
+        time.sleep(args.interval)
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
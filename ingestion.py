@@ -0,0 +1,297 @@
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+from datetime import datetime
+
+import pandas as pd
+
+from database_manager import bump_table_versions, configure_connection, create_tables, iso_dates, iso_timestamps, migrate
+from proximity import GAZETTEER_FILE, gazetteer_path, load_gazetteer
+
+# Source CSV and primary key for every table, in load order.
+SOURCES = {
+    'providers': ('providers_data.csv', 'Provider_ID'),
+    'receivers': ('receivers_data.csv', 'Receiver_ID'),
+    'food_listings': ('food_listings_data.csv', 'Food_ID'),
+    'claims': ('claims_data.csv', 'Claim_ID'),
+}
+
+# Rows moved to these tables by the expiry sweeper are not loaded again.
+ARCHIVES = {
+    'food_listings': 'food_listings_archive',
+    'claims': 'claims_archive',
+}
+
+# Tables whose rows change through triggers when a table is loaded: claims
+# reserve quantity in food_listings.Reserved.
+ALSO_CHANGES = {
+    'claims': ['food_listings'],
+}
+
+BATCH_SIZE = 500
+
+
+def file_hash(path, block_size=1 << 20):
+    """Return the SHA-256 hex digest of a file, read in blocks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _stored_fingerprint(conn, source_file):
+    row = conn.execute(
+        "SELECT Size, Mtime_NS, Content_Hash FROM ingestion_metadata WHERE Source_File = ?",
+        (source_file,),
+    ).fetchone()
+    return row
+
+
+def prepare_rows(conn, table_name, key, df):
+    """Normalize a source frame: ISO dates and timestamps and no rows that were archived."""
+    if 'Expiry_Date' in df.columns:
+        df['Expiry_Date'] = iso_dates(df['Expiry_Date'])
+    if 'Timestamp' in df.columns:
+        df['Timestamp'] = iso_timestamps(df['Timestamp'])
+    if table_name in ARCHIVES:
+        archived = pd.read_sql(f"SELECT {key} FROM {ARCHIVES[table_name]}", conn)[key]
+        df = df[~df[key].isin(archived)]
+    return df
+
+
+# The rows each source file last contributed, as hashes keyed by primary
+# key. Ingestion diffs a file against this snapshot instead of the live
+# table, so rows the app created are never deleted or overwritten by it.
+# The snapshot is the ingested_rows table (Source_File, Row_Key, Row_Hash).
+
+
+def normalize_types(conn, table_name, df):
+    """Cast a frame's columns to the declared types of the table's columns.
+
+    Numbers become Float64 so 5 and 5.0 compare equal, text becomes the
+    string dtype, and missing values are <NA> in either case. Columns that
+    do not parse as numbers are kept as text.
+    """
+    declared = {row[1]: row[2].upper() for row in conn.execute(f"PRAGMA table_info({table_name})")}
+    df = df.copy()
+    for column in df.columns:
+        kind = declared.get(column, '')
+        if any(name in kind for name in ('INT', 'REAL', 'FLOA', 'DOUB')):
+            try:
+                df[column] = pd.to_numeric(df[column]).astype('Float64')
+                continue
+            except (ValueError, TypeError):
+                pass
+        df[column] = df[column].astype('string')
+    return df
+
+
+def _row_hashes(df):
+    """Hash every row of a normalized frame indexed by primary key, as signed 64-bit integers."""
+    hashes = pd.util.hash_pandas_object(df, index=False)
+    return pd.Series(hashes.to_numpy().view('int64'), index=df.index)
+
+
+def diff_rows(new_hashes, old_hashes):
+    """Compare two row-hash snapshots and return (inserted, changed, deleted) keys."""
+    inserted = new_hashes.index.difference(old_hashes.index)
+    deleted = old_hashes.index.difference(new_hashes.index)
+    common = new_hashes.index.intersection(old_hashes.index)
+    changed = common[new_hashes.loc[common].values != old_hashes.loc[common].values]
+    return inserted, changed, deleted
+
+
+def file_rows(conn, table_name, key, new_df, source_file, adopt=False):
+    """Diff a prepared source frame against what the file loaded last time.
+
+    Returns (inserted, changed, deleted, conflicts, hashes). New keys that
+    already exist in the table were written by the app and are left alone
+    as conflicts. With adopt, used while the file has no snapshot yet (a
+    fresh database, or one ingested before snapshots were kept), the file
+    claims the table rows that share its keys.
+    """
+    new_df = new_df.drop_duplicates(subset=key, keep='last')
+    new_df = new_df.assign(**{key: pd.to_numeric(new_df[key]).astype('int64')})
+    columns = [column for column in new_df.columns if column != key]
+    new_hashes = _row_hashes(normalize_types(conn, table_name, new_df.set_index(key)[columns]))
+
+    if adopt:
+        old_df = pd.read_sql(f"SELECT {key}, {', '.join(columns)} FROM {table_name}", conn)
+        old_df = old_df[old_df[key].isin(new_hashes.index)].set_index(key)
+        old_hashes = _row_hashes(normalize_types(conn, table_name, old_df))
+    else:
+        old_hashes = pd.read_sql(
+            "SELECT Row_Key, Row_Hash FROM ingested_rows WHERE Source_File = ?", conn, params=(source_file,),
+        ).set_index('Row_Key')['Row_Hash']
+
+    inserted, changed, deleted = diff_rows(new_hashes, old_hashes)
+    existing = pd.read_sql(
+        f"SELECT {key} FROM {table_name} WHERE {key} IN (SELECT value FROM json_each(?))",
+        conn, params=(json.dumps([int(k) for k in inserted]),),
+    )[key]
+    conflicts = inserted[inserted.isin(existing)]
+    inserted = inserted.difference(conflicts)
+    return inserted, changed, deleted, conflicts, new_hashes.drop(conflicts)
+
+
+def _store_snapshot(conn, source_file, hashes, keys, deleted):
+    """Record the hashes of keys and forget deleted keys for one source file."""
+    for batch in _batches([(source_file, int(k)) for k in deleted]):
+        conn.executemany("DELETE FROM ingested_rows WHERE Source_File = ? AND Row_Key = ?", batch)
+    rows = [(source_file, int(k), int(hashes.loc[k])) for k in keys]
+    for batch in _batches(rows):
+        conn.executemany(
+            "INSERT INTO ingested_rows (Source_File, Row_Key, Row_Hash) VALUES (?, ?, ?) "
+            "ON CONFLICT(Source_File, Row_Key) DO UPDATE SET Row_Hash = excluded.Row_Hash",
+            batch,
+        )
+
+
+def _to_records(df):
+    """Convert a frame into plain Python tuples that sqlite3 can bind."""
+    df = df.astype(object).where(df.notna(), None)
+    return list(df.itertuples(index=False, name=None))
+
+
+def _batches(items, size=BATCH_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def apply_changes(conn, table_name, key, new_df, inserted, changed, deleted):
+    """Write the inserted, changed and deleted rows of one table as batches."""
+    deleted_keys = [(int(k),) for k in deleted]
+    for batch in _batches(deleted_keys):
+        conn.executemany(f"DELETE FROM {table_name} WHERE {key} = ?", batch)
+
+    upsert_keys = inserted.union(changed)
+    rows = new_df.drop_duplicates(subset=key, keep='last')
+    rows = rows[rows[key].isin(upsert_keys)]
+    columns = list(rows.columns)
+    updates = ", ".join(f"{column} = excluded.{column}" for column in columns if column != key)
+    upsert_sql = (
+        f"INSERT INTO {table_name} ({', '.join(columns)}) "
+        f"VALUES ({', '.join('?' for _ in columns)}) "
+        f"ON CONFLICT({key}) DO UPDATE SET {updates}"
+    )
+    for batch in _batches(_to_records(rows)):
+        conn.executemany(upsert_sql, batch)
+
+
+def ingest_all(conn, data_dir='.', force=False):
+    """Load every changed source CSV into the database.
+
+    Files whose size and mtime match the stored fingerprint are skipped
+    without being read. Files that changed on disk but hash to the same
+    content only get their fingerprint refreshed. For the rest, the file
+    is diffed against the rows it loaded last time: only its inserted,
+    changed and deleted rows are written, rows created by the app are
+    never touched, and all tables are updated inside a single transaction.
+    The city gazetteer, fingerprinted the same way, is synced first in its
+    own transaction.
+    """
+    migrate(conn)
+    report = {}
+    pending = []
+
+    gazetteer = gazetteer_path(data_dir)
+    if os.path.exists(gazetteer):
+        stat = os.stat(gazetteer)
+        stored = _stored_fingerprint(conn, GAZETTEER_FILE)
+        if not force and stored and stored[0] == stat.st_size and stored[1] == stat.st_mtime_ns:
+            report['city_locations'] = 'unchanged'
+        else:
+            report['city_locations'] = load_gazetteer(conn, gazetteer)
+            fingerprint = (GAZETTEER_FILE, 'city_locations', stat.st_size, stat.st_mtime_ns, file_hash(gazetteer))
+            pending.append((fingerprint, None, None, None))
+    else:
+        report['city_locations'] = 'missing'
+
+    for table_name, (source_file, key) in SOURCES.items():
+        path = os.path.join(data_dir, source_file)
+        if not os.path.exists(path):
+            report[table_name] = 'missing'
+            continue
+
+        stat = os.stat(path)
+        stored = _stored_fingerprint(conn, source_file)
+        if not force and stored and stored[0] == stat.st_size and stored[1] == stat.st_mtime_ns:
+            report[table_name] = 'unchanged'
+            continue
+
+        content_hash = file_hash(path)
+        fingerprint = (source_file, table_name, stat.st_size, stat.st_mtime_ns, content_hash)
+        if not force and stored and stored[2] == content_hash:
+            pending.append((fingerprint, None, None, None))
+            report[table_name] = 'unchanged'
+            continue
+
+        new_df = prepare_rows(conn, table_name, key, pd.read_csv(path))
+        adopt = conn.execute(
+            "SELECT 1 FROM ingested_rows WHERE Source_File = ? LIMIT 1", (source_file,)).fetchone() is None
+        inserted, changed, deleted, conflicts, hashes = file_rows(conn, table_name, key, new_df, source_file, adopt)
+        snapshot = (source_file, hashes, hashes.index if adopt else inserted.union(changed), deleted)
+        pending.append((fingerprint, (table_name, key, new_df, inserted, changed, deleted), snapshot, len(new_df)))
+        report[table_name] = {
+            'inserted': len(inserted),
+            'changed': len(changed),
+            'deleted': len(deleted),
+            'conflicts': len(conflicts),
+        }
+
+    if not pending:
+        return report
+
+    try:
+        conn.execute("BEGIN")
+        for fingerprint, changes, snapshot, row_count in pending:
+            if changes is not None:
+                apply_changes(conn, *changes)
+                _store_snapshot(conn, *snapshot)
+                bump_table_versions(conn, [changes[0], *ALSO_CHANGES.get(changes[0], [])])
+            conn.execute(
+                """
+                INSERT INTO ingestion_metadata
+                    (Source_File, Table_Name, Size, Mtime_NS, Content_Hash, Row_Count, Ingested_At)
+                VALUES (?, ?, ?, ?, ?, COALESCE(?, 0), ?)
+                ON CONFLICT(Source_File) DO UPDATE SET
+                    Size = excluded.Size,
+                    Mtime_NS = excluded.Mtime_NS,
+                    Content_Hash = excluded.Content_Hash,
+                    Row_Count = COALESCE(?, ingestion_metadata.Row_Count),
+                    Ingested_At = excluded.Ingested_At
+                """,
+                (*fingerprint, row_count, datetime.now().isoformat(timespec='seconds'), row_count),
+            )
+        conn.commit()
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+    return report
+
+
+def main(argv=None):
+    """Command-line entry point: python ingestion.py [--db PATH] [--data-dir DIR] [--force]"""
+    parser = argparse.ArgumentParser(description="Incrementally load the source CSVs into the database.")
+    parser.add_argument('--db', default='food_wastage.db', help="SQLite database file")
+    parser.add_argument('--data-dir', default='.', help="Directory containing the source CSVs")
+    parser.add_argument('--force', action='store_true', help="Re-diff every file even if its fingerprint matches")
+    args = parser.parse_args(argv)
+
+    conn = configure_connection(sqlite3.connect(args.db))
+    try:
+        create_tables(conn)
+        report = ingest_all(conn, data_dir=args.data_dir, force=args.force)
+    finally:
+        conn.close()
+
+    for table_name, result in report.items():
+        print(f"{table_name}: {result}")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,151 @@
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+
+RING_SIZE = 2000
+
+# Set FOOD_WASTAGE_QUERY_LOG to a file path to append every record as JSONL.
+QUERY_LOG_ENV = 'FOOD_WASTAGE_QUERY_LOG'
+
+# Frames from these modules and functions are plumbing, not the caller.
+_SKIP_MODULES = {__name__, 'query_cache', 'contextlib', 'analysis_executor'}
+_SKIP_FUNCTIONS = {'run_query', 'get_data', 'get_listings_page', 'execute_write', 'timed_frame'}
+
+_records = deque(maxlen=RING_SIZE)
+_records_lock = threading.Lock()
+_log_path = os.environ.get(QUERY_LOG_ENV)
+_log_lock = threading.Lock()
+
+
+def set_log_path(path):
+    """Append records to a JSONL file from now on; None turns the log off."""
+    global _log_path
+    _log_path = path
+
+
+def caller_name():
+    """Return 'module.function' of the first frame outside the query plumbing."""
+    frame = sys._getframe(1)
+    while frame is not None:
+        module = frame.f_globals.get('__name__', '')
+        if module not in _SKIP_MODULES and frame.f_code.co_name not in _SKIP_FUNCTIONS \
+                and not module.startswith(('pandas', 'sqlalchemy')):
+            return f"{module}.{frame.f_code.co_name}"
+        frame = frame.f_back
+    return 'unknown'
+
+
+def _jsonable(params):
+    if params is None:
+        return None
+    return [value if isinstance(value, (int, float, str)) or value is None else str(value) for value in params]
+
+
+@contextmanager
+def timed(kind, query, params=None):
+    """Time a database call and record it when the block exits.
+
+    The block receives a dict and may set 'rows', 'bytes' and 'cached'.
+    """
+    details = {'rows': None, 'bytes': None, 'cached': False}
+    caller = caller_name()
+    started = time.perf_counter()
+    error = None
+    try:
+        yield details
+    except Exception as e:
+        error = str(e)
+        raise
+    finally:
+        record({
+            'at': datetime.now().isoformat(timespec='milliseconds'),
+            'kind': kind,
+            'caller': caller,
+            'query': query,
+            'params': _jsonable(params),
+            'seconds': time.perf_counter() - started,
+            'error': error,
+            **details,
+        })
+
+
+def timed_frame(kind, query, params, load):
+    """Run load() under timed() and record the rows and bytes of the DataFrame it returns.
+
+    Bytes are only measured when the frame was read from the database;
+    cache hits record None so they stay cheap.
+    """
+    with timed(kind, query, params) as details:
+        frame, details['cached'] = load()
+        details['rows'] = len(frame)
+        if not details['cached']:
+            details['bytes'] = int(frame.memory_usage(index=True, deep=True).sum())
+    return frame
+
+
+def record(entry):
+    """Add a record to the ring buffer and, if enabled, the JSONL log."""
+    with _records_lock:
+        _records.append(entry)
+    path = _log_path
+    if path:
+        with _log_lock, open(path, 'a') as f:
+            f.write(json.dumps(entry) + '\n')
+
+
+def execute_write(conn, query, params=()):
+    """Execute a write statement on conn and record it; returns the cursor."""
+    with timed('write', query, params) as details:
+        cursor = conn.execute(query, params)
+        details['rows'] = cursor.rowcount
+    return cursor
+
+
+def records():
+    """Return a copy of the buffered records, oldest first."""
+    with _records_lock:
+        return list(_records)
+
+
+def clear():
+    with _records_lock:
+        _records.clear()
+
+
+def slowest(limit=20):
+    """Return the slowest buffered records, slowest first."""
+    return sorted(records(), key=lambda entry: entry['seconds'], reverse=True)[:limit]
+
+
+def latency_by_caller():
+    """Return {caller: {'calls', 'p50_ms', 'p95_ms', 'max_ms'}} over the buffered records."""
+    by_caller = {}
+    for entry in records():
+        by_caller.setdefault(entry['caller'], []).append(entry['seconds'] * 1000.0)
+    summary = {}
+    for caller, samples in by_caller.items():
+        samples.sort()
+        summary[caller] = {
+            'calls': len(samples),
+            'p50_ms': _percentile(samples, 50),
+            'p95_ms': _percentile(samples, 95),
+            'max_ms': samples[-1],
+        }
+    return summary
+
+
+def _percentile(sorted_samples, percent):
+    """Nearest-rank percentile of an already sorted list."""
+    rank = max(1, -(-len(sorted_samples) * percent // 100))
+    return sorted_samples[int(rank) - 1]
+
+
+def explain(conn, query, params=None):
+    """Return the EXPLAIN QUERY PLAN rows of a query as (id, parent, detail)."""
+    rows = conn.execute(f"EXPLAIN QUERY PLAN {query}", params or ()).fetchall()
+    return [(row[0], row[1], row[3]) for row in rows]
@@ -0,0 +1,156 @@
+import argparse
+import sys
+
+import numpy as np
+import pandas as pd
+
+from database_manager import TABLE_COLUMNS, current_table_versions, get_connection_manager
+
+# Low-cardinality text columns kept as integer codes into a per-column
+# array of distinct values. Other text columns stay object arrays.
+CODED_COLUMNS = {
+    'food_listings': ('Food_Name', 'Expiry_Date', 'Provider_Type', 'Location', 'Food_Type', 'Meal_Type'),
+    'providers': ('Type', 'City'),
+    'receivers': ('Type', 'City'),
+}
+
+
+def _code_dtype(n_categories):
+    for dtype in (np.int8, np.int16, np.int32):
+        if n_categories < np.iinfo(dtype).max:
+            return dtype
+    return np.int64
+
+
+def _readonly(array):
+    # pandas needs writable object arrays to measure them, so only
+    # numeric arrays are locked.
+    if array.dtype != object:
+        array.flags.writeable = False
+    return array
+
+
+class CodedTable:
+    """One table held as NumPy columns, with low-cardinality text as codes.
+
+    One instance is shared by every session and thread and must not be
+    modified; numeric arrays and codes are read-only. frame() hands out
+    pandas views over them.
+    """
+
+    def __init__(self, name, version, frame):
+        self.name = name
+        self.version = version
+        self.columns = list(frame.columns)
+        self.arrays = {}
+        self.categories = {}
+        for column in self.columns:
+            if column in CODED_COLUMNS.get(name, ()):
+                codes, categories = pd.factorize(frame[column], sort=True)
+                self.arrays[column] = _readonly(codes.astype(_code_dtype(len(categories))))
+                self.categories[column] = np.asarray(categories, dtype=object)
+            else:
+                self.arrays[column] = _readonly(frame[column].to_numpy())
+
+    def __len__(self):
+        return len(self.arrays[self.columns[0]]) if self.columns else 0
+
+    def codes(self, column, values):
+        """Return the codes of the given values in a coded column; unknown values are dropped."""
+        return np.flatnonzero(np.isin(self.categories[column], list(values)))
+
+    def mask(self, **filters):
+        """Return a boolean row mask for column=values filters, compared as codes.
+
+        Coded columns match any of the given values; others compare the raw
+        array. An empty or None filter is ignored.
+        """
+        mask = np.ones(len(self), dtype=bool)
+        for column, values in filters.items():
+            if values is None or (not np.isscalar(values) and len(values) == 0):
+                continue
+            values = [values] if np.isscalar(values) else list(values)
+            if column in self.categories:
+                mask &= np.isin(self.arrays[column], self.codes(column, values))
+            else:
+                mask &= np.isin(self.arrays[column], values)
+        return mask
+
+    def frame(self, mask=None, columns=None):
+        """Return the rows selected by mask as a DataFrame with categorical text columns.
+
+        Without a mask the columns are views over the shared arrays.
+        """
+        data = {}
+        for column in columns or self.columns:
+            values = self.arrays[column] if mask is None else self.arrays[column][mask]
+            if column in self.categories:
+                values = pd.Categorical.from_codes(values, categories=self.categories[column], validate=False)
+            data[column] = values
+        return pd.DataFrame(data, copy=False)
+
+    def count(self, **filters):
+        return int(self.mask(**filters).sum())
+
+    @property
+    def nbytes(self):
+        """Bytes held by the arrays and the distinct values, including the strings themselves."""
+        total = sum(array.nbytes for array in self.arrays.values())
+        for array in [*self.categories.values(), *(a for a in self.arrays.values() if a.dtype == object)]:
+            total += array.nbytes + sum(sys.getsizeof(value) for value in array)
+        return total
+
+
+def load_store(conn, table='food_listings'):
+    """Build the CodedTable of a table as of its current version.
+
+    Callers share one instance per (table, version); the app keeps them in
+    a version-keyed st.cache_resource, so a write only rebuilds a table the
+    next time a page asks for it.
+    """
+    version = current_table_versions(conn).get(table)
+    frame = pd.read_sql_query(f"SELECT {', '.join(TABLE_COLUMNS[table])} FROM {table}", conn)
+    return CodedTable(table, version, frame)
+
+
+def memory_report(conn, get_store=load_store):
+    """Compare, per table, the memory of a plain DataFrame (as get_data loads it) with the store.
+
+    get_store(conn, table) supplies the stores, e.g. the app's cached ones.
+    Returns {table: {'rows', 'dataframe_bytes', 'store_bytes', 'ratio'}}.
+    """
+    report = {}
+    for table in CODED_COLUMNS:
+        frame = pd.read_sql_query(f"SELECT {', '.join(TABLE_COLUMNS[table])} FROM {table}", conn)
+        dataframe_bytes = int(frame.memory_usage(index=True, deep=True).sum())
+        store_bytes = get_store(conn, table).nbytes
+        report[table] = {
+            'rows': len(frame),
+            'dataframe_bytes': dataframe_bytes,
+            'store_bytes': store_bytes,
+            'ratio': dataframe_bytes / store_bytes if store_bytes else None,
+        }
+    return report
+
+
+def main(argv=None):
+    """Command-line entry point: print the memory report for a database."""
+    parser = argparse.ArgumentParser(description="Compare DataFrame and coded-store memory per table.")
+    parser.add_argument('--db', default='food_wastage.db', help="SQLite database file")
+    parser.add_argument('--sessions', type=int, default=1, help="Also show the totals for this many sessions")
+    args = parser.parse_args(argv)
+
+    with get_connection_manager(args.db).reader() as conn:
+        report = memory_report(conn)
+    print(f"{'table':<15}{'rows':>10}{'DataFrame':>14}{'store':>14}{'ratio':>8}")
+    for table, row in report.items():
+        print(f"{table:<15}{row['rows']:>10,}{row['dataframe_bytes']:>14,}{row['store_bytes']:>14,}"
+              f"{row['ratio'] or 0:>7.1f}x")
+        if args.sessions > 1:
+            print(f"{'':<15}{args.sessions:>8} sessions: {row['dataframe_bytes'] * args.sessions:>12,} "
+                  f"vs {row['store_bytes']:,} shared")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,155 @@
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from urllib.parse import urlsplit
+
+from benchmark import summarize
+
+# Endpoints requested round-robin unless --target is given.
+DEFAULT_TARGETS = [
+    '/api/analysis/total_food_available',
+    '/api/analysis/city_with_most_listings',
+    '/api/analysis/claim_status_percentages',
+    '/api/analysis/most_claimed_meal_type',
+    '/api/analysis/providers_receivers_per_city',
+    '/api/analysis/listings_expiring_within?hours=72',
+    '/api/analysis/claims_trend_by_status?period=week',
+    '/api/listings?page_size=12&count=1',
+    '/api/listings?food_type=Vegan&page_size=12',
+    '/api/listings?search=ri&page_size=12',
+]
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(db, workers):
+    """Start api_server.py as a subprocess on a free local port and wait until it answers."""
+    port = _free_port()
+    server = subprocess.Popen(
+        [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'api_server.py'),
+         '--db', db, '--port', str(port), '--workers', str(workers)],
+        stdout=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return server, f"http://127.0.0.1:{port}"
+        except OSError:
+            if server.poll() is not None:
+                raise RuntimeError("The API server exited during startup.")
+            time.sleep(0.1)
+    server.terminate()
+    raise RuntimeError("The API server did not start within 30 s.")
+
+
+async def _request(reader, writer, host, target, etag=None):
+    """Send one keep-alive GET and return (status, ETag, body)."""
+    lines = [f"GET {target} HTTP/1.1", f"Host: {host}"]
+    if etag:
+        lines.append(f"If-None-Match: {etag}")
+    writer.write(("\r\n".join(lines) + "\r\n\r\n").encode('latin-1'))
+    await writer.drain()
+    head = (await reader.readuntil(b'\r\n\r\n')).decode('latin-1').split('\r\n')
+    headers = dict(line.split(': ', 1) for line in head[1:] if ': ' in line)
+    body = await reader.readexactly(int(headers.get('Content-Length', 0)))
+    return int(head[0].split(' ')[1]), headers.get('ETag'), body
+
+
+async def _client(base_url, targets, deadline, remaining, conditional, results):
+    url = urlsplit(base_url)
+    reader, writer = await asyncio.open_connection(url.hostname, url.port)
+    etags = {}
+    try:
+        while time.monotonic() < deadline and next(remaining, None) is not None:
+            target = next(targets)
+            started = time.perf_counter()
+            try:
+                status, etag, _ = await _request(reader, writer, url.netloc, target,
+                                                 etags.get(target) if conditional else None)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                results['errors'] += 1
+                writer.close()
+                reader, writer = await asyncio.open_connection(url.hostname, url.port)
+                continue
+            results['latencies'].append(time.perf_counter() - started)
+            results['status'][status] = results['status'].get(status, 0) + 1
+            if etag:
+                etags[target] = etag
+    finally:
+        writer.close()
+
+
+async def run_load(base_url, targets, connections, requests, duration, conditional):
+    """Drive the API from concurrent keep-alive connections and return a report dict."""
+    results = {'latencies': [], 'status': {}, 'errors': 0}
+    deadline = time.monotonic() + duration if duration else float('inf')
+    remaining = iter(range(requests)) if requests else itertools.count()
+    cycle = itertools.cycle(targets)
+    started = time.perf_counter()
+    await asyncio.gather(*[
+        _client(base_url, cycle, deadline, remaining, conditional, results) for _ in range(connections)
+    ])
+    elapsed = time.perf_counter() - started
+    report = {
+        'url': base_url,
+        'connections': connections,
+        'conditional': conditional,
+        'requests': len(results['latencies']),
+        'errors': results['errors'],
+        'status': {str(status): count for status, count in sorted(results['status'].items())},
+        'seconds': elapsed,
+        'requests_per_second': len(results['latencies']) / elapsed if elapsed else 0.0,
+    }
+    if results['latencies']:
+        report['latency'] = summarize(results['latencies'])
+    return report
+
+
+def main(argv=None):
+    """Command-line entry point: load-test a running API server, or a local one started for the run."""
+    parser = argparse.ArgumentParser(description="Local load test for api_server.py.")
+    parser.add_argument('--url', help="Base URL of a running server; by default one is started locally")
+    parser.add_argument('--db', default='food_wastage.db', help="Database for the local server")
+    parser.add_argument('--workers', type=int, default=8, help="Worker threads of the local server")
+    parser.add_argument('--connections', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=5000, help="Total requests; 0 runs until --duration")
+    parser.add_argument('--duration', type=float, default=0, help="Stop after this many seconds")
+    parser.add_argument('--conditional', action='store_true', help="Revalidate with If-None-Match after the first response")
+    parser.add_argument('--target', action='append', help="Path to request; may repeat")
+    parser.add_argument('--output', help="Write the JSON report here instead of stdout")
+    args = parser.parse_args(argv)
+
+    server = None
+    base_url = args.url
+    if base_url is None:
+        server, base_url = start_server(args.db, args.workers)
+    try:
+        report = asyncio.run(run_load(base_url, args.target or DEFAULT_TARGETS, args.connections,
+                                      args.requests, args.duration, args.conditional))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    else:
+        print(output)
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,172 @@
+import argparse
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from data_analysis import run_query
+from claim_processing import submit_claims
+from database_manager import get_connection_manager, parse_dates
+
+# Score weights: how soon the listing expires, whether the receiver is in
+# the listing's city, and the receiver's past completed-claim rate.
+URGENCY_WEIGHT = 1.0
+CITY_WEIGHT = 2.0
+RELIABILITY_WEIGHT = 1.0
+
+# Candidates per listing: the TOP_K most reliable receivers in its city.
+# Listings left over are spread over the remaining receivers by reliability.
+TOP_K = 5
+MAX_PER_RECEIVER = 3
+
+# Completed-claim rates are smoothed towards PRIOR_RATE as if every
+# receiver already had PRIOR_CLAIMS claims, so one lucky claim is not 100%.
+PRIOR_RATE = 0.5
+PRIOR_CLAIMS = 2
+
+# Quantity is what is not yet reserved by Pending or Completed claims.
+OPEN_LISTINGS_QUERY = """
+SELECT
+    fl.Food_ID, fl.Food_Name, fl.Quantity - fl.Reserved AS Quantity, fl.Expiry_Date, fl.Location
+FROM food_listings fl
+WHERE fl.Quantity > fl.Reserved
+  AND fl.Expiry_Date >= ?;
+"""
+
+RECEIVER_HISTORY_QUERY = """
+SELECT
+    r.Receiver_ID,
+    r.City,
+    COUNT(c.Receiver_ID) AS Claims,
+    COALESCE(SUM(c.Status = 'Completed'), 0) AS Completed,
+    COALESCE(SUM(c.Status = 'Pending'), 0) AS Pending
+FROM receivers r
+LEFT JOIN claims c ON c.Receiver_ID = r.Receiver_ID
+GROUP BY r.Receiver_ID, r.City;
+"""
+
+def open_listings(conn, as_of=None):
+    """Return listings with unreserved quantity that have not expired by as_of, most urgent first."""
+    as_of = pd.Timestamp(as_of or date.today())
+    listings = run_query(conn, OPEN_LISTINGS_QUERY, params=(as_of.strftime('%Y-%m-%d'),))
+    listings['Days_Left'] = (parse_dates(listings['Expiry_Date'].astype(str)) - as_of).dt.days
+    listings['Urgency'] = 1.0 / (1.0 + listings['Days_Left'])
+    listings = listings.sort_values(['Days_Left', 'Food_ID'], kind='stable').reset_index(drop=True)
+    listings['Priority'] = listings.index
+    return listings
+
+
+def receiver_scores(conn):
+    """Return receivers with their smoothed completed-claim rate, most reliable first."""
+    receivers = run_query(conn, RECEIVER_HISTORY_QUERY)
+    receivers['Rate'] = (receivers['Completed'] + PRIOR_RATE * PRIOR_CLAIMS) / (receivers['Claims'] + PRIOR_CLAIMS)
+    return receivers.sort_values(['Rate', 'Receiver_ID'], ascending=[False, True], kind='stable').reset_index(drop=True)
+
+
+def candidate_pairs(listings, receivers, top_k=TOP_K):
+    """Score every same-city (listing, receiver) candidate pair in one vectorized pass."""
+    keys = listings[['Food_ID', 'Location', 'Urgency', 'Priority']]
+    pairs = keys.merge(receivers.groupby('City', sort=False).head(top_k), left_on='Location', right_on='City')
+    pairs['Score'] = URGENCY_WEIGHT * pairs['Urgency'] + CITY_WEIGHT + RELIABILITY_WEIGHT * pairs['Rate']
+    return pairs.sort_values(['Priority', 'Score', 'Receiver_ID'], ascending=[True, False, True], kind='stable')
+
+
+def assign(pairs, capacity):
+    """Give each listing at most one candidate receiver without exceeding any receiver's capacity.
+
+    Works in rounds: every unassigned listing proposes its best remaining
+    candidate, and a receiver accepts proposals in listing priority order
+    until it is full. Each round is a handful of vectorized operations and
+    removes at least one candidate per listing, so there are at most TOP_K
+    rounds. Returns (accepted pairs, remaining capacity).
+    """
+    accepted = []
+    pairs = pairs[pairs['Receiver_ID'].isin(capacity.index[capacity > 0])]
+    while not pairs.empty:
+        proposals = pairs.groupby('Food_ID', sort=False).head(1)
+        room = capacity.reindex(proposals['Receiver_ID']).to_numpy()
+        won = proposals[proposals.groupby('Receiver_ID', sort=False).cumcount().to_numpy() < room]
+        accepted.append(won)
+        capacity = capacity.sub(won['Receiver_ID'].value_counts(), fill_value=0).astype(int)
+        full = capacity.index[capacity <= 0]
+        pairs = pairs[~pairs.index.isin(proposals.index)]
+        pairs = pairs[~pairs['Food_ID'].isin(won['Food_ID']) & ~pairs['Receiver_ID'].isin(full)]
+    return (pd.concat(accepted) if accepted else pairs), capacity
+
+
+def fill_remaining(listings, receivers, capacity):
+    """Hand the remaining receiver capacity, most reliable first, to listings in priority order."""
+    slots = np.repeat(receivers['Receiver_ID'].to_numpy(), capacity.reindex(receivers['Receiver_ID']).to_numpy())
+    filled = listings[['Food_ID', 'Location', 'Urgency', 'Priority']].iloc[:len(slots)].copy()
+    filled['Receiver_ID'] = slots[:len(filled)]
+    filled = filled.merge(receivers[['Receiver_ID', 'City', 'Rate']], on='Receiver_ID')
+    same_city = (filled['Location'] == filled['City']).astype(float)
+    filled['Score'] = URGENCY_WEIGHT * filled['Urgency'] + CITY_WEIGHT * same_city + RELIABILITY_WEIGHT * filled['Rate']
+    return filled
+
+
+def propose_matches(conn, as_of=None, max_per_receiver=MAX_PER_RECEIVER, top_k=TOP_K):
+    """Match open listings to receivers and return them as proposed Pending claims.
+
+    Listings expiring soonest are served first, by the most reliable
+    receivers in their own city where possible. A receiver's existing
+    Pending claims count towards max_per_receiver. The result is ranked,
+    one row per matched listing.
+    """
+    listings = open_listings(conn, as_of)
+    receivers = receiver_scores(conn)
+    if listings.empty or receivers.empty:
+        return pd.DataFrame(columns=['Rank', 'Food_ID', 'Food_Name', 'Quantity', 'Expiry_Date', 'Location',
+                                     'Receiver_ID', 'Receiver_City', 'Score', 'Status'])
+    capacity = (max_per_receiver - receivers.set_index('Receiver_ID')['Pending']).clip(lower=0).astype(int)
+    local, capacity = assign(candidate_pairs(listings, receivers, top_k), capacity)
+    leftover = listings[~listings['Food_ID'].isin(local['Food_ID'])]
+    matched = pd.concat([local, fill_remaining(leftover, receivers, capacity)])
+    matches = (
+        matched[['Food_ID', 'Receiver_ID', 'City', 'Score']]
+        .rename(columns={'City': 'Receiver_City'})
+        .merge(listings, on='Food_ID')
+        .sort_values('Priority', kind='stable')
+        .reset_index(drop=True)
+    )
+    matches['Rank'] = matches.index + 1
+    matches['Status'] = 'Pending'
+    return matches[['Rank', 'Food_ID', 'Food_Name', 'Quantity', 'Expiry_Date', 'Location',
+                    'Receiver_ID', 'Receiver_City', 'Score', 'Status']]
+
+
+def save_matches(matches):
+    """Reserve proposed matches as Pending claims in one batch; returns the number created.
+
+    A listing claimed by others since the matches were proposed gets what
+    is left of it, or is skipped when nothing is.
+    """
+    results = submit_claims(zip(matches['Food_ID'], matches['Receiver_ID'], matches['Quantity']), allow_partial=True)
+    return sum(1 for result in results if result['Claim_ID'] is not None)
+
+
+def main(argv=None):
+    """Command-line entry point: propose matches and optionally save them as Pending claims."""
+    from database_manager import create_tables
+
+    parser = argparse.ArgumentParser(description="Match open food listings to receivers.")
+    parser.add_argument('--db', default='food_wastage.db', help="SQLite database file")
+    parser.add_argument('--as-of', type=date.fromisoformat, help="Treat listings expiring before this date as expired")
+    parser.add_argument('--max-per-receiver', type=int, default=MAX_PER_RECEIVER)
+    parser.add_argument('--save', action='store_true', help="Insert the matches into claims as Pending")
+    args = parser.parse_args(argv)
+
+    manager = get_connection_manager(args.db)
+    with manager.writer() as writer:
+        create_tables(writer)
+    with manager.reader() as conn:
+        matches = propose_matches(conn, args.as_of, args.max_per_receiver)
+    print(matches.head(20).to_string(index=False))
+    print(f"{len(matches):,} listing(s) matched.")
+    if args.save:
+        print(f"{save_matches(matches):,} Pending claim(s) created.")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
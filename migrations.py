@@ -0,0 +1,771 @@
+import pandas as pd
+
+from database_manager import iso_dates, iso_timestamps
+
+# Every schema change, in order, as (version, migration) pairs. The applied
+# version is kept in PRAGMA user_version. Each migration spells out the
+# DDL it ran when it was added instead of calling into the feature
+# modules, so a fresh database gets exactly the schema of one upgraded
+# step by step. Append new migrations; never edit applied ones.
+
+TABLE_DEFINITIONS = {
+    'providers': '''
+        CREATE TABLE IF NOT EXISTS {name} (
+            Provider_ID INTEGER PRIMARY KEY,
+            Name TEXT NOT NULL,
+            Type TEXT NOT NULL,
+            Address TEXT NOT NULL,
+            City TEXT NOT NULL,
+            Contact TEXT NOT NULL
+        );
+    ''',
+    'receivers': '''
+        CREATE TABLE IF NOT EXISTS {name} (
+            Receiver_ID INTEGER PRIMARY KEY,
+            Name TEXT NOT NULL,
+            Type TEXT NOT NULL,
+            City TEXT NOT NULL,
+            Contact TEXT NOT NULL
+        );
+    ''',
+    'food_listings': '''
+        CREATE TABLE IF NOT EXISTS {name} (
+            Food_ID INTEGER PRIMARY KEY,
+            Food_Name TEXT NOT NULL,
+            Quantity INTEGER NOT NULL,
+            Expiry_Date DATE NOT NULL,
+            Provider_ID INTEGER,
+            Provider_Type TEXT NOT NULL,
+            Location TEXT NOT NULL,
+            Food_Type TEXT NOT NULL,
+            Meal_Type TEXT NOT NULL,
+            FOREIGN KEY (Provider_ID) REFERENCES providers (Provider_ID)
+        );
+    ''',
+    'claims': '''
+        CREATE TABLE IF NOT EXISTS {name} (
+            Claim_ID INTEGER PRIMARY KEY,
+            Food_ID INTEGER,
+            Receiver_ID INTEGER,
+            Status TEXT NOT NULL,
+            Timestamp DATETIME NOT NULL,
+            FOREIGN KEY (Food_ID) REFERENCES food_listings (Food_ID),
+            FOREIGN KEY (Receiver_ID) REFERENCES receivers (Receiver_ID)
+        );
+    ''',
+}
+
+
+def _delta(template, alias, sign, **fields):
+    """Fill a trigger statement template for the row alias 'new' or 'old'."""
+    return template.format(sign=sign, **fields).replace('row.', f'{alias}.')
+
+
+def _trigger(name, event, table, body):
+    return f"CREATE TRIGGER IF NOT EXISTS {name} AFTER {event} ON {table} BEGIN {body} END;"
+
+
+def _create_base_tables(cursor):
+    """Migration 1: the declared tables plus the ingestion metadata table."""
+    for name, ddl in TABLE_DEFINITIONS.items():
+        cursor.execute(ddl.format(name=name))
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS ingestion_metadata (
+            Source_File TEXT PRIMARY KEY,
+            Table_Name TEXT NOT NULL,
+            Size INTEGER NOT NULL,
+            Mtime_NS INTEGER NOT NULL,
+            Content_Hash TEXT NOT NULL,
+            Row_Count INTEGER NOT NULL,
+            Ingested_At TEXT NOT NULL
+        );
+    ''')
+
+
+def _rebuild_unkeyed_tables(cursor):
+    """Migration 2: rebuild tables that an old loader replaced without keys.
+
+    Earlier versions loaded the CSVs with to_sql(if_exists='replace'), which
+    dropped the declared tables. Copy those rows into the declared schema.
+    """
+    for name, ddl in TABLE_DEFINITIONS.items():
+        columns = cursor.execute(f"PRAGMA table_info({name})").fetchall()
+        if any(column[5] for column in columns):
+            continue
+        column_list = ", ".join(column[1] for column in columns)
+        cursor.execute(ddl.format(name=f"{name}__new"))
+        cursor.execute(f"INSERT OR REPLACE INTO {name}__new ({column_list}) SELECT {column_list} FROM {name}")
+        cursor.execute(f"DROP TABLE {name}")
+        cursor.execute(f"ALTER TABLE {name}__new RENAME TO {name}")
+
+
+def _create_indexes(cursor):
+    """Migration 3: indexes for the filters and joins in data_analysis and app."""
+    for statement in [
+        "CREATE INDEX IF NOT EXISTS idx_claims_food_status ON claims (Food_ID, Status, Receiver_ID)",
+        "CREATE INDEX IF NOT EXISTS idx_claims_receiver ON claims (Receiver_ID, Status, Food_ID)",
+        "CREATE INDEX IF NOT EXISTS idx_claims_status ON claims (Status)",
+        "CREATE INDEX IF NOT EXISTS idx_listings_provider ON food_listings (Provider_ID, Quantity)",
+        "CREATE INDEX IF NOT EXISTS idx_listings_filters ON food_listings (Location, Food_Type, Provider_Type, Food_Name)",
+        "CREATE INDEX IF NOT EXISTS idx_listings_expiry ON food_listings (Expiry_Date)",
+        "CREATE INDEX IF NOT EXISTS idx_listings_food_type ON food_listings (Food_Type)",
+        "CREATE INDEX IF NOT EXISTS idx_listings_quantity ON food_listings (Quantity)",
+        "CREATE INDEX IF NOT EXISTS idx_listings_food_name ON food_listings (Food_Name)",
+        "CREATE INDEX IF NOT EXISTS idx_listings_meal_type ON food_listings (Meal_Type)",
+        "CREATE INDEX IF NOT EXISTS idx_providers_city ON providers (City, Type)",
+        "CREATE INDEX IF NOT EXISTS idx_providers_name ON providers (Name, Type)",
+        "CREATE INDEX IF NOT EXISTS idx_receivers_city ON receivers (City, Type)",
+    ]:
+        cursor.execute(statement)
+
+
+def _create_listing_search(cursor):
+    """Migration 4: FTS5 index over food_listings.Food_Name, kept in sync by triggers."""
+    cursor.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS food_listings_fts USING fts5(
+            Food_Name,
+            content='food_listings',
+            content_rowid='Food_ID',
+            prefix='2 3'
+        );
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS food_listings_fts_insert AFTER INSERT ON food_listings BEGIN
+            INSERT INTO food_listings_fts (rowid, Food_Name) VALUES (new.Food_ID, new.Food_Name);
+        END;
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS food_listings_fts_delete AFTER DELETE ON food_listings BEGIN
+            INSERT INTO food_listings_fts (food_listings_fts, rowid, Food_Name) VALUES ('delete', old.Food_ID, old.Food_Name);
+        END;
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS food_listings_fts_update AFTER UPDATE OF Food_ID, Food_Name ON food_listings BEGIN
+            INSERT INTO food_listings_fts (food_listings_fts, rowid, Food_Name) VALUES ('delete', old.Food_ID, old.Food_Name);
+            INSERT INTO food_listings_fts (rowid, Food_Name) VALUES (new.Food_ID, new.Food_Name);
+        END;
+    ''')
+    cursor.execute("INSERT INTO food_listings_fts (food_listings_fts) VALUES ('rebuild')")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_listings_provider_type ON food_listings (Provider_Type)")
+
+
+def _create_table_versions(cursor):
+    """Migration 5: per-table version counters used to invalidate cached results."""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS table_versions (
+            Table_Name TEXT PRIMARY KEY,
+            Version INTEGER NOT NULL DEFAULT 0
+        );
+    ''')
+    cursor.executemany(
+        "INSERT OR IGNORE INTO table_versions (Table_Name) VALUES (?)",
+        [(name,) for name in TABLE_DEFINITIONS],
+    )
+
+
+SUMMARY_TABLES = [
+    '''
+    CREATE TABLE IF NOT EXISTS summary_city (
+        City TEXT PRIMARY KEY,
+        Listings INTEGER NOT NULL,
+        Quantity INTEGER NOT NULL
+    );
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS summary_provider (
+        Provider_ID INTEGER PRIMARY KEY,
+        Listings INTEGER NOT NULL,
+        Quantity INTEGER NOT NULL
+    );
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS summary_meal_type (
+        Meal_Type TEXT PRIMARY KEY,
+        Claims INTEGER NOT NULL
+    );
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS summary_claim_status (
+        Status TEXT PRIMARY KEY,
+        Claims INTEGER NOT NULL
+    );
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS summary_table_counts (
+        Table_Name TEXT PRIMARY KEY,
+        Row_Count INTEGER NOT NULL
+    );
+    ''',
+]
+
+# Add (sign '+') or remove (sign '-') one listing's contribution, written
+# against the trigger row alias 'row'. Replaced in migration 13.
+_LISTING_DELTA = '''
+    INSERT INTO summary_city (City, Listings, Quantity) VALUES (row.Location, {sign}1, {sign}row.Quantity)
+        ON CONFLICT(City) DO UPDATE SET Listings = Listings + excluded.Listings, Quantity = Quantity + excluded.Quantity;
+    INSERT INTO summary_provider (Provider_ID, Listings, Quantity) VALUES (row.Provider_ID, {sign}1, {sign}row.Quantity)
+        ON CONFLICT(Provider_ID) DO UPDATE SET Listings = Listings + excluded.Listings, Quantity = Quantity + excluded.Quantity;
+    INSERT INTO summary_meal_type (Meal_Type, Claims)
+        SELECT row.Meal_Type, {sign}COUNT(*) FROM claims WHERE Food_ID = row.Food_ID
+        ON CONFLICT(Meal_Type) DO UPDATE SET Claims = Claims + excluded.Claims;
+'''
+
+_CLAIM_DELTA = '''
+    INSERT INTO summary_claim_status (Status, Claims) VALUES (row.Status, {sign}1)
+        ON CONFLICT(Status) DO UPDATE SET Claims = Claims + excluded.Claims;
+    INSERT INTO summary_meal_type (Meal_Type, Claims)
+        SELECT Meal_Type, {sign}1 FROM food_listings WHERE Food_ID = row.Food_ID
+        ON CONFLICT(Meal_Type) DO UPDATE SET Claims = Claims + excluded.Claims;
+'''
+
+_COUNT_DELTA = '''
+    INSERT INTO summary_table_counts (Table_Name, Row_Count) VALUES ('{table}', {sign}1)
+        ON CONFLICT(Table_Name) DO UPDATE SET Row_Count = Row_Count + excluded.Row_Count;
+'''
+
+SUMMARY_FILL = {
+    'summary_city': "SELECT Location, COUNT(*), SUM(Quantity) FROM food_listings GROUP BY Location",
+    # As first written this also grouped NULL providers, which failed with
+    # a UNIQUE error, so no database applied this migration with them.
+    'summary_provider': """
+        SELECT Provider_ID, COUNT(*), SUM(Quantity) FROM food_listings
+        WHERE Provider_ID IS NOT NULL GROUP BY Provider_ID
+    """,
+    'summary_meal_type': """
+        SELECT fl.Meal_Type, COUNT(*) FROM claims c JOIN food_listings fl ON fl.Food_ID = c.Food_ID
+        GROUP BY fl.Meal_Type
+    """,
+    'summary_claim_status': "SELECT Status, COUNT(*) FROM claims GROUP BY Status",
+    'summary_table_counts': """
+        SELECT 'providers', COUNT(*) FROM providers
+        UNION ALL SELECT 'receivers', COUNT(*) FROM receivers
+        UNION ALL SELECT 'food_listings', COUNT(*) FROM food_listings
+        UNION ALL SELECT 'claims', COUNT(*) FROM claims
+    """,
+}
+
+
+def _create_summaries(cursor):
+    """Migration 6: materialized summary tables for the dashboard metrics."""
+    for statement in SUMMARY_TABLES:
+        cursor.execute(statement)
+    listing_columns = "Food_ID, Quantity, Provider_ID, Location, Meal_Type"
+    triggers = [
+        _trigger('summary_listings_insert', 'INSERT', 'food_listings',
+                 _delta(_LISTING_DELTA, 'new', '+') + _delta(_COUNT_DELTA, 'new', '+', table='food_listings')),
+        _trigger('summary_listings_delete', 'DELETE', 'food_listings',
+                 _delta(_LISTING_DELTA, 'old', '-') + _delta(_COUNT_DELTA, 'old', '-', table='food_listings')),
+        _trigger('summary_listings_update', f'UPDATE OF {listing_columns}', 'food_listings',
+                 _delta(_LISTING_DELTA, 'old', '-') + _delta(_LISTING_DELTA, 'new', '+')),
+        _trigger('summary_claims_insert', 'INSERT', 'claims',
+                 _delta(_CLAIM_DELTA, 'new', '+') + _delta(_COUNT_DELTA, 'new', '+', table='claims')),
+        _trigger('summary_claims_delete', 'DELETE', 'claims',
+                 _delta(_CLAIM_DELTA, 'old', '-') + _delta(_COUNT_DELTA, 'old', '-', table='claims')),
+        _trigger('summary_claims_update', 'UPDATE OF Food_ID, Status', 'claims',
+                 _delta(_CLAIM_DELTA, 'old', '-') + _delta(_CLAIM_DELTA, 'new', '+')),
+    ]
+    for table in ('providers', 'receivers'):
+        triggers.append(_trigger(f'summary_{table}_insert', 'INSERT', table, _delta(_COUNT_DELTA, 'new', '+', table=table)))
+        triggers.append(_trigger(f'summary_{table}_delete', 'DELETE', table, _delta(_COUNT_DELTA, 'old', '-', table=table)))
+    for statement in triggers:
+        cursor.execute(statement)
+    for table, query in SUMMARY_FILL.items():
+        cursor.execute(f"DELETE FROM {table}")
+        cursor.execute(f"INSERT INTO {table} {query}")
+
+
+ARCHIVE_TABLES = {
+    'food_listings_archive': '''
+        CREATE TABLE IF NOT EXISTS food_listings_archive (
+            Food_ID INTEGER PRIMARY KEY,
+            Food_Name TEXT NOT NULL,
+            Quantity INTEGER NOT NULL,
+            Expiry_Date DATE NOT NULL,
+            Provider_ID INTEGER,
+            Provider_Type TEXT NOT NULL,
+            Location TEXT NOT NULL,
+            Food_Type TEXT NOT NULL,
+            Meal_Type TEXT NOT NULL,
+            Archived_At TEXT NOT NULL,
+            Archive_Reason TEXT NOT NULL
+        );
+    ''',
+    'claims_archive': '''
+        CREATE TABLE IF NOT EXISTS claims_archive (
+            Claim_ID INTEGER PRIMARY KEY,
+            Food_ID INTEGER,
+            Receiver_ID INTEGER,
+            Status TEXT NOT NULL,
+            Timestamp DATETIME NOT NULL,
+            Archived_At TEXT NOT NULL
+        );
+    ''',
+}
+
+# One row per expiry day: "expiring in the next N hours" reads a few of
+# these rows instead of the listings.
+_EXPIRY_DELTA = '''
+    INSERT INTO summary_expiry (Expiry_Date, Listings, Quantity) VALUES (row.Expiry_Date, {sign}1, {sign}row.Quantity)
+        ON CONFLICT(Expiry_Date) DO UPDATE SET Listings = Listings + excluded.Listings, Quantity = Quantity + excluded.Quantity;
+'''
+
+
+def _create_archive(cursor):
+    """Migration 7: ISO expiry dates, archive tables and the expiry-date summary.
+
+    Expiry dates loaded as M/D/YYYY are rewritten as YYYY-MM-DD so that
+    range conditions on idx_listings_expiry compare correctly.
+    """
+    rows = cursor.execute("SELECT Food_ID, Expiry_Date FROM food_listings WHERE Expiry_Date LIKE '%/%'").fetchall()
+    if rows:
+        frame = pd.DataFrame(rows, columns=['Food_ID', 'Expiry_Date'])
+        frame['Expiry_Date'] = iso_dates(frame['Expiry_Date'])
+        cursor.executemany(
+            "UPDATE food_listings SET Expiry_Date = ? WHERE Food_ID = ?",
+            list(frame[['Expiry_Date', 'Food_ID']].itertuples(index=False, name=None)),
+        )
+    for ddl in ARCHIVE_TABLES.values():
+        cursor.execute(ddl)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_claims_archive_food ON claims_archive (Food_ID)")
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS summary_expiry (
+        Expiry_Date TEXT PRIMARY KEY,
+        Listings INTEGER NOT NULL,
+        Quantity INTEGER NOT NULL
+    );
+    ''')
+    for statement in [
+        _trigger('summary_expiry_insert', 'INSERT', 'food_listings', _delta(_EXPIRY_DELTA, 'new', '+')),
+        _trigger('summary_expiry_delete', 'DELETE', 'food_listings', _delta(_EXPIRY_DELTA, 'old', '-')),
+        _trigger('summary_expiry_update', 'UPDATE OF Expiry_Date, Quantity', 'food_listings',
+                 _delta(_EXPIRY_DELTA, 'old', '-') + _delta(_EXPIRY_DELTA, 'new', '+')),
+    ]:
+        cursor.execute(statement)
+    cursor.execute("DELETE FROM summary_expiry")
+    cursor.execute("INSERT INTO summary_expiry "
+                   "SELECT Expiry_Date, COUNT(*), SUM(Quantity) FROM food_listings GROUP BY Expiry_Date")
+
+
+def _partitions(cursor):
+    """Return the claims_YYYY_MM and claims_undated tables, oldest month first."""
+    return [row[0] for row in cursor.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' "
+        "AND (name GLOB 'claims_[0-9][0-9][0-9][0-9]_[0-9][0-9]' OR name = 'claims_undated') ORDER BY name")]
+
+
+def _archive_view(cursor, columns, empty):
+    """Recreate the claims_archive view over the partitions, or as the empty query when there are none."""
+    body = "\n    UNION ALL ".join(f"SELECT {', '.join(columns)} FROM {name}" for name in _partitions(cursor)) or empty
+    cursor.execute("DROP VIEW IF EXISTS claims_archive")
+    cursor.execute(f"CREATE VIEW claims_archive AS {body}")
+
+
+_CLAIM_TS = "CAST(strftime('%s', {timestamp}) AS INTEGER)"
+
+_PARTITION_DEFINITION = '''
+    CREATE TABLE IF NOT EXISTS {name} (
+        Claim_ID INTEGER PRIMARY KEY,
+        Food_ID INTEGER,
+        Receiver_ID INTEGER,
+        Status TEXT NOT NULL,
+        Timestamp DATETIME NOT NULL,
+        Claim_TS INTEGER,
+        Archived_At TEXT NOT NULL
+    );
+'''
+
+_ROLLUP_DELTA = '''
+    INSERT INTO claims_daily (Day, Status, City, Meal_Type, Claims)
+    SELECT
+        COALESCE(date(row.Timestamp), 'unknown'),
+        row.Status,
+        COALESCE((SELECT Location FROM food_listings WHERE Food_ID = row.Food_ID),
+                 (SELECT Location FROM food_listings_archive WHERE Food_ID = row.Food_ID), 'Unknown'),
+        COALESCE((SELECT Meal_Type FROM food_listings WHERE Food_ID = row.Food_ID),
+                 (SELECT Meal_Type FROM food_listings_archive WHERE Food_ID = row.Food_ID), 'Unknown'),
+        {sign}1
+    WHERE true
+    ON CONFLICT(Day, Status, City, Meal_Type) DO UPDATE SET Claims = Claims + excluded.Claims;
+'''
+
+
+def _create_claims_history(cursor):
+    """Migration 8: ISO claim timestamps, Claim_TS, monthly claim partitions and the daily rollup."""
+    for table in ('claims', 'claims_archive'):
+        rows = cursor.execute(f"SELECT Claim_ID, Timestamp FROM {table}").fetchall()
+        frame = pd.DataFrame(rows, columns=['Claim_ID', 'Timestamp'])
+        frame['Normalized'] = iso_timestamps(frame['Timestamp'])
+        changed = frame[frame['Normalized'] != frame['Timestamp']]
+        cursor.executemany(
+            f"UPDATE {table} SET Timestamp = ? WHERE Claim_ID = ?",
+            list(changed[['Normalized', 'Claim_ID']].itertuples(index=False, name=None)),
+        )
+
+    claim_ts = _CLAIM_TS.format(timestamp='Timestamp')
+    cursor.execute("ALTER TABLE claims ADD COLUMN Claim_TS INTEGER")
+    cursor.execute(f"UPDATE claims SET Claim_TS = {claim_ts}")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_claims_ts ON claims (Claim_TS)")
+
+    # Move the single archive table from migration 7 into monthly partitions.
+    cursor.execute("ALTER TABLE claims_archive RENAME TO claims_archive_old")
+    months = [row[0] for row in cursor.execute(
+        f"SELECT DISTINCT strftime('%Y_%m', {claim_ts}, 'unixepoch') FROM claims_archive_old")]
+    columns = "Claim_ID, Food_ID, Receiver_ID, Status, Timestamp"
+    for month in months:
+        name = f"claims_{month or 'undated'}"
+        cursor.execute(_PARTITION_DEFINITION.format(name=name))
+        cursor.execute(
+            f"INSERT INTO {name} ({columns}, Claim_TS, Archived_At) "
+            f"SELECT {columns}, {claim_ts}, Archived_At FROM claims_archive_old "
+            f"WHERE strftime('%Y_%m', {claim_ts}, 'unixepoch') IS ?",
+            (month,),
+        )
+    cursor.execute("DROP TABLE claims_archive_old")
+    _archive_view(cursor, (columns, 'Claim_TS', 'Archived_At'),
+                  f"SELECT {columns}, Claim_TS, NULL AS Archived_At FROM claims WHERE 0")
+
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS claims_daily (
+        Day TEXT NOT NULL,
+        Status TEXT NOT NULL,
+        City TEXT NOT NULL,
+        Meal_Type TEXT NOT NULL,
+        Claims INTEGER NOT NULL,
+        PRIMARY KEY (Day, Status, City, Meal_Type)
+    );
+    ''')
+    new_ts = _CLAIM_TS.format(timestamp='new.Timestamp')
+    for statement in [
+        f'''CREATE TRIGGER IF NOT EXISTS claims_ts_insert AFTER INSERT ON claims WHEN new.Claim_TS IS NULL BEGIN
+            UPDATE claims SET Claim_TS = {new_ts} WHERE Claim_ID = new.Claim_ID;
+        END;''',
+        f'''CREATE TRIGGER IF NOT EXISTS claims_ts_update AFTER UPDATE OF Timestamp ON claims BEGIN
+            UPDATE claims SET Claim_TS = {new_ts} WHERE Claim_ID = new.Claim_ID;
+        END;''',
+        f'''CREATE TRIGGER IF NOT EXISTS claims_daily_insert AFTER INSERT ON claims BEGIN
+            {_delta(_ROLLUP_DELTA, 'new', '+')}
+        END;''',
+        f'''CREATE TRIGGER IF NOT EXISTS claims_daily_delete AFTER DELETE ON claims
+            WHEN NOT EXISTS (SELECT 1 FROM claims_archive WHERE Claim_ID = old.Claim_ID) BEGIN
+            {_delta(_ROLLUP_DELTA, 'old', '-')}
+        END;''',
+        f'''CREATE TRIGGER IF NOT EXISTS claims_daily_update AFTER UPDATE OF Food_ID, Status, Timestamp ON claims BEGIN
+            {_delta(_ROLLUP_DELTA, 'old', '-')}
+            {_delta(_ROLLUP_DELTA, 'new', '+')}
+        END;''',
+    ]:
+        cursor.execute(statement)
+    cursor.execute("DELETE FROM claims_daily")
+    cursor.execute("""
+    INSERT INTO claims_daily
+    SELECT
+        COALESCE(date(c.Timestamp), 'unknown'),
+        c.Status,
+        COALESCE(fl.Location, fa.Location, 'Unknown'),
+        COALESCE(fl.Meal_Type, fa.Meal_Type, 'Unknown'),
+        COUNT(*)
+    FROM (
+        SELECT Food_ID, Status, Timestamp FROM claims
+        UNION ALL SELECT Food_ID, Status, Timestamp FROM claims_archive
+    ) c
+    LEFT JOIN food_listings fl ON fl.Food_ID = c.Food_ID
+    LEFT JOIN food_listings_archive fa ON fa.Food_ID = c.Food_ID
+    GROUP BY 1, 2, 3, 4
+    """)
+
+
+_ACTIVE = "IN ('Pending', 'Completed')"
+
+
+def _create_reservations(cursor):
+    """Migration 9: claimed quantities, reserved quantity and row versions for claim processing.
+
+    Existing claims are taken to claim their whole listing.
+    """
+    cursor.execute("ALTER TABLE claims ADD COLUMN Claimed_Quantity INTEGER")
+    cursor.execute("ALTER TABLE food_listings ADD COLUMN Reserved INTEGER NOT NULL DEFAULT 0")
+    cursor.execute("ALTER TABLE food_listings ADD COLUMN Version INTEGER NOT NULL DEFAULT 0")
+    cursor.execute("UPDATE claims SET Claimed_Quantity = COALESCE("
+                   "(SELECT Quantity FROM food_listings WHERE Food_ID = claims.Food_ID), 0)")
+    for name in _partitions(cursor):
+        columns = [row[1] for row in cursor.execute(f"PRAGMA table_info({name})")]
+        if 'Claimed_Quantity' not in columns:
+            cursor.execute(f"ALTER TABLE {name} ADD COLUMN Claimed_Quantity INTEGER")
+    columns = ('Claim_ID', 'Food_ID', 'Receiver_ID', 'Status', 'Timestamp', 'Claim_TS', 'Claimed_Quantity',
+               'Archived_At')
+    _archive_view(cursor, columns, f"SELECT {', '.join(f'NULL AS {column}' for column in columns)} WHERE 0")
+    cursor.execute(f"""UPDATE food_listings SET Reserved = (
+SELECT COALESCE(SUM(c.Claimed_Quantity), 0) FROM claims c
+WHERE c.Food_ID = food_listings.Food_ID AND c.Status {_ACTIVE}
+)""")
+    for statement in [
+        '''CREATE TRIGGER IF NOT EXISTS claims_quantity_insert AFTER INSERT ON claims
+            WHEN new.Claimed_Quantity IS NULL BEGIN
+            UPDATE claims SET Claimed_Quantity = COALESCE(
+                (SELECT Quantity FROM food_listings WHERE Food_ID = new.Food_ID), 0)
+            WHERE Claim_ID = new.Claim_ID;
+        END;''',
+        f'''CREATE TRIGGER IF NOT EXISTS claims_reserved_insert AFTER INSERT ON claims
+            WHEN new.Claimed_Quantity IS NOT NULL AND new.Status {_ACTIVE} BEGIN
+            UPDATE food_listings SET Reserved = Reserved + new.Claimed_Quantity WHERE Food_ID = new.Food_ID;
+        END;''',
+        f'''CREATE TRIGGER IF NOT EXISTS claims_reserved_update AFTER UPDATE OF Food_ID, Status, Claimed_Quantity ON claims BEGIN
+            UPDATE food_listings SET Reserved = Reserved - COALESCE(old.Claimed_Quantity, 0)
+            WHERE Food_ID = old.Food_ID AND old.Status {_ACTIVE};
+            UPDATE food_listings SET Reserved = Reserved + COALESCE(new.Claimed_Quantity, 0)
+            WHERE Food_ID = new.Food_ID AND new.Status {_ACTIVE};
+        END;''',
+        f'''CREATE TRIGGER IF NOT EXISTS claims_reserved_delete AFTER DELETE ON claims
+            WHEN old.Status {_ACTIVE} BEGIN
+            UPDATE food_listings SET Reserved = Reserved - COALESCE(old.Claimed_Quantity, 0) WHERE Food_ID = old.Food_ID;
+        END;''',
+        '''CREATE TRIGGER IF NOT EXISTS food_listings_version AFTER UPDATE OF
+            Food_Name, Quantity, Expiry_Date, Provider_ID, Provider_Type, Location, Food_Type, Meal_Type, Reserved
+            ON food_listings WHEN new.Version = old.Version BEGIN
+            UPDATE food_listings SET Version = old.Version + 1 WHERE Food_ID = new.Food_ID;
+        END;''',
+    ]:
+        cursor.execute(statement)
+
+
+def _create_proximity_index(cursor):
+    """Migration 10: city coordinates with an R*Tree index for distance queries."""
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS city_locations (
+        City_ID INTEGER PRIMARY KEY,
+        City TEXT NOT NULL UNIQUE,
+        Latitude REAL NOT NULL,
+        Longitude REAL NOT NULL
+    );
+''')
+    cursor.execute(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS city_rtree USING rtree(id, Min_Lat, Max_Lat, Min_Lon, Max_Lon)")
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS city_locations_rtree_insert AFTER INSERT ON city_locations
+        BEGIN
+            INSERT INTO city_rtree VALUES (new.City_ID, new.Latitude, new.Latitude, new.Longitude, new.Longitude);
+        END;
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS city_locations_rtree_update
+        AFTER UPDATE OF City_ID, Latitude, Longitude ON city_locations
+        BEGIN
+            DELETE FROM city_rtree WHERE id = old.City_ID;
+            INSERT INTO city_rtree VALUES (new.City_ID, new.Latitude, new.Latitude, new.Longitude, new.Longitude);
+        END;
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS city_locations_rtree_delete AFTER DELETE ON city_locations
+        BEGIN
+            DELETE FROM city_rtree WHERE id = old.City_ID;
+        END;
+    ''')
+
+
+# Row images written to change_log.Old and New: key, columns and one extra
+# field per table.
+_ROW_IMAGES = {
+    'food_listings': (
+        'Food_ID',
+        ('Food_ID', 'Food_Name', 'Quantity', 'Reserved', 'Expiry_Date', 'Provider_ID', 'Provider_Type',
+         'Location', 'Food_Type', 'Meal_Type'),
+        "'Listing_Claims', (SELECT COUNT(*) FROM claims WHERE Food_ID = row.Food_ID)",
+    ),
+    'claims': (
+        'Claim_ID',
+        ('Claim_ID', 'Food_ID', 'Receiver_ID', 'Status', 'Timestamp', 'Claimed_Quantity'),
+        "'Listing_Meal_Type', (SELECT Meal_Type FROM food_listings WHERE Food_ID = row.Food_ID)",
+    ),
+}
+
+
+def _image(table, alias):
+    key, columns, extra = _ROW_IMAGES[table]
+    pairs = ", ".join(f"'{column}', row.{column}" for column in columns)
+    return f"json_object({pairs}, {extra})".replace('row.', f'{alias}.')
+
+
+def _create_change_log(cursor):
+    """Migration 11: change_log filled by triggers on food_listings and claims, and its consumers."""
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS change_log (
+        Seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        Table_Name TEXT NOT NULL,
+        Row_ID INTEGER NOT NULL,
+        Operation TEXT NOT NULL,
+        Old TEXT,
+        New TEXT,
+        Changed_At TEXT NOT NULL DEFAULT (datetime('now'))
+    );
+''')
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS change_consumers (
+        Consumer TEXT PRIMARY KEY,
+        Last_Seq INTEGER NOT NULL,
+        Updated_At TEXT NOT NULL
+    );
+''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_change_log_time ON change_log (Changed_At)")
+    for table, (key, columns, _) in _ROW_IMAGES.items():
+        updated = ", ".join(column for column in columns if column != key)
+        for operation, event, old, new in (
+            ('insert', 'INSERT', None, 'new'),
+            ('update', f'UPDATE OF {key}, {updated}', 'old', 'new'),
+            ('delete', 'DELETE', 'old', None),
+        ):
+            row = new or old
+            cursor.execute(
+                f"CREATE TRIGGER IF NOT EXISTS change_{table}_{operation} AFTER {event} ON {table} BEGIN "
+                f"INSERT INTO change_log (Table_Name, Row_ID, Operation, Old, New) VALUES ("
+                f"'{table}', {row}.{key}, '{operation}', "
+                f"{_image(table, old) if old else 'NULL'}, {_image(table, new) if new else 'NULL'}); END;"
+            )
+
+
+def _create_ingested_rows(cursor):
+    """Migration 12: per-file snapshot of the rows each source CSV last loaded."""
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS ingested_rows (
+        Source_File TEXT NOT NULL,
+        Row_Key INTEGER NOT NULL,
+        Row_Hash INTEGER NOT NULL,
+        PRIMARY KEY (Source_File, Row_Key)
+    ) WITHOUT ROWID;
+''')
+
+
+# Migration 6's listing delta without NULL providers: a NULL Provider_ID
+# would get a fresh rowid instead of hitting ON CONFLICT.
+_LISTING_DELTA_13 = '''
+    INSERT INTO summary_city (City, Listings, Quantity) VALUES (row.Location, {sign}1, {sign}row.Quantity)
+        ON CONFLICT(City) DO UPDATE SET Listings = Listings + excluded.Listings, Quantity = Quantity + excluded.Quantity;
+    INSERT INTO summary_provider (Provider_ID, Listings, Quantity)
+        SELECT row.Provider_ID, {sign}1, {sign}row.Quantity WHERE row.Provider_ID IS NOT NULL
+        ON CONFLICT(Provider_ID) DO UPDATE SET Listings = Listings + excluded.Listings, Quantity = Quantity + excluded.Quantity;
+    INSERT INTO summary_meal_type (Meal_Type, Claims)
+        SELECT row.Meal_Type, {sign}COUNT(*) FROM claims WHERE Food_ID = row.Food_ID
+        ON CONFLICT(Meal_Type) DO UPDATE SET Claims = Claims + excluded.Claims;
+'''
+
+
+def _rekey_provider_summary(cursor):
+    """Migration 13: keep listings without a provider out of summary_provider."""
+    listing_columns = "Food_ID, Quantity, Provider_ID, Location, Meal_Type"
+    for name in ('summary_listings_insert', 'summary_listings_delete', 'summary_listings_update'):
+        cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+    for statement in [
+        _trigger('summary_listings_insert', 'INSERT', 'food_listings',
+                 _delta(_LISTING_DELTA_13, 'new', '+') + _delta(_COUNT_DELTA, 'new', '+', table='food_listings')),
+        _trigger('summary_listings_delete', 'DELETE', 'food_listings',
+                 _delta(_LISTING_DELTA_13, 'old', '-') + _delta(_COUNT_DELTA, 'old', '-', table='food_listings')),
+        _trigger('summary_listings_update', f'UPDATE OF {listing_columns}', 'food_listings',
+                 _delta(_LISTING_DELTA_13, 'old', '-') + _delta(_LISTING_DELTA_13, 'new', '+')),
+    ]:
+        cursor.execute(statement)
+    cursor.execute("DELETE FROM summary_provider")
+    cursor.execute(f"INSERT INTO summary_provider {SUMMARY_FILL['summary_provider']}")
+
+
+# Listings per expiry day and city: the live-listing metrics (expiry
+# date today or later) read a date range of these rows.
+_CITY_EXPIRY_DELTA = '''
+    INSERT INTO summary_city_expiry (Expiry_Date, City, Listings, Quantity)
+        VALUES (row.Expiry_Date, row.Location, {sign}1, {sign}row.Quantity)
+        ON CONFLICT(Expiry_Date, City) DO UPDATE SET
+            Listings = Listings + excluded.Listings, Quantity = Quantity + excluded.Quantity;
+'''
+
+
+def _create_city_expiry_summary(cursor):
+    """Migration 14: the expiry-day and city summary behind the live-listing metrics."""
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS summary_city_expiry (
+        Expiry_Date TEXT NOT NULL,
+        City TEXT NOT NULL,
+        Listings INTEGER NOT NULL,
+        Quantity INTEGER NOT NULL,
+        PRIMARY KEY (Expiry_Date, City)
+    );
+    ''')
+    for statement in [
+        _trigger('summary_city_expiry_insert', 'INSERT', 'food_listings', _delta(_CITY_EXPIRY_DELTA, 'new', '+')),
+        _trigger('summary_city_expiry_delete', 'DELETE', 'food_listings', _delta(_CITY_EXPIRY_DELTA, 'old', '-')),
+        _trigger('summary_city_expiry_update', 'UPDATE OF Expiry_Date, Location, Quantity', 'food_listings',
+                 _delta(_CITY_EXPIRY_DELTA, 'old', '-') + _delta(_CITY_EXPIRY_DELTA, 'new', '+')),
+    ]:
+        cursor.execute(statement)
+    cursor.execute("DELETE FROM summary_city_expiry")
+    cursor.execute("INSERT INTO summary_city_expiry "
+                   "SELECT Expiry_Date, Location, COUNT(*), SUM(Quantity) FROM food_listings GROUP BY Expiry_Date, Location")
+
+
+# Move the rollup counts of one listing's claims from one city and meal
+# type to another, for the trigger row alias 'old'.
+_LISTING_ROLLUP_DELTA = '''
+    INSERT INTO claims_daily (Day, Status, City, Meal_Type, Claims)
+    SELECT COALESCE(date(Timestamp), 'unknown'), Status, {city}, {meal_type}, {sign}COUNT(*)
+    FROM claims WHERE Food_ID = old.Food_ID
+    GROUP BY 1, 2
+    ON CONFLICT(Day, Status, City, Meal_Type) DO UPDATE SET Claims = Claims + excluded.Claims;
+'''
+
+
+def _follow_listings_in_rollup(cursor):
+    """Migration 15: keep claims_daily in step when a listing with claims moves or goes away.
+
+    The rollup files a claim under its listing's city and meal type; a
+    listing deleted outside the expiry sweeper leaves its claims under
+    'Unknown'. The rollup is rebuilt once for databases that drifted.
+    """
+    old = {'city': 'old.Location', 'meal_type': 'old.Meal_Type'}
+    new = {'city': 'new.Location', 'meal_type': 'new.Meal_Type'}
+    unknown = {'city': "'Unknown'", 'meal_type': "'Unknown'"}
+    for statement in [
+        f'''CREATE TRIGGER IF NOT EXISTS claims_daily_listing_update AFTER UPDATE OF Location, Meal_Type ON food_listings
+            WHEN old.Location IS NOT new.Location OR old.Meal_Type IS NOT new.Meal_Type BEGIN
+            {_LISTING_ROLLUP_DELTA.format(sign='-', **old)}
+            {_LISTING_ROLLUP_DELTA.format(sign='+', **new)}
+        END;''',
+        f'''CREATE TRIGGER IF NOT EXISTS claims_daily_listing_delete AFTER DELETE ON food_listings
+            WHEN NOT EXISTS (SELECT 1 FROM food_listings_archive WHERE Food_ID = old.Food_ID) BEGIN
+            {_LISTING_ROLLUP_DELTA.format(sign='-', **old)}
+            {_LISTING_ROLLUP_DELTA.format(sign='+', **unknown)}
+        END;''',
+    ]:
+        cursor.execute(statement)
+    cursor.execute("DELETE FROM claims_daily")
+    cursor.execute("""
+    INSERT INTO claims_daily
+    SELECT
+        COALESCE(date(c.Timestamp), 'unknown'),
+        c.Status,
+        COALESCE(fl.Location, fa.Location, 'Unknown'),
+        COALESCE(fl.Meal_Type, fa.Meal_Type, 'Unknown'),
+        COUNT(*)
+    FROM (
+        SELECT Food_ID, Status, Timestamp FROM claims
+        UNION ALL SELECT Food_ID, Status, Timestamp FROM claims_archive
+    ) c
+    LEFT JOIN food_listings fl ON fl.Food_ID = c.Food_ID
+    LEFT JOIN food_listings_archive fa ON fa.Food_ID = c.Food_ID
+    GROUP BY 1, 2, 3, 4
+    """)
+
+
+MIGRATIONS = [
+    (1, _create_base_tables),
+    (2, _rebuild_unkeyed_tables),
+    (3, _create_indexes),
+    (4, _create_listing_search),
+    (5, _create_table_versions),
+    (6, _create_summaries),
+    (7, _create_archive),
+    (8, _create_claims_history),
+    (9, _create_reservations),
+    (10, _create_proximity_index),
+    (11, _create_change_log),
+    (12, _create_ingested_rows),
+    (13, _rekey_provider_summary),
+    (14, _create_city_expiry_summary),
+    (15, _follow_listings_in_rollup),
+]
@@ -0,0 +1,196 @@
+import argparse
+import hashlib
+import math
+import os
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+from database_manager import bump_table_versions
+
+# Offline gazetteer of city coordinates shipped next to this module. The
+# bundled coordinates are synthetic: the sample data's city names are not
+# real places, so each name is placed at a fixed point derived from its
+# hash (see synthetic_gazetteer). Put a city_coordinates.csv with real
+# coordinates in the data directory to use those instead; distance
+# features are only offered to users once real coordinates are loaded
+# (see real_gazetteer_loaded).
+GAZETTEER_FILE = 'city_coordinates.csv'
+GAZETTEER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), GAZETTEER_FILE)
+GAZETTEER_COLUMNS = ('City', 'Latitude', 'Longitude')
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = 111.32
+NEARBY_KM = 25.0
+
+# Area the synthetic coordinates are spread over: a square of this many
+# kilometres centred on the contiguous United States.
+SYNTHETIC_CENTER = (39.83, -98.58)
+SYNTHETIC_SPAN_KM = 600.0
+
+# city_locations holds one row per city and city_rtree one point box per
+# city, so bounding-box lookups do not read every city; triggers keep the
+# two in step (see migrations.py).
+UPSERT_QUERY = '''
+    INSERT INTO city_locations (City, Latitude, Longitude) VALUES (?, ?, ?)
+    ON CONFLICT(City) DO UPDATE SET Latitude = excluded.Latitude, Longitude = excluded.Longitude
+'''
+
+# Every city name the tables refer to; used to write a gazetteer.
+CITY_SOURCES = (
+    ('providers', 'City'),
+    ('receivers', 'City'),
+    ('food_listings', 'Location'),
+    ('food_listings_archive', 'Location'),
+)
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance in kilometres; accepts scalars or arrays."""
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(value, dtype=float)) for value in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def bounding_box(latitude, longitude, km):
+    """Return (min lat, max lat, min lon, max lon) enclosing every point within km.
+
+    Near the poles or across the antimeridian the box widens to all
+    longitudes; distances are checked exactly afterwards anyway.
+    """
+    dlat = km / KM_PER_DEGREE
+    min_lat, max_lat = max(latitude - dlat, -90.0), min(latitude + dlat, 90.0)
+    cos_lat = min(math.cos(math.radians(min_lat)), math.cos(math.radians(max_lat)))
+    dlon = km / (KM_PER_DEGREE * cos_lat) if cos_lat > 1e-6 else 180.0
+    if dlon >= 180.0 or abs(longitude) + dlon > 180.0:
+        return min_lat, max_lat, -180.0, 180.0
+    return min_lat, max_lat, longitude - dlon, longitude + dlon
+
+
+def synthetic_gazetteer(cities, center=SYNTHETIC_CENTER, span_km=SYNTHETIC_SPAN_KM):
+    """Place each city name at a fixed pseudo-random point in a span_km square around center.
+
+    The position depends only on the name, so regenerating the file never
+    moves a city.
+    """
+    rows = []
+    cos_center = math.cos(math.radians(center[0]))
+    for city in sorted(set(cities)):
+        digest = hashlib.sha256(city.encode('utf-8')).digest()
+        u = int.from_bytes(digest[:8], 'big') / 2 ** 64 - 0.5
+        v = int.from_bytes(digest[8:16], 'big') / 2 ** 64 - 0.5
+        rows.append((
+            city,
+            round(center[0] + u * span_km / KM_PER_DEGREE, 5),
+            round(center[1] + v * span_km / (KM_PER_DEGREE * cos_center), 5),
+        ))
+    return pd.DataFrame(rows, columns=list(GAZETTEER_COLUMNS))
+
+
+def gazetteer_path(data_dir='.'):
+    """Return the data directory's city_coordinates.csv if there is one, else the bundled file."""
+    path = os.path.join(data_dir, GAZETTEER_FILE)
+    return path if os.path.exists(path) else GAZETTEER_PATH
+
+
+def load_gazetteer(conn, source=None):
+    """Bring city_locations in line with a gazetteer CSV path or DataFrame.
+
+    Only added, moved and removed cities are written, in one transaction.
+    Returns {'inserted', 'changed', 'deleted'}, 'unchanged' or 'missing'.
+    """
+    if not isinstance(source, pd.DataFrame):
+        path = source or GAZETTEER_PATH
+        if not os.path.exists(path):
+            return 'missing'
+        source = pd.read_csv(path)
+    new = source[list(GAZETTEER_COLUMNS)].dropna().drop_duplicates('City', keep='last')
+    old = pd.read_sql_query("SELECT City, Latitude, Longitude FROM city_locations", conn)
+
+    merged = new.merge(old, on='City', how='left', suffixes=('', '_old'), indicator=True)
+    inserted = merged[merged['_merge'] == 'left_only']
+    both = merged[merged['_merge'] == 'both']
+    changed = both[(both['Latitude'] != both['Latitude_old']) | (both['Longitude'] != both['Longitude_old'])]
+    deleted = old[~old['City'].isin(new['City'])]
+    if inserted.empty and changed.empty and deleted.empty:
+        return 'unchanged'
+
+    try:
+        conn.execute("BEGIN")
+        conn.executemany("DELETE FROM city_locations WHERE City = ?", [(city,) for city in deleted['City']])
+        rows = pd.concat([inserted, changed])[list(GAZETTEER_COLUMNS)]
+        conn.executemany(UPSERT_QUERY, list(rows.itertuples(index=False, name=None)))
+        bump_table_versions(conn, ['city_locations'])
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return {'inserted': len(inserted), 'changed': len(changed), 'deleted': len(deleted)}
+
+
+def real_gazetteer_loaded(conn, sample=50):
+    """Return whether city_locations holds real coordinates rather than synthetic ones.
+
+    Synthetic positions depend only on the city name, so a sample of
+    cities that all sit exactly where synthetic_gazetteer puts them means
+    the bundled demo file (or a regenerated one) is loaded.
+    """
+    try:
+        rows = conn.execute(
+            "SELECT City, Latitude, Longitude FROM city_locations ORDER BY City_ID LIMIT ?", (sample,)).fetchall()
+    except sqlite3.OperationalError:
+        return False
+    if not rows:
+        return False
+    synthetic = synthetic_gazetteer(row[0] for row in rows).set_index('City')
+    return any(
+        not (math.isclose(latitude, synthetic.at[city, 'Latitude'], abs_tol=1e-6)
+             and math.isclose(longitude, synthetic.at[city, 'Longitude'], abs_tol=1e-6))
+        for city, latitude, longitude in rows
+    )
+
+
+def known_cities(conn):
+    """Return every city name used by the providers, receivers and listings."""
+    cities = set()
+    for table, column in CITY_SOURCES:
+        try:
+            cities.update(row[0] for row in conn.execute(f"SELECT DISTINCT {column} FROM {table}") if row[0])
+        except sqlite3.OperationalError:
+            continue
+    return cities
+
+
+def main(argv=None):
+    """Command-line entry point: write or load the gazetteer and list the cities near one."""
+    from database_manager import configure_connection, create_tables
+    from data_analysis import cities_within
+
+    parser = argparse.ArgumentParser(description="Manage the city gazetteer and query nearby cities.")
+    parser.add_argument('--db', default='food_wastage.db', help="SQLite database file")
+    parser.add_argument('--write-gazetteer', metavar='CSV',
+                        help="Write synthetic coordinates for every city in the database to this file")
+    parser.add_argument('--load', metavar='CSV', help="Load this gazetteer instead of the bundled one")
+    parser.add_argument('--city', help="List the cities within --km of this city")
+    parser.add_argument('--km', type=float, default=NEARBY_KM)
+    args = parser.parse_args(argv)
+
+    conn = configure_connection(sqlite3.connect(args.db))
+    try:
+        if args.write_gazetteer:
+            frame = synthetic_gazetteer(known_cities(conn))
+            frame.to_csv(args.write_gazetteer, index=False)
+            print(f"Wrote {len(frame):,} cities to {args.write_gazetteer}")
+            return 0
+        create_tables(conn)
+        print(f"city_locations: {load_gazetteer(conn, args.load)}")
+        if args.city:
+            print(cities_within(conn, args.city, args.km).to_string(index=False))
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
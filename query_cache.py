@@ -0,0 +1,130 @@
+import re
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+from database_manager import current_table_versions
+from summaries import SUMMARY_SOURCES
+
+CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+_TABLE_REFERENCE = re.compile(r'\b(?:FROM|JOIN)\s+([A-Za-z_][A-Za-z0-9_]*)', re.IGNORECASE)
+
+
+def query_tables(query):
+    """Return the names of the versioned tables a query depends on.
+
+    Summary tables are replaced by the base tables they are derived from.
+    """
+    tables = set()
+    for name in _TABLE_REFERENCE.findall(query):
+        name = name.lower()
+        tables.update(SUMMARY_SOURCES.get(name, (name,)))
+    return frozenset(tables)
+
+
+class QueryCache:
+    """LRU cache of query results bounded by the memory of the cached frames.
+
+    Each entry remembers the versions of the tables its query read. An
+    entry is only served while those versions are current, and entries
+    for a table are dropped as soon as a newer version of it is seen.
+    """
+
+    def __init__(self, max_bytes=CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._known_versions = {}
+        self._bytes = 0
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'invalidations': 0, 'uncacheable': 0}
+
+    def _drop(self, key):
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+    def sync_versions(self, versions):
+        """Drop the entries of every table whose version moved since the last call."""
+        with self._lock:
+            changed = {table for table, version in versions.items() if version > self._known_versions.get(table, -1)}
+            if not changed:
+                return
+            self._known_versions.update({table: versions[table] for table in changed})
+            for key in [key for key, (_, deps, _) in self._entries.items() if changed & deps.keys()]:
+                self._drop(key)
+                self._stats['invalidations'] += 1
+
+    def get(self, key, dep_versions):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] == dep_versions:
+                self._entries.move_to_end(key)
+                self._stats['hits'] += 1
+                return entry[0]
+            self._stats['misses'] += 1
+            return None
+
+    def put(self, key, frame, dep_versions):
+        size = int(frame.memory_usage(index=True, deep=True).sum())
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            if size > self.max_bytes:
+                self._stats['uncacheable'] += 1
+                return
+            self._entries[key] = (frame, dep_versions, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self._stats['evictions'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """Return hit/miss counters and the current size of the cache."""
+        with self._lock:
+            lookups = self._stats['hits'] + self._stats['misses']
+            return {
+                **self._stats,
+                'hit_rate': self._stats['hits'] / lookups if lookups else 0.0,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+            }
+
+
+_cache = QueryCache()
+
+
+def get_query_cache():
+    """Return the process-wide result cache."""
+    return _cache
+
+
+def cached_lookup(conn, query, params=None):
+    """Run a read query through the result cache and return (frame, hit).
+
+    The cache keeps its own copy of each result and hands out copies, so
+    callers may modify what they get back without affecting other
+    sessions. Queries that read a table without a version counter are
+    never cached.
+    """
+    versions = current_table_versions(conn)
+    _cache.sync_versions(versions)
+    tables = query_tables(query)
+    if not tables <= versions.keys():
+        return pd.read_sql_query(query, conn, params=params), False
+
+    key = (query, tuple(params) if params is not None else None)
+    dep_versions = {table: versions[table] for table in tables}
+    frame = _cache.get(key, dep_versions)
+    if frame is not None:
+        return frame.copy(), True
+    frame = pd.read_sql_query(query, conn, params=params)
+    _cache.put(key, frame.copy(), dep_versions)
+    return frame, False
+
@@ -0,0 +1,329 @@
+import argparse
+import glob
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from urllib.parse import quote
+
+import pandas as pd
+
+PREVIEW_ROWS = 1000
+FETCH_CHUNK_ROWS = 5000
+STATEMENT_TIMEOUT = 60.0
+
+# Streamlit keeps a download button's data in memory, so exports from the
+# page stop at this size; `python query_runner.py` writes larger results
+# straight to a file.
+MAX_DOWNLOAD_BYTES = 100 * 1024 * 1024
+
+# SQLite calls the progress handler every this many virtual machine
+# instructions while a statement runs.
+PROGRESS_INTERVAL = 10000
+
+EXPORT_FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+}
+
+# Export files live in the temp directory only while a download is being
+# prepared; any left behind by a killed process are removed after this age.
+EXPORT_PREFIX = 'query_results_'
+EXPORT_TTL_SECONDS = 3600
+
+
+# User statements run off the Streamlit script thread, so the page can keep
+# polling and cancel the statement when the run is interrupted.
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='sql-runner')
+
+
+def run_in_background(function, *args, **kwargs):
+    """Submit a runner call to the background pool and return its future."""
+    return _executor.submit(function, *args, **kwargs)
+
+
+class QueryCancelled(Exception):
+    """Raised when a running statement is cancelled."""
+
+
+class QueryTimeout(Exception):
+    """Raised when a running statement exceeds its timeout."""
+
+
+class ExportTooLarge(Exception):
+    """Raised when an export grows past its size limit."""
+
+
+def _deny_attach(action, *args):
+    return sqlite3.SQLITE_DENY if action == sqlite3.SQLITE_ATTACH else sqlite3.SQLITE_OK
+
+
+@contextmanager
+def read_only_connection(path):
+    """Open a connection for one user statement and close it afterwards.
+
+    The file is opened with mode=ro and ATTACH is refused, so the
+    statement cannot write anywhere, and whatever it leaves behind (a
+    PRAGMA, an open transaction) goes away with the connection instead of
+    reaching the next run.
+    """
+    conn = sqlite3.connect(f"file:{quote(os.path.abspath(path))}?mode=ro", uri=True, check_same_thread=False)
+    try:
+        conn.execute("PRAGMA busy_timeout = 5000")
+        conn.set_authorizer(_deny_attach)
+        yield conn
+    finally:
+        conn.close()
+
+
+class QueryControl:
+    """Cancellation flag and deadline for one user statement.
+
+    cancel() may be called from any thread; the statement stops at the
+    next progress-handler callback.
+    """
+
+    def __init__(self, timeout=STATEMENT_TIMEOUT):
+        self.timeout = timeout
+        self.deadline = time.monotonic() + timeout if timeout else None
+        self._cancelled = threading.Event()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    @property
+    def timed_out(self):
+        return self.deadline is not None and time.monotonic() > self.deadline
+
+    def should_abort(self):
+        return int(self.cancelled or self.timed_out)
+
+    def raise_if_aborted(self, error=None):
+        if self.cancelled:
+            raise QueryCancelled("The query was cancelled.") from error
+        if self.timed_out:
+            raise QueryTimeout(f"The query did not finish within {self.timeout:g} s.") from error
+
+
+def iter_chunks(conn, query, params=None, chunk_rows=FETCH_CHUNK_ROWS, control=None):
+    """Yield the result of a query as DataFrames of at most chunk_rows rows.
+
+    Only one chunk is held at a time. With a control, a progress handler
+    stops the statement on cancellation or timeout and QueryCancelled or
+    QueryTimeout is raised.
+    """
+    control = control or QueryControl(timeout=None)
+    conn.set_progress_handler(control.should_abort, PROGRESS_INTERVAL)
+    try:
+        try:
+            cursor = conn.execute(query, params or ())
+            if cursor.description is None:
+                return
+            columns = [column[0] for column in cursor.description]
+            while True:
+                rows = cursor.fetchmany(chunk_rows)
+                if not rows:
+                    break
+                yield pd.DataFrame.from_records(rows, columns=columns)
+                control.raise_if_aborted()
+        except sqlite3.OperationalError as e:
+            control.raise_if_aborted(e)
+            raise
+    finally:
+        conn.set_progress_handler(None, 0)
+
+
+def preview(conn, query, params=None, max_rows=PREVIEW_ROWS, control=None):
+    """Return (first max_rows rows, whether more rows exist) without reading the rest."""
+    frames, kept = [], 0
+    chunks = iter_chunks(conn, query, params, chunk_rows=min(max_rows + 1, FETCH_CHUNK_ROWS), control=control)
+    try:
+        for chunk in chunks:
+            frames.append(chunk)
+            kept += len(chunk)
+            if kept > max_rows:
+                break
+    finally:
+        chunks.close()
+    if not frames:
+        return pd.DataFrame(), False
+    result = pd.concat(frames, ignore_index=True)
+    return result.iloc[:max_rows], len(result) > max_rows
+
+
+def export_chunks(conn, query, fmt='csv', params=None, control=None, chunk_rows=FETCH_CHUNK_ROWS):
+    """Yield the full result of a query as encoded bytes, chunk by chunk.
+
+    CSV chunks are independent pieces of one file. Parquet is written one
+    row group per chunk and needs pyarrow.
+    """
+    chunks = iter_chunks(conn, query, params, chunk_rows=chunk_rows, control=control)
+    if fmt == 'csv':
+        first = True
+        for chunk in chunks:
+            yield chunk.to_csv(index=False, header=first).encode('utf-8')
+            first = False
+    elif fmt == 'parquet':
+        yield from _parquet_chunks(chunks)
+    else:
+        raise ValueError(f"Unsupported export format: {fmt}")
+
+
+class _ByteSink:
+    """Write-only file object that hands written bytes back to a generator."""
+
+    def __init__(self):
+        self.pending = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        self.pending.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b''.join(self.pending)
+        self.pending.clear()
+        return data
+
+
+def _parquet_schema(table):
+    """Schema for a Parquet export taken from its first chunk; all-NULL columns become strings."""
+    import pyarrow as pa
+    return pa.schema([
+        field.with_type(pa.string()) if pa.types.is_null(field.type) else field
+        for field in table.schema
+    ])
+
+
+def _conform(chunk, schema):
+    """Cast one chunk to the export schema.
+
+    SQLite columns are dynamically typed, so a later chunk may hold
+    numbers in a text column or NULLs in an integer one.
+    """
+    import pyarrow as pa
+    for field in schema:
+        if pa.types.is_string(field.type):
+            column = chunk[field.name]
+            chunk[field.name] = column.astype(object).where(column.isna(), column.astype(str))
+    try:
+        return pa.Table.from_pandas(chunk, schema=schema, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError) as e:
+        raise ValueError(f"A column changed type part way through the result; export it as CSV instead. ({e})") from e
+
+
+def _parquet_chunks(chunks):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise RuntimeError("Parquet export requires the pyarrow package.") from e
+
+    sink = _ByteSink()
+    writer = None
+    try:
+        for chunk in chunks:
+            if writer is None:
+                writer = pq.ParquetWriter(sink, _parquet_schema(pa.Table.from_pandas(chunk, preserve_index=False)))
+            writer.write_table(_conform(chunk, writer.schema))
+            data = sink.drain()
+            if data:
+                yield data
+    finally:
+        if writer is not None:
+            writer.close()
+    data = sink.drain()
+    if data:
+        yield data
+
+
+def new_export_path(fmt):
+    """Create an empty temp file for an export, after removing stale ones."""
+    remove_stale_exports()
+    handle, path = tempfile.mkstemp(prefix=EXPORT_PREFIX, suffix=f'.{EXPORT_FORMATS[fmt][1]}')
+    os.close(handle)
+    return path
+
+
+def remove_export(path):
+    """Delete one export file if it still exists."""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def remove_stale_exports(ttl=EXPORT_TTL_SECONDS):
+    """Delete export files older than ttl seconds from the temp directory."""
+    cutoff = time.time() - ttl
+    for path in glob.glob(os.path.join(tempfile.gettempdir(), f'{EXPORT_PREFIX}*')):
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+        except OSError:
+            continue
+
+
+def export_to_file(conn, query, path, fmt='csv', params=None, control=None, chunk_rows=FETCH_CHUNK_ROWS,
+                   max_bytes=None):
+    """Stream the full result of a query into a file and return the bytes written.
+
+    With max_bytes, the statement is stopped and ExportTooLarge raised
+    once the file would grow past it.
+    """
+    written = 0
+    chunks = export_chunks(conn, query, fmt, params, control, chunk_rows)
+    try:
+        with open(path, 'wb') as f:
+            for data in chunks:
+                written += len(data)
+                if max_bytes is not None and written > max_bytes:
+                    raise ExportTooLarge(f"The result is larger than {max_bytes / 1024 ** 2:,.0f} MB.")
+                f.write(data)
+    finally:
+        chunks.close()
+    return written
+
+
+def main(argv=None):
+    """Command-line entry point: export the result of one query to a file, without a size limit."""
+    parser = argparse.ArgumentParser(description="Export the result of a SQL query to a CSV or Parquet file.")
+    parser.add_argument('query', help="SQL statement to run")
+    parser.add_argument('output', help="File to write")
+    parser.add_argument('--db', default='food_wastage.db', help="SQLite database file")
+    parser.add_argument('--format', choices=list(EXPORT_FORMATS), default='csv')
+    parser.add_argument('--timeout', type=float, default=0, help="Stop the statement after this many seconds")
+    args = parser.parse_args(argv)
+
+    try:
+        with read_only_connection(args.db) as conn:
+            written = export_to_file(conn, args.query, args.output, args.format,
+                                     control=QueryControl(timeout=args.timeout or None))
+    except (QueryTimeout, sqlite3.Error) as e:
+        print(f"Export failed: {e}", file=sys.stderr)
+        return 1
+    print(f"Wrote {written:,} bytes to {args.output}.")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,112 @@
+import argparse
+import sqlite3
+
+# Summary table -> the base tables it is derived from. The query cache uses
+# this to invalidate summary reads when a base table changes.
+SUMMARY_SOURCES = {
+    'summary_city': ('food_listings',),
+    'summary_provider': ('food_listings',),
+    'summary_meal_type': ('food_listings', 'claims'),
+    'summary_claim_status': ('claims',),
+    'summary_table_counts': ('providers', 'receivers', 'food_listings', 'claims'),
+    'summary_expiry': ('food_listings',),
+    'summary_city_expiry': ('food_listings',),
+    # Maintained by claims_history; a listing's city and meal type file its claims.
+    'claims_daily': ('claims', 'food_listings'),
+}
+
+# Full recomputation of every summary table from the base tables, in the
+# same column order as the summary tables. The tables and the triggers
+# that keep them current come from migrations 6, 7, 13 and 14 in migrations.py.
+RECOMPUTE_QUERIES = {
+    'summary_city': "SELECT Location, COUNT(*), SUM(Quantity) FROM food_listings GROUP BY Location",
+    'summary_provider': """
+        SELECT Provider_ID, COUNT(*), SUM(Quantity) FROM food_listings
+        WHERE Provider_ID IS NOT NULL GROUP BY Provider_ID
+    """,
+    'summary_meal_type': """
+        SELECT fl.Meal_Type, COUNT(*) FROM claims c JOIN food_listings fl ON fl.Food_ID = c.Food_ID
+        GROUP BY fl.Meal_Type
+    """,
+    'summary_claim_status': "SELECT Status, COUNT(*) FROM claims GROUP BY Status",
+    'summary_table_counts': """
+        SELECT 'providers', COUNT(*) FROM providers
+        UNION ALL SELECT 'receivers', COUNT(*) FROM receivers
+        UNION ALL SELECT 'food_listings', COUNT(*) FROM food_listings
+        UNION ALL SELECT 'claims', COUNT(*) FROM claims
+    """,
+    'summary_expiry': "SELECT Expiry_Date, COUNT(*), SUM(Quantity) FROM food_listings GROUP BY Expiry_Date",
+    'summary_city_expiry': """
+        SELECT Expiry_Date, Location, COUNT(*), SUM(Quantity) FROM food_listings GROUP BY Expiry_Date, Location
+    """,
+}
+
+# Summary tables keyed on more than their first column.
+KEY_COLUMNS = {'summary_city_expiry': 2}
+
+
+def rebuild_summaries(cursor):
+    """Replace the contents of every summary table with a full recomputation."""
+    for table, query in RECOMPUTE_QUERIES.items():
+        cursor.execute(f"DELETE FROM {table}")
+        cursor.execute(f"INSERT INTO {table} {query}")
+
+
+def _key(row, width):
+    return row[0] if width == 1 else tuple(row[:width])
+
+
+def verify_summaries(conn):
+    """Compare every summary table with a full recomputation.
+
+    Returns {table: [(key, stored, expected), ...]} for the rows that
+    differ; groups that have dropped to zero count as absent.
+    """
+    differences = {}
+    for table, query in RECOMPUTE_QUERIES.items():
+        width = KEY_COLUMNS.get(table, 1)
+        stored = {_key(row, width): tuple(row[width:]) for row in conn.execute(f"SELECT * FROM {table}")
+                  if any(row[width:])}
+        expected = {_key(row, width): tuple(row[width:]) for row in conn.execute(query) if any(row[width:])}
+        rows = [(key, stored.get(key), expected.get(key))
+                for key in sorted(stored.keys() | expected.keys(), key=str)
+                if stored.get(key) != expected.get(key)]
+        if rows:
+            differences[table] = rows
+    return differences
+
+
+def main(argv=None):
+    """Command-line entry point: verify the summaries and rebuild them if they drifted."""
+    from database_manager import bump_table_versions, configure_connection, create_tables
+
+    parser = argparse.ArgumentParser(description="Check the summary tables against a full recomputation.")
+    parser.add_argument('--db', default='food_wastage.db', help="SQLite database file")
+    parser.add_argument('--check-only', action='store_true', help="Report differences without rebuilding")
+    args = parser.parse_args(argv)
+
+    conn = configure_connection(sqlite3.connect(args.db))
+    try:
+        create_tables(conn)
+        differences = verify_summaries(conn)
+        for table, rows in differences.items():
+            print(f"{table}: {len(rows)} row(s) differ")
+            for key, stored, expected in rows[:10]:
+                print(f"    {key}: stored={stored} expected={expected}")
+        if not differences:
+            print("Summaries match a full recomputation.")
+        elif not args.check_only:
+            conn.execute("BEGIN IMMEDIATE")
+            rebuild_summaries(conn)
+            # Cached results and API ETags follow the source tables' versions.
+            sources = {source for table in RECOMPUTE_QUERIES for source in SUMMARY_SOURCES[table]}
+            bump_table_versions(conn, sorted(sources))
+            conn.commit()
+            print("Summaries rebuilt.")
+    finally:
+        conn.close()
+    return 1 if differences and args.check_only else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,67 @@
+import os
+import sqlite3
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database_manager
+from database_manager import ConnectionManager, configure_connection, create_tables
+from query_cache import get_query_cache
+
+PROVIDERS = [
+    (1, 'Green Grocer', 'Supermarket', '1 Main St', 'Springfield', '555-0001'),
+    (2, 'Corner Bakery', 'Bakery', '2 Main St', 'Shelbyville', '555-0002'),
+]
+RECEIVERS = [
+    (1, 'Food Bank', 'NGO', 'Springfield', '555-1001'),
+    (2, 'Shelter', 'Shelter', 'Shelbyville', '555-1002'),
+]
+
+
+@pytest.fixture
+def db_path(tmp_path, monkeypatch):
+    """Path of a migrated database with two providers and two receivers.
+
+    The process-wide ConnectionManager points at it for the test, and the
+    query cache starts empty.
+    """
+    path = str(tmp_path / 'food_wastage.db')
+    conn = configure_connection(sqlite3.connect(path))
+    create_tables(conn)
+    conn.executemany("INSERT INTO providers VALUES (?, ?, ?, ?, ?, ?)", PROVIDERS)
+    conn.executemany("INSERT INTO receivers VALUES (?, ?, ?, ?, ?)", RECEIVERS)
+    conn.commit()
+    conn.close()
+    monkeypatch.setattr(database_manager, '_manager', ConnectionManager(path))
+    get_query_cache().clear()
+    return path
+
+
+@pytest.fixture
+def conn(db_path):
+    """A read-write connection to the test database."""
+    conn = configure_connection(sqlite3.connect(db_path))
+    yield conn
+    conn.close()
+
+
+def add_listing(conn, food_id, quantity=10, expiry='2099-01-01', provider_id=1, location='Springfield',
+                meal_type='Lunch'):
+    """Insert one food listing and commit."""
+    conn.execute(
+        "INSERT INTO food_listings (Food_ID, Food_Name, Quantity, Expiry_Date, Provider_ID, Provider_Type,"
+        " Location, Food_Type, Meal_Type) VALUES (?, 'Bread', ?, ?, ?, 'Bakery', ?, 'Vegetarian', ?)",
+        (food_id, quantity, expiry, provider_id, location, meal_type),
+    )
+    conn.commit()
+
+
+def add_claim(conn, claim_id, food_id, status='Pending'):
+    """Insert one claim by receiver 1 without a quantity and commit."""
+    conn.execute(
+        "INSERT INTO claims (Claim_ID, Food_ID, Receiver_ID, Status, Timestamp) VALUES (?, ?, 1, ?, '2024-03-01 10:00:00')",
+        (claim_id, food_id, status),
+    )
+    conn.commit()
@@ -0,0 +1,68 @@
+import asyncio
+import json
+
+import pytest
+
+from api_server import ApiError, ApiServer, respond
+from change_feed import consumer_lag
+from conftest import add_listing
+from database_manager import bump_table_versions
+
+
+def get_json(target, if_none_match=None):
+    status, headers, body = respond(target, if_none_match)
+    return status, headers, json.loads(body) if body else None
+
+
+@pytest.mark.parametrize('hours', ['inf', 'nan', '1e9', '-1'])
+def test_out_of_range_arguments_are_rejected(db_path, hours):
+    with pytest.raises(ApiError) as error:
+        respond(f'/api/analysis/listings_expiring_within?hours={hours}')
+
+    assert error.value.status == 400
+
+
+def test_matching_etag_is_not_modified_until_a_write(conn):
+    add_listing(conn, 1, expiry='2099-01-01')
+    target = '/api/analysis/total_food_available'
+    status, headers, body = get_json(target)
+
+    assert status == 200 and body == {'rows': [{'Total_Available_Food': 10}]}
+    assert respond(target, headers['ETag'])[0] == 304
+
+    # The app's write paths bump the version of every table they change.
+    add_listing(conn, 2, quantity=5)
+    bump_table_versions(conn, ['food_listings'])
+    conn.commit()
+    status, fresh, body = get_json(target, headers['ETag'])
+    assert status == 200 and body == {'rows': [{'Total_Available_Food': 15}]}
+    assert fresh['ETag'] != headers['ETag']
+
+
+def test_acknowledge_needs_a_post(db_path):
+    with pytest.raises(ApiError) as error:
+        respond('/api/changes/ack?consumer=etl&seq=1')
+
+    assert error.value.status == 405
+
+
+def test_server_records_a_posted_acknowledgement(conn):
+    add_listing(conn, 1)
+
+    async def post():
+        server = await ApiServer(workers=2).start(port=0)
+        port = server.sockets[0].getsockname()[1]
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        writer.write(b"POST /api/changes/ack?consumer=etl&seq=1 HTTP/1.1\r\n"
+                     b"Content-Length: 2\r\nConnection: close\r\n\r\n{}")
+        response = await reader.read()
+        writer.close()
+        server.close()
+        await server.wait_closed()
+        return response
+
+    head, body = asyncio.run(post()).split(b'\r\n\r\n', 1)
+
+    assert head.startswith(b'HTTP/1.1 200 OK')
+    assert json.loads(body) == {'consumer': 'etl', 'last_seq': 1}
+    assert [(row['Consumer'], row['Lag']) for row in consumer_lag(conn)] == [('etl', 0)]
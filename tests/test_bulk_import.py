@@ -0,0 +1,53 @@
+import io
+import json
+
+from bulk_import import bulk_import_listings, read_listings_file
+
+VALID = {
+    'Food_Name': 'Bread', 'Quantity': 5, 'Expiry_Date': '2099-01-01', 'Provider_ID': 1,
+    'Provider_Type': 'Bakery', 'Location': 'Springfield', 'Food_Type': 'Vegetarian', 'Meal_Type': 'Breakfast',
+}
+
+
+def read_json(records):
+    return read_listings_file(io.StringIO(json.dumps(records)), 'json')
+
+
+def test_json_null_and_missing_fields_are_rejected(conn):
+    missing_location = {key: value for key, value in VALID.items() if key != 'Location'}
+    frame = read_json([VALID, {**VALID, 'Food_Name': None}, missing_location])
+
+    inserted, errors = bulk_import_listings(conn, frame)
+
+    assert inserted == 1
+    assert errors['Row'].tolist() == [2, 3]
+    assert errors['Error'].tolist() == ['Food_Name is empty', 'Location is empty']
+
+
+def test_invalid_values_are_reported_per_row(conn):
+    frame = read_json([
+        {**VALID, 'Quantity': 0},
+        {**VALID, 'Quantity': 2.5, 'Expiry_Date': 'soon'},
+        {**VALID, 'Provider_ID': 99},
+        {**VALID, 'Provider_ID': None},
+    ])
+
+    inserted, errors = bulk_import_listings(conn, frame)
+
+    assert inserted == 0
+    assert errors.set_index('Row')['Error'].to_dict() == {
+        1: 'Quantity must be a positive whole number',
+        2: 'Quantity must be a positive whole number; Expiry_Date is not a valid date',
+        3: 'Provider_ID does not exist',
+        4: 'Provider_ID is not a whole number',
+    }
+
+
+def test_csv_rows_are_inserted(conn):
+    csv = "Food_Name,Quantity,Expiry_Date,Provider_ID,Provider_Type,Location,Food_Type,Meal_Type\n" \
+          "Soup,3,2099-02-01,2,Restaurant,Shelbyville,Vegan,Dinner\n"
+
+    inserted, errors = bulk_import_listings(conn, read_listings_file(io.StringIO(csv), 'csv'))
+
+    assert (inserted, len(errors)) == (1, 0)
+    assert conn.execute("SELECT Food_Name, Quantity, Provider_ID FROM food_listings").fetchall() == [('Soup', 3, 2)]
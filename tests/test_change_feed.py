@@ -0,0 +1,74 @@
+import time
+
+import change_feed
+from change_feed import acknowledge, changes_since, compact, consumer_lag, start_compactor
+from conftest import add_listing
+
+
+def age_log(conn, hours, up_to_seq=None):
+    """Make change_log entries look hours old."""
+    conn.execute("UPDATE change_log SET Changed_At = datetime('now', ?) WHERE Seq <= COALESCE(?, Seq)",
+                 (f'-{hours} hours', up_to_seq))
+    conn.commit()
+
+
+def test_cursor_pages_through_the_changes(conn):
+    for food_id in (1, 2, 3):
+        add_listing(conn, food_id)
+    conn.execute("UPDATE food_listings SET Quantity = 4 WHERE Food_ID = 2")
+    conn.commit()
+
+    first = changes_since(conn, 0, limit=3)
+    rest = changes_since(conn, first['next_seq'], limit=3)
+
+    assert [change['Operation'] for change in first['changes']] == ['insert'] * 3
+    assert first['has_more'] and not rest['has_more']
+    assert [(change['Row_ID'], change['Old']['Quantity'], change['New']['Quantity'])
+            for change in rest['changes']] == [(2, 10, 4)]
+    assert rest['next_seq'] == rest['latest_seq'] == first['changes'][0]['Seq'] + 3
+    assert changes_since(conn, rest['next_seq'])['changes'] == []
+    assert changes_since(conn, 0, tables=['claims'])['changes'] == []
+
+
+def test_compaction_waits_for_every_consumer(conn):
+    for food_id in (1, 2, 3, 4):
+        add_listing(conn, food_id)
+    seqs = [change['Seq'] for change in changes_since(conn, 0)['changes']]
+    acknowledge('fast', seqs[3])
+    acknowledge('slow', seqs[1])
+    age_log(conn, 2)
+
+    assert compact() == 2
+    assert changes_since(conn, seqs[1])['changes'][0]['Seq'] == seqs[2]
+    assert changes_since(conn, 0)['reset']
+    assert [(row['Consumer'], row['Lag'], row['Needs_Snapshot']) for row in consumer_lag(conn)] == [
+        ('slow', 2, 0), ('fast', 0, 0)]
+
+    # Entries older than the maximum age go even if a consumer still needs them.
+    age_log(conn, 24 * 8, seqs[2])
+    assert compact() == 1
+    assert consumer_lag(conn)[0]['Needs_Snapshot'] == 1
+
+
+def test_recent_entries_are_kept(conn):
+    add_listing(conn, 1)
+    add_listing(conn, 2)
+    acknowledge('reader', changes_since(conn, 0)['latest_seq'])
+
+    assert compact() == 0
+    age_log(conn, 2)
+    assert compact(batch_rows=1) == 2
+    assert changes_since(conn, 0)['reset']
+
+
+def test_compactor_runs_on_its_own(conn, monkeypatch):
+    monkeypatch.setattr(change_feed, '_compactor', None)
+    add_listing(conn, 1)
+    age_log(conn, 24 * 8)
+
+    assert start_compactor(interval=0) is None
+    assert start_compactor(interval=0.05) is start_compactor(interval=0.05)
+    deadline = time.monotonic() + 5
+    while not changes_since(conn, 0)['reset'] and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert changes_since(conn, 0)['reset']
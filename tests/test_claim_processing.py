@@ -0,0 +1,82 @@
+import pytest
+
+from claim_processing import (
+    ClaimConflict, claim, listing_state, set_claim_status, submit_claims, update_quantity, verify_reservations,
+)
+from conftest import add_claim, add_listing
+
+
+def test_partial_claim_takes_what_is_left(conn):
+    add_listing(conn, 1, quantity=10)
+
+    first = claim(1, 1, 6)
+    rejected = claim(1, 2, 6)
+    partial = claim(1, 2, 6, allow_partial=True)
+
+    assert first['Claimed'] == 6
+    assert (rejected['Claim_ID'], rejected['Reason']) == (None, "not enough quantity left")
+    assert partial['Claimed'] == 4
+    assert listing_state(conn, 1)[:2] == (10, 10)
+    assert verify_reservations(conn) == []
+
+
+def test_batch_rejects_items_on_their_own(conn):
+    add_listing(conn, 1, quantity=5)
+    add_listing(conn, 2, quantity=5)
+
+    results = submit_claims([(1, 1, 3), (1, 2, 3), (2, 2, 5), (99, 1, 1)])
+
+    assert [result['Claimed'] for result in results] == [3, 0, 5, 0]
+    assert [result['Reason'] for result in results] == [None, "not enough quantity left", None, "unknown listing"]
+    assert conn.execute("SELECT COUNT(*) FROM claims").fetchone()[0] == 2
+    assert listing_state(conn, 1)[1] == 3
+
+
+def test_cancelling_a_claim_releases_its_quantity(conn):
+    add_listing(conn, 1, quantity=4)
+    claim_id = claim(1, 1, 4)['Claim_ID']
+    assert claim(1, 2, 1)['Claim_ID'] is None
+
+    assert set_claim_status(claim_id, 'Cancelled')
+
+    assert listing_state(conn, 1)[1] == 0
+    assert claim(1, 2, 1)['Claimed'] == 1
+    assert set_claim_status(12345, 'Cancelled') is False
+
+
+def test_update_with_a_stale_version_conflicts(conn):
+    add_listing(conn, 1, quantity=10)
+    loaded_version = listing_state(conn, 1)[2]
+    claim(1, 1, 2)
+
+    with pytest.raises(ClaimConflict):
+        update_quantity(1, 20, loaded_version)
+    assert listing_state(conn, 1)[0] == 10
+
+    new_version = update_quantity(1, 20, listing_state(conn, 1)[2])
+    assert listing_state(conn, 1) == (20, 2, new_version)
+
+
+def test_update_below_reserved_is_refused(conn):
+    add_listing(conn, 1, quantity=10)
+    claim(1, 1, 8)
+
+    with pytest.raises(ValueError, match="reserved"):
+        update_quantity(1, 5, listing_state(conn, 1)[2])
+
+
+
+def test_claims_inserted_without_a_quantity_reserve_the_whole_listing(conn):
+    add_listing(conn, 1, quantity=8)
+    add_listing(conn, 2, quantity=3)
+    add_claim(conn, 1, 1)
+    add_claim(conn, 2, 2, status='Completed')
+
+    assert conn.execute("SELECT Reserved FROM food_listings ORDER BY Food_ID").fetchall() == [(8,), (3,)]
+
+    conn.execute("UPDATE claims SET Status = 'Cancelled' WHERE Claim_ID = 1")
+    conn.execute("UPDATE claims SET Food_ID = 1 WHERE Claim_ID = 2")
+    conn.commit()
+
+    assert conn.execute("SELECT Reserved FROM food_listings ORDER BY Food_ID").fetchall() == [(3,), (0,)]
+    assert verify_reservations(conn) == []
@@ -0,0 +1,74 @@
+import pytest
+
+import claims_history
+from claims_history import partitions, range_query, verify_rollup
+from conftest import add_listing
+from data_analysis import claims_between, claims_trend_by_city, claims_trend_by_status
+from database_manager import current_table_versions
+from expiry_sweeper import sweep
+
+
+def add_claims(conn, claims):
+    """Insert (Claim_ID, Food_ID, Status, Timestamp) claims by receiver 1 and commit."""
+    conn.executemany("INSERT INTO claims (Claim_ID, Food_ID, Receiver_ID, Status, Timestamp) VALUES (?, ?, 1, ?, ?)",
+                     claims)
+    conn.commit()
+
+
+def test_rollup_follows_claims_and_their_listings(conn):
+    add_listing(conn, 1, location='Springfield', meal_type='Lunch')
+    add_listing(conn, 2, location='Shelbyville', meal_type='Dinner')
+    add_claims(conn, [(1, 1, 'Pending', '2024-03-01 10:00:00'), (2, 1, 'Completed', '2024-03-01 12:00:00'),
+                      (3, 2, 'Pending', '2024-03-02 09:00:00')])
+
+    conn.execute("UPDATE claims SET Status = 'Completed' WHERE Claim_ID = 1")
+    conn.execute("UPDATE food_listings SET Location = 'Ogdenville' WHERE Food_ID = 1")
+    conn.execute("DELETE FROM food_listings WHERE Food_ID = 2")
+    conn.commit()
+
+    assert verify_rollup(conn) == []
+    assert claims_trend_by_city(conn).values.tolist() == [['2024-03-01', 'Ogdenville', 2], ['2024-03-02', 'Unknown', 1]]
+
+
+def test_trends_by_period_and_date_range(conn):
+    add_listing(conn, 1)
+    # 2024-03-01 is a Friday and 2024-03-04 a Monday.
+    add_claims(conn, [(1, 1, 'Completed', '2024-03-01 10:00:00'), (2, 1, 'Pending', '2024-03-04 10:00:00'),
+                      (3, 1, 'Completed', '2024-04-02 10:00:00')])
+
+    assert claims_trend_by_status(conn, 'week').values.tolist() == [
+        ['2024-02-26', 'Completed', 1], ['2024-03-04', 'Pending', 1], ['2024-04-01', 'Completed', 1]]
+    assert claims_trend_by_status(conn, 'month', start='2024-03-02').values.tolist() == [
+        ['2024-03', 'Pending', 1], ['2024-04', 'Completed', 1]]
+    with pytest.raises(ValueError):
+        claims_trend_by_status(conn, 'year')
+    with pytest.raises(ValueError):
+        claims_trend_by_status(conn, start='March')
+
+
+def test_range_reads_only_the_overlapping_partitions(conn):
+    add_listing(conn, 1, expiry='2000-01-01')
+    add_listing(conn, 2)
+    add_claims(conn, [(1, 1, 'Completed', '2024-03-01 10:00:00'), (2, 1, 'Completed', '2024-04-30 23:00:00'),
+                      (3, 2, 'Pending', '2024-04-01 00:00:00')])
+    sweep()
+
+    assert partitions(conn) == ['claims_2024_03', 'claims_2024_04']
+    assert 'claims_2024_03' not in range_query(conn, 1711929600, 1714521600)[0]  # April 2024
+    assert claims_between(conn, '2024-04-01', '2024-04-30')['Claim_ID'].tolist() == [3, 2]
+    assert claims_between(conn, '2024-03-01', '2024-04-01')['Claim_ID'].tolist() == [1, 3]
+    assert claims_between(conn, '2024-05-01', '2024-05-31').empty
+
+
+def test_rollup_rebuild_bumps_the_source_table_versions(db_path, conn):
+    add_listing(conn, 1)
+    add_claims(conn, [(1, 1, 'Pending', '2024-03-01 10:00:00')])
+    conn.execute("UPDATE claims_daily SET Claims = 5")
+    conn.commit()
+    before = current_table_versions(conn)
+
+    assert claims_history.main(['--db', db_path]) == 0
+
+    after = current_table_versions(conn)
+    assert verify_rollup(conn) == []
+    assert all(after[table] == before.get(table, 0) + 1 for table in ('claims', 'food_listings'))
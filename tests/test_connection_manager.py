@@ -0,0 +1,80 @@
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from database_manager import ConnectionManager
+
+
+def hold_reader(manager, checked_out, release):
+    """Check a connection out on another thread and keep it until release is set."""
+    def run():
+        with manager.reader():
+            checked_out.release()
+            release.wait()
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread
+
+
+def test_checkouts_wait_for_a_free_connection(db_path):
+    manager = ConnectionManager(db_path, pool_size=2)
+    checked_out, release = threading.Semaphore(0), threading.Event()
+    threads = [hold_reader(manager, checked_out, release) for _ in range(2)]
+    for _ in threads:
+        checked_out.acquire()
+
+    with pytest.raises(sqlite3.OperationalError):
+        with manager.reader(timeout=0.05):
+            pass
+    threading.Timer(0.1, release.set).start()
+    with manager.reader(timeout=5) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM providers").fetchone() == (2,)
+    for thread in threads:
+        thread.join()
+
+    stats = manager.stats()
+    assert stats['readers_opened'] == 2
+    assert stats['read_timeouts'] == 1 and stats['read_contentions'] == 2
+    assert stats['read_wait_max_seconds'] >= 0.05
+
+
+def test_nested_reads_share_a_connection_and_leave_no_transaction(db_path):
+    manager = ConnectionManager(db_path, pool_size=1)
+
+    with manager.reader() as outer:
+        with manager.reader(timeout=0) as inner:
+            assert inner is outer
+        outer.execute("BEGIN")
+        outer.execute("SELECT * FROM providers").fetchall()
+
+    with manager.reader() as conn:
+        assert conn is outer and not conn.in_transaction
+        with pytest.raises(sqlite3.OperationalError):
+            conn.execute("DELETE FROM providers")
+
+
+def test_writes_are_serialized(db_path):
+    manager = ConnectionManager(db_path)
+    start = threading.Barrier(4)
+
+    def insert_next(times):
+        start.wait()
+        for _ in range(times):
+            with manager.write() as writer:
+                count = writer.execute("SELECT COUNT(*) FROM providers WHERE Name LIKE 'x%'").fetchone()[0]
+                time.sleep(0.001)
+                writer.execute("INSERT INTO providers VALUES (?, ?, 'Bakery', 'a', 'b', 'c')",
+                               (100 + count, f'x{count}'))
+
+    threads = [threading.Thread(target=insert_next, args=(10,)) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    with manager.reader() as conn:
+        assert conn.execute("SELECT COUNT(*), MAX(Provider_ID) FROM providers WHERE Name LIKE 'x%'").fetchone() == (40, 139)
+    stats = manager.stats()
+    assert stats['write_acquisitions'] == 40 and stats['write_contentions'] > 0
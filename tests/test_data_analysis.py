@@ -0,0 +1,31 @@
+from datetime import date, timedelta
+
+from conftest import add_listing
+from data_analysis import city_with_most_listings, listings_by_expiry_date, total_food_available
+from database_manager import count_listings, get_listings_page
+
+
+def in_days(days):
+    return (date.today() + timedelta(days=days)).isoformat()
+
+
+def test_expiry_buckets_leave_out_expired_listings(conn):
+    for food_id, days in enumerate([-1, 0, 7, 8, 30, 31, 365], start=1):
+        add_listing(conn, food_id, expiry=in_days(days))
+
+    buckets = dict(listings_by_expiry_date(conn).itertuples(index=False))
+
+    assert buckets == {'Expiring in < 7 days': 2, 'Expiring in 7-30 days': 2, 'Expiring in > 30 days': 2}
+
+
+def test_live_metrics_and_pages_skip_expired_listings(conn):
+    add_listing(conn, 1, quantity=10, expiry=in_days(-1), location='Shelbyville')
+    add_listing(conn, 2, quantity=20, expiry=in_days(-1), location='Shelbyville')
+    add_listing(conn, 3, quantity=4, expiry=in_days(0), location='Springfield')
+
+    assert total_food_available(conn).iloc[0, 0] == 4
+    assert city_with_most_listings(conn).values.tolist() == [['Springfield', 1]]
+    page, has_next = get_listings_page(conn)
+    assert page['Food_ID'].tolist() == [3] and not has_next
+    assert count_listings(conn) == 1
+    assert count_listings(conn, include_expired=True) == 3
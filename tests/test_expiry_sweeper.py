@@ -0,0 +1,30 @@
+from datetime import date
+
+from claims_history import verify_rollup
+from conftest import add_claim, add_listing
+from expiry_sweeper import sweep
+from summaries import verify_summaries
+
+
+def test_expired_listings_take_all_their_claims_along(conn):
+    add_listing(conn, 1, expiry='2000-01-01')
+    add_listing(conn, 2)
+    add_claim(conn, 1, 1, status='Pending')
+    add_claim(conn, 2, 1, status='Cancelled')
+    add_claim(conn, 3, 1, status='Completed')
+    add_claim(conn, 4, 2)
+
+    assert sweep(batch_rows=1) == {'expired': 1, 'claimed': 0, 'claims': 3, 'cancelled': 1}
+
+    assert conn.execute("SELECT Food_ID, Archive_Reason FROM food_listings_archive").fetchall() == [(1, 'expired')]
+    assert conn.execute("SELECT Claim_ID, Status FROM claims_archive ORDER BY Claim_ID").fetchall() == [
+        (1, 'Cancelled'), (2, 'Cancelled'), (3, 'Completed')]
+    assert conn.execute("SELECT Claim_ID FROM claims").fetchall() == [(4,)]
+    assert verify_summaries(conn) == {}
+    assert verify_rollup(conn) == []
+
+
+def test_nothing_is_archived_before_the_day_ends(conn):
+    add_listing(conn, 1, expiry='2000-01-01')
+
+    assert sweep(as_of=date(2000, 1, 1))['expired'] == 0
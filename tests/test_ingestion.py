@@ -0,0 +1,56 @@
+import pandas as pd
+
+from conftest import add_listing
+from ingestion import ingest_all
+
+LISTINGS = pd.DataFrame({
+    'Food_ID': [1, 2, 3], 'Food_Name': ['Bread', 'Soup', 'Rice'], 'Quantity': [10, 5, 7],
+    'Expiry_Date': ['2099-01-01'] * 3, 'Provider_ID': [1, 1, 2], 'Provider_Type': ['Bakery'] * 3,
+    'Location': ['Springfield'] * 3, 'Food_Type': ['Vegetarian'] * 3, 'Meal_Type': ['Lunch'] * 3,
+})
+
+
+def write_listings(tmp_path, frame):
+    frame.to_csv(tmp_path / 'food_listings_data.csv', index=False)
+
+
+def quantities(conn):
+    return dict(conn.execute("SELECT Food_ID, Quantity FROM food_listings"))
+
+
+def test_only_the_file_diff_is_written(conn, tmp_path):
+    write_listings(tmp_path, LISTINGS)
+    first = ingest_all(conn, data_dir=str(tmp_path))
+    add_listing(conn, 50, quantity=2)
+
+    edited = pd.concat([LISTINGS.iloc[[0, 2]], LISTINGS.iloc[[0]].assign(Food_ID=4, Quantity=9)])
+    edited.loc[edited['Food_ID'] == 3, 'Quantity'] = 8
+    write_listings(tmp_path, edited)
+    second = ingest_all(conn, data_dir=str(tmp_path), force=True)
+
+    assert first['food_listings'] == {'inserted': 3, 'changed': 0, 'deleted': 0, 'conflicts': 0}
+    assert second['food_listings'] == {'inserted': 1, 'changed': 1, 'deleted': 1, 'conflicts': 0}
+    # Listing 50 was created in the app, not by the file.
+    assert quantities(conn) == {1: 10, 3: 8, 4: 9, 50: 2}
+
+
+def test_new_file_rows_do_not_overwrite_app_rows(conn, tmp_path):
+    write_listings(tmp_path, LISTINGS)
+    ingest_all(conn, data_dir=str(tmp_path))
+    add_listing(conn, 4, quantity=2)
+
+    write_listings(tmp_path, pd.concat([LISTINGS, LISTINGS.iloc[[0]].assign(Food_ID=4, Quantity=9)]))
+    report = ingest_all(conn, data_dir=str(tmp_path), force=True)
+
+    assert report['food_listings'] == {'inserted': 0, 'changed': 0, 'deleted': 0, 'conflicts': 1}
+    assert quantities(conn)[4] == 2
+
+
+def test_equal_values_of_another_dtype_are_unchanged(conn, tmp_path):
+    write_listings(tmp_path, LISTINGS)
+    ingest_all(conn, data_dir=str(tmp_path))
+
+    write_listings(tmp_path, LISTINGS.assign(Quantity=LISTINGS['Quantity'].astype(float)))
+    report = ingest_all(conn, data_dir=str(tmp_path), force=True)
+
+    assert report['food_listings'] == {'inserted': 0, 'changed': 0, 'deleted': 0, 'conflicts': 0}
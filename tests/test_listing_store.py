@@ -0,0 +1,48 @@
+import listing_store
+from conftest import add_listing
+from database_manager import bump_table_versions
+from listing_store import load_store, memory_report
+
+
+def test_filters_compare_codes(conn):
+    add_listing(conn, 1, location='Springfield', meal_type='Lunch')
+    add_listing(conn, 2, location='Shelbyville', meal_type='Dinner')
+    add_listing(conn, 3, location='Shelbyville', meal_type='Lunch')
+
+    store = load_store(conn)
+
+    assert store.count(Location='Shelbyville') == 2
+    assert store.count(Location=['Shelbyville', 'Ogdenville'], Meal_Type='Lunch') == 1
+    assert store.count(Location='Ogdenville') == 0
+    assert store.count(Location=[]) == 3
+    frame = store.frame(store.mask(Meal_Type='Lunch'), columns=['Food_ID', 'Location'])
+    assert frame['Food_ID'].tolist() == [1, 3]
+    assert frame['Location'].astype(str).tolist() == ['Springfield', 'Shelbyville']
+
+
+def test_store_carries_the_table_version(conn):
+    add_listing(conn, 1)
+    before = load_store(conn)
+
+    add_listing(conn, 2)
+    bump_table_versions(conn, ['food_listings'])
+    conn.commit()
+    after = load_store(conn)
+
+    assert after.version == before.version + 1
+    assert (len(before), len(after)) == (1, 2)
+
+
+def test_memory_report_uses_the_given_stores(conn):
+    add_listing(conn, 1)
+    built = []
+
+    def get_store(conn, table):
+        built.append(table)
+        return load_store(conn, table)
+
+    report = memory_report(conn, get_store)
+
+    assert built == list(listing_store.CODED_COLUMNS)
+    assert report['food_listings']['rows'] == 1
+    assert report['providers']['store_bytes'] > 0
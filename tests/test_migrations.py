@@ -0,0 +1,76 @@
+import sqlite3
+
+import pandas as pd
+
+from claim_processing import verify_reservations
+from database_manager import configure_connection, migrate, schema_version
+from migrations import MIGRATIONS
+from summaries import verify_summaries
+
+LATEST = MIGRATIONS[-1][0]
+
+
+def primary_key(conn, table):
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})") if row[5]]
+
+
+def test_fresh_database_gets_every_migration(tmp_path):
+    conn = configure_connection(sqlite3.connect(str(tmp_path / 'fresh.db')))
+
+    assert migrate(conn) == LATEST
+    assert migrate(conn) == LATEST
+
+    tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    assert {'food_listings', 'claims', 'summary_provider', 'change_log', 'ingested_rows'} <= tables
+    assert primary_key(conn, 'claims') == ['Claim_ID']
+    assert verify_summaries(conn) == {}
+
+
+def test_upgrade_from_tables_without_keys(tmp_path):
+    # Version 0: what the old to_sql(if_exists='replace') loader left behind.
+    conn = configure_connection(sqlite3.connect(str(tmp_path / 'old.db')))
+    pd.DataFrame({
+        'Provider_ID': [1], 'Name': ['Green Grocer'], 'Type': ['Supermarket'], 'Address': ['1 Main St'],
+        'City': ['Springfield'], 'Contact': ['555-0001'],
+    }).to_sql('providers', conn, index=False)
+    pd.DataFrame({
+        'Receiver_ID': [1], 'Name': ['Food Bank'], 'Type': ['NGO'], 'City': ['Springfield'], 'Contact': ['555-1001'],
+    }).to_sql('receivers', conn, index=False)
+    pd.DataFrame({
+        'Food_ID': [1, 2, 2], 'Food_Name': ['Bread', 'Soup', 'Soup'], 'Quantity': [10, 4, 6],
+        'Expiry_Date': ['2099-01-01'] * 3, 'Provider_ID': [1, 1, 1], 'Provider_Type': ['Supermarket'] * 3,
+        'Location': ['Springfield'] * 3, 'Food_Type': ['Vegetarian'] * 3, 'Meal_Type': ['Lunch'] * 3,
+    }).to_sql('food_listings', conn, index=False)
+    pd.DataFrame({
+        'Claim_ID': [1], 'Food_ID': [2], 'Receiver_ID': [1], 'Status': ['Pending'],
+        'Timestamp': ['2024-03-01 10:00:00'],
+    }).to_sql('claims', conn, index=False)
+    assert schema_version(conn) == 0
+
+    assert migrate(conn) == LATEST
+
+    assert primary_key(conn, 'food_listings') == ['Food_ID']
+    # The last row loaded for a duplicated key wins.
+    assert conn.execute("SELECT Food_ID, Quantity, Reserved FROM food_listings ORDER BY Food_ID").fetchall() == [
+        (1, 10, 0), (2, 6, 6)]
+    assert conn.execute("SELECT Claimed_Quantity FROM claims").fetchall() == [(6,)]
+    assert verify_summaries(conn) == {}
+    assert verify_reservations(conn) == []
+
+
+def test_upgrade_keeps_listings_without_a_provider(tmp_path):
+    conn = configure_connection(sqlite3.connect(str(tmp_path / 'v5.db')))
+    for version, migration in MIGRATIONS[:5]:
+        migration(conn.cursor())
+        conn.execute(f"PRAGMA user_version = {version}")
+    conn.execute("INSERT INTO providers VALUES (1, 'Green Grocer', 'Supermarket', '1 Main St', 'Springfield', '555')")
+    conn.executemany(
+        "INSERT INTO food_listings VALUES (?, 'Bread', ?, '2099-01-01', ?, 'Bakery', 'Springfield', 'Vegetarian', 'Lunch')",
+        [(1, 10, 1), (2, 4, None)],
+    )
+    conn.commit()
+
+    assert migrate(conn) == LATEST
+
+    assert conn.execute("SELECT * FROM summary_provider").fetchall() == [(1, 1, 10)]
+    assert verify_summaries(conn) == {}
@@ -0,0 +1,67 @@
+import sqlite3
+import threading
+
+import pandas as pd
+import pytest
+
+from query_runner import (
+    ExportTooLarge, QueryCancelled, QueryControl, QueryTimeout, export_to_file, iter_chunks, preview,
+    read_only_connection,
+)
+
+NUMBERS = "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < ?) SELECT i FROM n"
+ENDLESS = "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n) SELECT MAX(i) FROM n"
+
+
+def test_results_come_in_chunks(db_path):
+    with read_only_connection(db_path) as conn:
+        sizes = [len(chunk) for chunk in iter_chunks(conn, NUMBERS, (5,), chunk_rows=2)]
+        first, truncated = preview(conn, NUMBERS, (5,), max_rows=3)
+        whole, complete = preview(conn, NUMBERS, (3,), max_rows=3)
+
+    assert sizes == [2, 2, 1]
+    assert first['i'].tolist() == [1, 2, 3] and truncated
+    assert whole['i'].tolist() == [1, 2, 3] and not complete
+
+
+def test_a_cancelled_statement_stops(db_path):
+    control = QueryControl(timeout=None)
+    threading.Timer(0.05, control.cancel).start()
+
+    with read_only_connection(db_path) as conn:
+        with pytest.raises(QueryCancelled):
+            preview(conn, ENDLESS, control=control)
+
+
+def test_a_statement_past_its_timeout_stops(db_path):
+    with read_only_connection(db_path) as conn:
+        with pytest.raises(QueryTimeout):
+            preview(conn, ENDLESS, control=QueryControl(timeout=0.05))
+        # The connection is still usable afterwards.
+        assert preview(conn, NUMBERS, (1,))[0]['i'].tolist() == [1]
+
+
+def test_user_statements_cannot_write_or_leak_state(db_path, tmp_path):
+    with read_only_connection(db_path) as conn:
+        conn.execute("PRAGMA query_only = OFF")
+        with pytest.raises(sqlite3.OperationalError):
+            conn.execute("DELETE FROM providers")
+        with pytest.raises(sqlite3.DatabaseError):
+            conn.execute(f"ATTACH '{tmp_path / 'other.db'}' AS other")
+        # The failed DELETE left its implicit transaction open.
+        assert conn.in_transaction
+
+    with read_only_connection(db_path) as conn:
+        assert not conn.in_transaction
+    assert not (tmp_path / 'other.db').exists()
+
+
+def test_exports_stop_at_their_size_limit(db_path, tmp_path):
+    path = tmp_path / 'out.csv'
+    with read_only_connection(db_path) as conn:
+        written = export_to_file(conn, NUMBERS, path, params=(1000,), chunk_rows=100)
+        with pytest.raises(ExportTooLarge):
+            export_to_file(conn, NUMBERS, tmp_path / 'big.csv', params=(1000,), chunk_rows=100, max_bytes=written - 1)
+
+    assert written == path.stat().st_size
+    assert pd.read_csv(path)['i'].tolist() == list(range(1, 1001))
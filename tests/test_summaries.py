@@ -0,0 +1,48 @@
+import summaries
+from conftest import add_claim, add_listing
+from database_manager import current_table_versions
+from summaries import verify_summaries
+
+
+def test_triggers_keep_the_summaries_current(conn):
+    add_listing(conn, 1, quantity=10, location='Springfield', meal_type='Lunch')
+    add_listing(conn, 2, quantity=5, provider_id=2, location='Shelbyville', meal_type='Dinner')
+    add_listing(conn, 3, quantity=7, provider_id=2, location='Shelbyville', meal_type='Dinner')
+    add_claim(conn, 1, 2)
+    add_claim(conn, 2, 3, status='Completed')
+
+    conn.execute("UPDATE food_listings SET Quantity = 12, Location = 'Ogdenville' WHERE Food_ID = 1")
+    conn.execute("UPDATE claims SET Status = 'Cancelled' WHERE Claim_ID = 1")
+    conn.execute("DELETE FROM food_listings WHERE Food_ID = 3")
+    conn.execute("DELETE FROM claims WHERE Claim_ID = 2")
+    conn.commit()
+
+    assert verify_summaries(conn) == {}
+    assert conn.execute("SELECT * FROM summary_city WHERE Listings > 0 ORDER BY City").fetchall() == [
+        ('Ogdenville', 1, 12), ('Shelbyville', 1, 5)]
+    assert conn.execute("SELECT * FROM summary_claim_status WHERE Claims > 0").fetchall() == [('Cancelled', 1)]
+
+
+def test_listings_without_a_provider_are_not_summarized(conn):
+    add_listing(conn, 1, quantity=10)
+    add_listing(conn, 2, quantity=4)
+
+    conn.execute("UPDATE food_listings SET Provider_ID = NULL WHERE Food_ID = 2")
+    add_listing(conn, 3, quantity=3, provider_id=None)
+    conn.commit()
+
+    assert conn.execute("SELECT * FROM summary_provider").fetchall() == [(1, 1, 10)]
+    assert verify_summaries(conn) == {}
+
+
+def test_rebuild_bumps_the_source_table_versions(db_path, conn):
+    add_listing(conn, 1, quantity=10)
+    conn.execute("UPDATE summary_city SET Quantity = 99")
+    conn.commit()
+    before = current_table_versions(conn)
+
+    assert summaries.main(['--db', db_path]) == 0
+
+    after = current_table_versions(conn)
+    assert verify_summaries(conn) == {}
+    assert all(after[table] == before[table] + 1 for table in ('providers', 'receivers', 'food_listings', 'claims'))